@@ -1,8 +1,10 @@
 # artwebsite/settings.py
 
 import os
+import sys
 from pathlib import Path
 from urllib.parse import urlparse # For parsing GITPOD_WORKSPACE_URL
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # This should correctly point to 'ART-WEBSITE-DYNAMIC/' if settings.py is in 'ART-WEBSITE-DYNAMIC/artwebsite/'
@@ -24,6 +26,9 @@ if not SECRET_KEY:
 # Set DJANGO_DEBUG to "True" (string) in Gitpod project settings for development.
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False') == 'True'
 
+# True under `python manage.py test`
+TESTING = sys.argv[1:2] == ['test']
+
 # ALLOWED_HOSTS configuration
 ALLOWED_HOSTS = []
 
@@ -88,15 +93,16 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig', # Or simply 'core'
 
     # Third-party apps (uncomment and add to requirements.txt as you install them)
-    # 'cloudinary',           # For Cloudinary integration (models, etc.)
-    # 'cloudinary_storage',   # For Django storage backend with Cloudinary
+    # 'cloudinary' and 'cloudinary_storage' are added under "Image storage" below (unless images are stored locally)
     # 'taggit',               # For tagging functionality
     # 'ckeditor',             # For the rich text editor
     # 'ckeditor_uploader',    # For handling image uploads within CKEditor
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware', # First, so its timings cover the whole request
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware', # Serves collected static files (see Static files below)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -105,14 +111,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Serve the async versions of the home, gallery and blog pages (core/async_views.py). Off by default, ASGI included:
+# with SQLite every ORM call still runs in a thread, and the sync views measured ~3x faster
+# (`manage.py benchmark_concurrency`). Only worth trying on a database with real async I/O. Never under WSGI.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', 'False') == 'True'
+
 ROOT_URLCONF = 'artwebsite.urls' # This should be correct if your project config dir is 'artwebsite'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')], # Optional project-level templates dir (e.g., for 404.html)
-        'APP_DIRS': True, # Django will look for a 'templates' directory inside each app
+        # App 'templates' directories are searched by the app_directories loader below (instead of APP_DIRS).
         'OPTIONS': {
+            # Compiled templates are kept in memory instead of being read and parsed per render.
+            # With DEBUG on, edited templates are still picked up by the dev server's autoreloader.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request', # Important for request object in templates
@@ -146,6 +165,50 @@ DATABASES = {
 #     )
 
 
+# --- Caching ---
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Version counters, the cached homepage and the gallery data must be shared by every worker, or an
+# admin edit only reaches the worker that handled it. Outside DEBUG the default is therefore a
+# file-based cache all workers on the machine share; with several machines set
+# DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION to a shared server (e.g.
+# django.core.cache.backends.redis.RedisCache). The per-process LocMemCache is only for development.
+if DEBUG:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+    DEFAULT_CACHE_LOCATION = 'art-website'
+else:
+    DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+    DEFAULT_CACHE_LOCATION = str(BASE_DIR / 'cache')
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', DEFAULT_CACHE_BACKEND),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', DEFAULT_CACHE_LOCATION),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+if not DEBUG and CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    raise ImproperlyConfigured(
+        "LocMemCache is per process, so cache invalidation wouldn't reach other workers. "
+        "Use a shared DJANGO_CACHE_BACKEND outside DEBUG."
+    )
+# How long the rendered homepage is kept (seconds). Admin edits invalidate it straight away.
+HOMEPAGE_CACHE_TIMEOUT = 60 * 60
+# Gallery data cached under the gallery version counter, so edits take effect at once anyway.
+GALLERY_CACHE_TIMEOUT = 24 * 60 * 60
+# Header/footer fragments in base.html. Part of their cache key, so set DJANGO_RELEASE to something
+# new on each deploy (e.g. the git commit) when using a shared cache, or changed templates keep
+# showing the old chrome until the timeout.
+SITE_CHROME_VERSION = os.environ.get('DJANGO_RELEASE', 'dev')
+SITE_CHROME_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# --- Request Metrics (core/metrics.py) ---
+# Server-Timing header with query count/time, render time and cache hits on every response.
+# On by default in development; it reveals internals, so think twice before enabling it in production.
+SERVER_TIMING_HEADER = os.environ.get('DJANGO_SERVER_TIMING', str(DEBUG)) == 'True'
+# One JSON log line per request on the 'core.metrics' logger.
+REQUEST_METRICS_LOG = os.environ.get('DJANGO_REQUEST_METRICS_LOG', 'False') == 'True'
+
+
 # --- Password Validation ---
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -178,7 +241,11 @@ STATICFILES_DIRS = [
                                           # Or project_root/static/css/main.css -> {% static 'css/main.css' %} (if project_root/static is in STATICFILES_DIRS)
 ]
 # For production, STATIC_ROOT is where 'collectstatic' will gather all static files.
-# STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_production')
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_production')
+# collectstatic writes content-hashed copies plus .gz/.br siblings (pip install brotli for .br),
+# and core.staticfiles.StaticFilesMiddleware serves them with far-future cache headers.
+# Run `python manage.py collectstatic` on every deploy.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
 
 
 # --- Media files (User-uploaded content like images via Django Forms/Models if not directly to Cloudinary) ---
@@ -203,10 +270,29 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'apikey'  # This is literally the string 'apikey' for SendGrid API key auth
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL_ADDRESS', 'Your Name <webmaster@localhost>') # Sensible fallback
-
+CONTACT_EMAIL = os.environ.get('CONTACT_EMAIL', '') # Shown on the contact page (left off when empty)
+
+# --- Newsletter (new blog posts sent to Subscribers, see core/newsletter.py) ---
+# SITE_URL is used to build absolute links (post, unsubscribe) inside emails.
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+NEWSLETTER_BATCH_SIZE = 100 # Emails sent over one SMTP connection before reconnecting
+NEWSLETTER_MAX_PER_SECOND = 10 # Throttle to stay under the provider's rate limit (0 = no limit)
+# Start sends from the admin in a thread of the web process. Set to False if you run
+# `python manage.py send_newsletter` from a separate worker/cron instead.
+NEWSLETTER_RUN_IN_PROCESS = True
+
+
+# --- Image storage ---
+# CloudinaryField images (artworks, hero slides, category and blog covers) are stored on Cloudinary.
+# Set DJANGO_IMAGE_STORAGE=local to keep them under LOCAL_IMAGES_ROOT instead, resized on demand by
+# the site itself (core/local_images.py): no network needed for dev, test or load-test runs, and a
+# self-hosted fallback. Image URLs look the same either way; only the host in front changes.
+IMAGE_STORAGE = os.environ.get('DJANGO_IMAGE_STORAGE', 'cloudinary') # 'cloudinary' or 'local'
+LOCAL_IMAGES_ROOT = os.path.join(MEDIA_ROOT, 'images') # originals/ and the cache/ of resized copies
+LOCAL_IMAGES_URL = MEDIA_URL + 'images/'
+LOCAL_IMAGES_CACHE_MAX_BYTES = int(os.environ.get('LOCAL_IMAGES_CACHE_MAX_BYTES', 1024 ** 3)) # Least recently served copies are deleted past this
 
 # --- Cloudinary Configuration ---
-# Ensure 'cloudinary' and 'cloudinary_storage' are in INSTALLED_APPS (after you pip install them).
 # Ensure CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET are set in Gitpod Env Variables.
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME'),
@@ -214,10 +300,38 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
     'SECURE': True, # Always use HTTPS for Cloudinary URLs
 }
-# This tells Django to use Cloudinary for all default file storage operations
-# (e.g., for ImageField, FileField in your models, unless a specific CloudinaryField is used).
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage' # Add to INSTALLED_APPS: 'cloudinary_storage'
-
+# `manage.py test` builds image URLs but never uploads, so it doesn't need the real account. This
+# dict is read by the cloudinary package itself; CLOUDINARY_* env variables still win over it.
+if TESTING and not os.environ.get('CLOUDINARY_CLOUD_NAME'):
+    CLOUDINARY = {'cloud_name': 'test', 'secure': True}
+if IMAGE_STORAGE == 'cloudinary':
+    # Listed after django.contrib.staticfiles so its collectstatic (which builds our compressed
+    # manifest) isn't replaced by cloudinary_storage's.
+    INSTALLED_APPS += ['cloudinary_storage', 'cloudinary']
+    # This tells Django to use Cloudinary for all default file storage operations
+    # (e.g., for ImageField, FileField in your models, unless a specific CloudinaryField is used).
+    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+else:
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+
+# --- Instagram Sync (python manage.py sync_instagram) ---
+# INSTAGRAM_ACCESS_TOKEN is a long-lived Instagram Graph API token, set in Gitpod Env Variables.
+INSTAGRAM_ACCESS_TOKEN = os.environ.get('INSTAGRAM_ACCESS_TOKEN')
+INSTAGRAM_API_BASE_URL = os.environ.get('INSTAGRAM_API_BASE_URL', 'https://graph.instagram.com')
+INSTAGRAM_SYNC_WORKERS = 8 # Concurrent downloads/uploads when processing imports into artworks (the feed itself is read one page at a time)
+INSTAGRAM_PAGE_SIZE = 50 # Posts per media-list page
+INSTAGRAM_IMPORT_BATCH_SIZE = 25 # Items downloaded, uploaded and committed together when processing into artworks
+INSTAGRAM_IMPORT_CATEGORY = 'Instagram' # Category used when the admin action isn't given one
+# Start "Process into artworks" jobs in a thread of the web process. Set to False if you run
+# `python manage.py process_instagram_imports` from a separate worker/cron instead.
+INSTAGRAM_IMPORT_RUN_IN_PROCESS = True
+
+
+# --- Background jobs (core/background.py) ---
+BACKGROUND_POOL_WORKERS = 2 # Threads per web process for small after-save jobs (e.g. image analysis)
+if TESTING:
+    BACKGROUND_POOL_WORKERS = 0 # Run them inline after the commit: other threads can't see a test's rows
 
 # --- CKEditor Configuration (Uncomment and configure after installing django-ckeditor and Pillow) ---
 # Add 'ckeditor' and 'ckeditor_uploader' to INSTALLED_APPS.
@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.urls import path, include # Ensure 'include' is imported
 from django.conf import settings
 from django.conf.urls.static import static
+from core import local_images
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +11,10 @@ urlpatterns = [
     # path('ckeditor/', include('ckeditor_uploader.urls')), # You'll add this when setting up CKEditor
 ]
 
+if settings.IMAGE_STORAGE == 'local':
+    # Originals and resized copies of CloudinaryField images, in any DEBUG mode (before MEDIA_URL below)
+    urlpatterns += [path(settings.LOCAL_IMAGES_URL.lstrip('/') + '<path:path>', local_images.serve, name='local_image')]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     # urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) # Usually not needed for runserver with DEBUG=True
\ No newline at end of file
@@ -1,5 +1,17 @@
 # core/admin.py
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.contenttypes.models import ContentType
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connection, models, transaction
+from django.utils.functional import cached_property
+from taggit.models import TaggedItem
+from . import facets
+from .instagram import start_import_job
+from .newsletter import start_dispatch
 from .models import ( # Import all the models you will register from your core/models.py
     HeroSlide,
     FeaturedHomepageArtwork,
@@ -9,12 +21,74 @@ from .models import ( # Import all the models you will register from your core/m
     InstagramImportedItem,
     BlogPost,
     Subscriber,
-    SocialLink
+    SocialLink,
+    InstagramImportJob,
+    NewsletterDispatch,
     # Add any other models from core/models.py that you register here
 )
 
 # Now your @admin.register decorators and admin classes will work:
 
+
+# --- Fast changelists for tables that only ever grow ---
+# COUNT(*) over the whole table and OFFSET paging both get slower with every row. These admins
+# show an estimated total and page with "?id__lt=<last id on this page>" (an index range scan)
+# instead of ?p=N. Sorting by a column falls back to the normal numbered pages.
+
+ESTIMATE_COUNTS_ABOVE = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        # PostgreSQL keeps a row estimate for every table; other databases get a real count.
+        query = self.object_list.query
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATE_COUNTS_ABOVE:
+                return row[0]
+        return super().count
+
+
+CURSOR_VAR = 'id__lt'
+
+
+class CursorChangeList(ChangeList):
+    def get_results(self, request):
+        if CURSOR_VAR in self.params and ORDER_VAR not in self.params:
+            self._get_cursor_page(request)
+        else:
+            super().get_results(request)
+        self.newest_page_query = self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])  # Keeps filters and search
+        self.next_page_query = None
+        if ORDER_VAR not in self.params and len(self.result_list) == self.list_per_page:
+            self.next_page_query = self.get_query_string({CURSOR_VAR: self.result_list[len(self.result_list) - 1].pk}, [PAGE_VAR])
+
+    def _get_cursor_page(self, request):
+        # Older pages are just the next list_per_page rows below the cursor; nothing is counted,
+        # so the deep pages this is for never run a COUNT(*) (estimated or not).
+        self.result_list = list(self.queryset[:self.list_per_page])
+        self.result_count = len(self.result_list)  # Rows on this page, for the actions bar
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)  # Never asked for a count
+
+
+class FastChangelistMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skips the second, unfiltered COUNT(*) next to the filtered one
+    ordering = ('-id',)  # Newest first, in primary key order so the cursor above can follow it
+    change_list_template = 'admin/core/fast_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+
 @admin.register(HeroSlide)
 class HeroSlideAdmin(admin.ModelAdmin):
     list_display = ('title', 'order', 'is_active', 'image_preview')
@@ -31,6 +105,7 @@ class HeroSlideAdmin(admin.ModelAdmin):
 class FeaturedHomepageArtworkAdmin(admin.ModelAdmin):
     list_display = ('artwork_title', 'order', 'is_active')
     list_editable = ('order', 'is_active')
+    list_select_related = ('artwork',)
     autocomplete_fields = ['artwork']
 
     def artwork_title(self, obj):
@@ -50,11 +125,34 @@ class AdditionalArtworkImageInline(admin.TabularInline):
     max_num = 5
     fields = ('image', 'caption', 'order')
 
+def _tagged_ids(model, **tag_lookup):
+    # Object ids as a subquery on taggit's table: filtering by it never duplicates rows (a join
+    # through `tags` would, and then the changelist needs DISTINCT over the whole result).
+    return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(model), **tag_lookup).values('object_id')
+
+
+class TagListFilter(admin.SimpleListFilter):
+    # Built from the precomputed tag counts (core/facets.py) instead of listing every tag in
+    # taggit's table, whichever model it belongs to.
+    title = 'tag'
+    parameter_name = 'tag'
+    max_choices = 50
+
+    def lookups(self, request, model_admin):
+        return [(tag.slug, f"{tag.name} ({count})") for tag, count in facets.top_tags(model_admin.model, limit=self.max_choices)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(pk__in=_tagged_ids(queryset.model, tag__slug=self.value()))
+        return queryset
+
+
 @admin.register(Artwork)
 class ArtworkAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'date_uploaded_display')
-    list_filter = ('category', 'tags', 'date_uploaded')
-    search_fields = ('title', 'description', 'tags__name', 'category__name')
+    list_filter = ('category', TagListFilter, 'date_uploaded')
+    list_select_related = ('category',)
+    search_fields = ('title', 'description', 'category__name')  # Tag names are searched too, see get_search_results
     prepopulated_fields = {'slug': ('title',)}
     inlines = [AdditionalArtworkImageInline]
     fieldsets = (
@@ -66,13 +164,34 @@ class ArtworkAdmin(admin.ModelAdmin):
     date_uploaded_display.short_description = 'Date Uploaded'
     date_uploaded_display.admin_order_field = 'date_uploaded'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Same as the default search (every word must match one of the fields) plus tag names,
+        # matched through a subquery so no DISTINCT is needed.
+        for word in search_term.split():
+            matches = models.Q(pk__in=_tagged_ids(Artwork, tag__name__icontains=word))
+            for field in self.search_fields:
+                matches |= models.Q(**{f'{field}__icontains': word})
+            queryset = queryset.filter(matches)
+        return queryset, False
+
+
+class InstagramImportActionForm(ActionForm):
+    # Shown next to the actions dropdown; used by "Process into artworks".
+    category = forms.ModelChoiceField(
+        queryset=GalleryCategory.objects.all(),
+        required=False,
+        empty_label=f"Category: {settings.INSTAGRAM_IMPORT_CATEGORY}",
+    )
+
 
 @admin.register(InstagramImportedItem)
-class InstagramImportedItemAdmin(admin.ModelAdmin):
+class InstagramImportedItemAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('instagram_post_id_link', 'image_preview', 'imported_at', 'status', 'linked_artwork_admin_link')
     list_filter = ('status', 'imported_at')
+    list_select_related = ('created_artwork',)
     readonly_fields = ('instagram_post_id', 'image_url_from_instagram', 'caption_from_instagram', 'imported_at', 'created_artwork', 'image_preview_readonly')
-    actions = ['mark_as_pending_review', 'mark_as_ignored']
+    actions = ['mark_as_pending_review', 'mark_as_ignored', 'process_into_artworks']
+    action_form = InstagramImportActionForm
     # ... (rest of InstagramImportedItemAdmin methods as defined before) ...
     def image_preview(self, obj):
         from django.utils.html import format_html
@@ -108,13 +227,53 @@ class InstagramImportedItemAdmin(admin.ModelAdmin):
         self.message_user(request, f"{queryset.count()} item(s) marked as 'Ignored'.")
     mark_as_ignored.short_description = "Mark selected as 'Ignored'"
 
+    def process_into_artworks(self, request, queryset):
+        from django.urls import reverse
+        from django.utils.html import format_html
+        item_ids = list(queryset.filter(created_artwork__isnull=True).values_list('pk', flat=True))
+        if not item_ids:
+            self.message_user(request, "All selected items have already been processed.", messages.WARNING)
+            return
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        category = form.cleaned_data['category'] if form.is_valid() else None
+        if category is None:
+            category, _ = GalleryCategory.objects.get_or_create(name=settings.INSTAGRAM_IMPORT_CATEGORY)
+        job = InstagramImportJob.objects.create(item_ids=item_ids, category=category, total=len(item_ids))
+        start_import_job(job)
+        link = reverse('admin:core_instagramimportjob_change', args=[job.pk])
+        self.message_user(request, format_html(
+            'Processing {} item(s) in the background. <a href="{}">Follow its progress here</a>.', len(item_ids), link
+        ))
+    process_into_artworks.short_description = "Process selected into artworks"
+
+
+@admin.register(InstagramImportJob)
+class InstagramImportJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'progress', 'failed', 'category', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('category',)
+    readonly_fields = ('status', 'progress', 'total', 'processed', 'failed', 'category', 'errors', 'created_at', 'started_at', 'finished_at')
+    exclude = ('item_ids',)
+
+    def has_add_permission(self, request):
+        return False  # Jobs are created by the "Process selected into artworks" action
+
+    def progress(self, obj):
+        done = obj.processed + obj.failed
+        percent = round(100 * done / obj.total) if obj.total else 100
+        return f"{done} / {obj.total} ({percent}%)"
+    progress.short_description = 'Progress'
+
 
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
     list_display = ('title', 'author_name', 'publish_date', 'was_published_recently')
-    list_filter = ('publish_date', 'tags')
+    list_filter = ('publish_date', TagListFilter)
+    list_select_related = ('author',)
     search_fields = ('title', 'content', 'summary')
     prepopulated_fields = {'slug': ('title',)}
+    actions = ['send_to_subscribers']
     # ... (rest of BlogPostAdmin methods as defined before) ...
     def save_model(self, request, obj, form, change):
         if not obj.pk:
@@ -134,9 +293,44 @@ class BlogPostAdmin(admin.ModelAdmin):
     was_published_recently.boolean = True
     was_published_recently.short_description = 'Published recently?'
 
+    def send_to_subscribers(self, request, queryset):
+        # Sending happens in the background (see core/newsletter.py); one dispatch per post, ever.
+        already_sent = queryset.filter(newsletter_dispatches__isnull=False).distinct()
+        started = 0
+        for post in queryset.exclude(pk__in=already_sent):
+            try:
+                with transaction.atomic():
+                    dispatch = NewsletterDispatch.objects.create(blog_post=post)
+            except IntegrityError:  # Sent from another request since we checked
+                continue
+            start_dispatch(dispatch)
+            started += 1
+        if started:
+            self.message_user(request, f"Emailing {started} post(s) to active subscribers. Progress is under 'Newsletter Dispatches'.")
+        skipped = queryset.count() - started
+        if skipped:
+            self.message_user(request, f"Skipped {skipped} post(s) already emailed to subscribers.", messages.WARNING)
+    send_to_subscribers.short_description = "Email selected posts to subscribers"
+
+
+@admin.register(NewsletterDispatch)
+class NewsletterDispatchAdmin(admin.ModelAdmin):
+    list_display = ('blog_post', 'status', 'progress', 'failed_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('blog_post',)
+    readonly_fields = ('blog_post', 'status', 'progress', 'total', 'sent_count', 'failed_count', 'errors', 'created_at', 'started_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        return False  # Dispatches are created by the "Email selected posts to subscribers" action
+
+    def progress(self, obj):
+        percent = round(100 * obj.sent_count / obj.total) if obj.total else 0
+        return f"{obj.sent_count} / {obj.total} ({percent}%)"
+    progress.short_description = 'Progress'
+
 
 @admin.register(Subscriber)
-class SubscriberAdmin(admin.ModelAdmin):
+class SubscriberAdmin(FastChangelistMixin, admin.ModelAdmin):
     list_display = ('email', 'is_active', 'subscribed_at')
     list_filter = ('is_active', 'subscribed_at')
     search_fields = ('email',)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects the cache invalidation receivers)
+        from django.conf import settings
+        if 'core.metrics.RequestMetricsMiddleware' in settings.MIDDLEWARE:
+            from . import metrics
+            metrics.install()
+        if settings.IMAGE_STORAGE == 'local':
+            from . import local_images
+            local_images.configure_urls()
@@ -0,0 +1,130 @@
+# core/async_views.py
+# Async versions of the public pages and the gallery API, used instead of the ones in core/views.py when the site
+# runs under ASGI with DJANGO_ASYNC_VIEWS=True (an explicit opt-in; see ASYNC_VIEWS in settings
+# and core/urls.py).
+#
+# Queries go through Django's async ORM, so a slow client or a slow query doesn't hold a worker
+# thread. Template rendering stays synchronous and runs in one sync_to_async call at the end:
+# the session, messages and CSRF machinery it touches are sync-only in Django 4.2, and all the
+# data it needs has been loaded by then (social links included, so the context processor
+# doesn't query). The cache is read through caching's a* helpers, which keep its file I/O off the
+# event loop.
+#
+# Only the home, gallery and blog pages and the all-artworks API have async versions. The artwork
+# page, search, the small category/tag APIs and the newsletter forms stay sync under ASGI too.
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from . import caching, richtext
+from .conditional import (
+    GALLERY_INDEX_VERSION_KEYS, HOME_VERSION_KEYS, blog_detail_sources, blog_list_sources, conditional_page,
+    gallery_category_sources, gallery_index_sources, home_sources,
+)
+from .models import BlogPost, FeaturedHomepageArtwork, GalleryCategory, HeroSlide
+from .views import (
+    _artworks_page_data, _artworks_page_queryset, _blog_detail_queryset, _blog_list_context, _blog_list_queryset,
+    _compact_json_response, _gallery_category_context, _gallery_category_queryset, _gallery_etag,
+    _gallery_index_entry, _gallery_index_queryset,
+)
+
+
+@conditional_page(home_sources, HOME_VERSION_KEYS)
+async def home_view(request):
+    # Reading request.user and the messages may load the session, which is sync-only.
+    cache_key = await sync_to_async(caching.homepage_cache_key)(request)
+    if cache_key:
+        cached_html = await caching.aget_cached_page(cache_key)
+        if cached_html is not None:
+            return HttpResponse(caching.insert_csrf_token(cached_html, request))
+
+    hero_slides = [slide async for slide in HeroSlide.objects.filter(is_active=True).order_by('order')]
+    featured_artworks = [
+        featured.artwork
+        async for featured in FeaturedHomepageArtwork.objects.filter(is_active=True).select_related('artwork').order_by('order')[:3]
+        if featured.artwork
+    ]
+    context = {
+        'hero_slides': hero_slides,
+        'featured_artworks': featured_artworks,
+        'social_links': await caching.aget_active_social_links(),
+    }
+    if cache_key is None:
+        return await sync_to_async(render)(request, 'core/home.html', context)
+
+    context['csrf_token'] = caching.CSRF_TOKEN_PLACEHOLDER
+    html = await sync_to_async(render_to_string)('core/home.html', context, request)
+    await caching.aset_cached_page(cache_key, html)
+    return HttpResponse(caching.insert_csrf_token(html, request))
+
+
+async def _gallery_index():
+    return [_gallery_index_entry(category) async for category in _gallery_index_queryset()]
+
+
+@conditional_page(gallery_index_sources, GALLERY_INDEX_VERSION_KEYS)
+async def gallery_home_view(request):
+    context = {
+        'categories': await caching.aget_or_build_gallery_data('index', _gallery_index),
+        'social_links': await caching.aget_active_social_links(),
+    }
+    return await sync_to_async(render)(request, 'core/gallery_home.html', context)
+
+
+@conditional_page(gallery_category_sources)
+async def gallery_category_view(request, category_slug):
+    try:
+        category = await GalleryCategory.objects.aget(slug=category_slug)
+    except GalleryCategory.DoesNotExist:
+        raise Http404("No GalleryCategory matches the given query.")
+    artworks = [artwork async for artwork in _gallery_category_queryset(request, category)]
+    context = {
+        **_gallery_category_context(category, artworks),
+        'social_links': await caching.aget_active_social_links(),
+    }
+    return await sync_to_async(render)(request, 'core/gallery_category.html', context)
+
+
+@conditional_page(blog_list_sources)
+async def blog_list_view(request):
+    posts = [post async for post in _blog_list_queryset(request)]
+    context = {
+        **_blog_list_context(request, posts),
+        'social_links': await caching.aget_active_social_links(),
+    }
+    return await sync_to_async(render)(request, 'core/blog_list.html', context)
+
+
+@conditional_page(blog_detail_sources)
+async def blog_detail_view(request, slug):
+    try:
+        post = await _blog_detail_queryset().aget(slug=slug)
+    except BlogPost.DoesNotExist:
+        raise Http404("No BlogPost matches the given query.")
+    if post.rendition_version < richtext.RENDITION_VERSION:
+        # Built for this response only, as in the sync view.
+        await post.arefresh_from_db(fields=['content'])
+        richtext.apply_rendition(post)
+    context = {
+        'post': post,
+        'social_links': await caching.aget_active_social_links(),
+    }
+    return await sync_to_async(render)(request, 'core/blog_detail.html', context)
+
+
+async def all_artworks_view(request):
+    if request.method not in ('GET', 'HEAD'):  # require_GET only handles sync views in Django 4.2
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    etag = _gallery_etag(request, await caching.aget_version(caching.GALLERY_VERSION_KEY))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        artworks, limit = _artworks_page_queryset(request)
+    except ValueError as exc:
+        return _compact_json_response({'error': str(exc)}, etag, status=400)
+    # Iterating a queryset asynchronously still runs its prefetch_related lookups.
+    page = [artwork async for artwork in artworks]
+    return _compact_json_response(_artworks_page_data(page, limit), etag)
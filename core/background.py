@@ -0,0 +1,45 @@
+# core/background.py
+# Minimal "run this after the request" helper for jobs started from the admin. There is no task
+# queue in this project, so long jobs run on a daemon thread of the web process; each job type
+# also has a management command that can run (or resume) it from cron or a separate worker.
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _run(target, args):
+    close_old_connections()
+    try:
+        target(*args)
+    except Exception:
+        logger.exception("Background job %s failed", getattr(target, '__name__', target))
+    finally:
+        connection.close()  # Each thread gets its own connection, which would otherwise leak
+
+
+def start_in_background(target, *args):
+    # Waits for the current transaction to commit so the thread can see the rows it was given.
+    transaction.on_commit(lambda: threading.Thread(target=_run, args=(target, args), daemon=True).start())
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def submit_to_pool(target, *args):
+    # For many small jobs (one per saved image, say): they queue up for a few shared threads
+    # (BACKGROUND_POOL_WORKERS) instead of each starting its own. Also waits for the commit.
+    # With no workers the job runs in this thread once the transaction commits.
+    global _pool
+    workers = getattr(settings, 'BACKGROUND_POOL_WORKERS', 2)
+    if not workers:
+        transaction.on_commit(lambda: target(*args))
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='core-background')
+    transaction.on_commit(lambda: _pool.submit(_run, target, args))
@@ -0,0 +1,155 @@
+# core/caching.py
+import time
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from .metrics import record_cache_lookup
+from .models import SocialLink
+
+# The rendered homepage is stored with this marker where the CSRF token belongs
+# (the footer mailing-list form), so one cached copy can be served to every
+# visitor and each response still gets that visitor's own token.
+CSRF_TOKEN_PLACEHOLDER = '__core_csrf_token_placeholder__'
+
+HOMEPAGE_CACHE_KEY = 'core:homepage:{audience}'
+HOMEPAGE_AUDIENCES = ('anonymous', 'authenticated')
+
+
+def homepage_cache_key(request):
+    # Pages that still have flash messages to show are rendered live and never stored,
+    # otherwise one visitor's "Thanks for subscribing!" would be replayed to everyone.
+    if len(get_messages(request)):
+        return None
+    audience = 'authenticated' if request.user.is_authenticated else 'anonymous'
+    return HOMEPAGE_CACHE_KEY.format(audience=audience)
+
+
+def get_cached_page(cache_key):
+    html = cache.get(cache_key)
+    record_cache_lookup(html is not None)
+    return html
+
+
+def set_cached_page(cache_key, html):
+    timeout = getattr(settings, 'HOMEPAGE_CACHE_TIMEOUT', 60 * 60)
+    cache.set(cache_key, html, timeout)
+
+
+# The a* versions below are for async views. They go through cache.aget()/aset(), which run the
+# backend off the event loop: the production cache (FileBasedCache) reads and writes files.
+
+async def aget_cached_page(cache_key):
+    html = await cache.aget(cache_key)
+    record_cache_lookup(html is not None)
+    return html
+
+
+async def aset_cached_page(cache_key, html):
+    timeout = getattr(settings, 'HOMEPAGE_CACHE_TIMEOUT', 60 * 60)
+    await cache.aset(cache_key, html, timeout)
+
+
+def insert_csrf_token(html, request):
+    # get_token() also flags the CSRF cookie to be sent with this response.
+    return html.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request))
+
+
+def invalidate_homepage():
+    cache.delete_many([HOMEPAGE_CACHE_KEY.format(audience=audience) for audience in HOMEPAGE_AUDIENCES])
+    bump_version(HOMEPAGE_VERSION_KEY)  # Retires the homepage's cached ETag signature (core/conditional.py)
+
+
+# Version counters let every worker tell, with a single cache read, whether something it has
+# kept (or an ETag it handed out) is still current. Saves bump the counter; nothing is deleted.
+SOCIAL_LINKS_VERSION_KEY = 'core:social_links:version'
+HOMEPAGE_VERSION_KEY = 'core:homepage:version'
+GALLERY_VERSION_KEY = 'core:gallery:version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    record_cache_lookup(version is not None)
+    if version is None:
+        # Seeding from the clock (rather than 1) means a counter lost to eviction or a cache
+        # restart can never match a version some worker is still holding.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    record_cache_lookup(version is not None)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # Counter not set yet (or evicted)
+        cache.set(key, time.time_ns(), None)
+
+
+# Active social links are kept in each worker process and only reloaded when their version
+# counter moves on. Checking the counter is a cache read, so the footer costs no SQL at all.
+_social_links = (None, [])  # (version, links) - replaced as a whole so threads never see half an update
+
+
+def get_active_social_links():
+    global _social_links
+    version = get_version(SOCIAL_LINKS_VERSION_KEY)
+    cached_version, links = _social_links
+    if version is None or version != cached_version:
+        links = list(SocialLink.objects.filter(is_active=True).order_by('order'))
+        _social_links = (version, links)
+    return links
+
+
+async def aget_active_social_links():
+    # Same as get_active_social_links(), for async views (the ORM can't be used synchronously there).
+    global _social_links
+    version = await aget_version(SOCIAL_LINKS_VERSION_KEY)
+    cached_version, links = _social_links
+    if version is None or version != cached_version:
+        links = [link async for link in SocialLink.objects.filter(is_active=True).order_by('order')]
+        _social_links = (version, links)
+    return links
+
+
+def bump_social_links_version():
+    bump_version(SOCIAL_LINKS_VERSION_KEY)
+
+
+def bump_gallery_version():
+    bump_version(GALLERY_VERSION_KEY)
+
+
+def gallery_cache_key(name, version):
+    # Keys include the gallery version, so a bump retires every cached gallery entry at once
+    # (the old ones simply expire).
+    return f'core:gallery:{name}:{version}'
+
+
+def get_or_build_gallery_data(name, build):
+    cache_key = gallery_cache_key(name, get_version(GALLERY_VERSION_KEY))
+    data = cache.get(cache_key)
+    record_cache_lookup(data is not None)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, getattr(settings, 'GALLERY_CACHE_TIMEOUT', 24 * 60 * 60))
+    return data
+
+
+async def aget_or_build_gallery_data(name, abuild):
+    # `abuild` is a coroutine function.
+    cache_key = gallery_cache_key(name, await aget_version(GALLERY_VERSION_KEY))
+    data = await cache.aget(cache_key)
+    record_cache_lookup(data is not None)
+    if data is None:
+        data = await abuild()
+        await cache.aset(cache_key, data, getattr(settings, 'GALLERY_CACHE_TIMEOUT', 24 * 60 * 60))
+    return data
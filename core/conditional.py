@@ -0,0 +1,178 @@
+# core/conditional.py
+# Conditional GET (304 Not Modified) for the public pages, so crawlers and browsers revalidating
+# a page don't cost a full render.
+#
+# Each page lists the querysets it is built from, as (queryset, timestamp field) pairs. A single
+# query (one MAX()/COUNT() per source, UNION ALL'd together) gives the ETag: the newest timestamps
+# and the row counts (deleting a row doesn't move MAX()), plus the visitor's signed-in state and
+# SITE_CHROME_VERSION (a deploy can change the templates without touching any row). A matching
+# If-None-Match gets a 304 before the view itself runs.
+#
+# No Last-Modified is sent: deletes and deploys change the page without changing any timestamp,
+# so a client revalidating with If-Modified-Since alone would be told a stale copy is current.
+# Tag changes do touch updated_at (see core/signals.py), since pages show tags.
+#
+# Every page shows the social links in its footer, so those are always included.
+#
+# Pages that are themselves cached (home, gallery index) can name the version counters their cache
+# is retired by (core/caching.py). Their signature is then kept in the cache under those counters,
+# so a visit to a cached page costs cache reads and no query at all.
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response, patch_cache_control
+from . import caching
+from .models import AdditionalArtworkImage, Artwork, BlogPost, FeaturedHomepageArtwork, GalleryCategory, HeroSlide, RelatedArtwork, SocialLink
+
+SIGNATURE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def source_freshness(sources):
+    # Returns [(newest timestamp or None, row count), ...] for [(queryset, field), ...], in order.
+    parts = [
+        queryset.order_by().values(source=Value(number, IntegerField())).annotate(latest=Max(field), rows=Count('pk'))
+        for number, (queryset, field) in enumerate(sources)
+    ]
+    rows = sorted(parts[0].union(*parts[1:], all=True), key=lambda row: row['source'])
+    return [(row['latest'], row['rows']) for row in rows]
+
+
+def page_freshness(sources):
+    # Returns (newest timestamp or None, signature string) for [(queryset, field), ...].
+    rows = source_freshness(sources)
+    latest = max((moment for moment, _ in rows if moment is not None), default=None)
+    signature = ';'.join(f"{moment and moment.isoformat()}/{count}" for moment, count in rows)
+    return latest, signature
+
+
+def _page_signature(sources, version_keys, name):
+    sources = [*sources, (SocialLink.objects.all(), 'updated_at')]
+    if not version_keys:
+        return page_freshness(sources)[1]
+    # The counters are read before the query: changes bump them after committing, so a signature
+    # is never stored under versions newer than the rows it was built from.
+    versions = ':'.join(str(caching.get_version(key)) for key in version_keys)
+    cache_key = f'core:page_signature:{name}:{versions}'
+    signature = cache.get(cache_key)
+    if signature is None:
+        signature = page_freshness(sources)[1]
+        cache.set(cache_key, signature, SIGNATURE_CACHE_TIMEOUT)
+    return signature
+
+
+def _page_etag(request, get_sources, version_keys, *args, **kwargs):
+    # None when the page must always be rendered: a page with flash messages to show can't be
+    # answered from the browser's copy.
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        return None
+    signature = _page_signature(get_sources(request, *args, **kwargs), version_keys, get_sources.__name__)
+    audience = 'authenticated' if request.user.is_authenticated else 'anonymous'
+    key = f'{settings.SITE_CHROME_VERSION}:{audience}:{request.get_full_path()}:{signature}'
+    # Weak, because the page embeds a per-response CSRF token and so isn't byte-for-byte the same.
+    return f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _add_etag(response, etag):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, no_cache=True)  # Revalidate every time; it's cheap now
+    return response
+
+
+def conditional_page(get_sources, version_keys=()):
+    # Like django.views.decorators.http.condition(etag_func=...), with the ETag from one query.
+    # `get_sources(request, *args, **kwargs)` returns the page's [(queryset, field), ...].
+    # `version_keys` (cached pages only) must be bumped by every change to those sources, and the
+    # sources must not depend on the request.
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_view(request, *args, **kwargs):
+                # Messages and request.user may load the session, which is sync-only.
+                etag = await sync_to_async(_page_etag)(request, get_sources, version_keys, *args, **kwargs)
+                if etag is None:
+                    return await view(request, *args, **kwargs)
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return _add_etag(not_modified, etag)
+                return _add_etag(await view(request, *args, **kwargs), etag)
+            return async_view
+
+        @wraps(view)
+        def sync_view(request, *args, **kwargs):
+            etag = _page_etag(request, get_sources, version_keys, *args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return _add_etag(not_modified, etag)
+            return _add_etag(view(request, *args, **kwargs), etag)
+        return sync_view
+    return decorator
+
+
+# --- Page sources ---
+
+def home_sources(request):
+    return [
+        (HeroSlide.objects.all(), 'updated_at'),
+        (FeaturedHomepageArtwork.objects.all(), 'updated_at'),
+        (Artwork.objects.filter(featuredhomepageartwork__isnull=False), 'updated_at'),
+    ]
+
+
+# Every change to home_sources or the social links invalidates the homepage (core/signals.py).
+HOME_VERSION_KEYS = (caching.HOMEPAGE_VERSION_KEY,)
+
+
+def gallery_index_sources(request):
+    return [
+        (GalleryCategory.objects.all(), 'updated_at'),
+        (Artwork.objects.all(), 'updated_at'),
+    ]
+
+
+GALLERY_INDEX_VERSION_KEYS = (caching.GALLERY_VERSION_KEY, caching.SOCIAL_LINKS_VERSION_KEY)
+
+
+def blog_list_sources(request):
+    posts = BlogPost.objects.all()
+    if request.GET.get('tag'):
+        posts = posts.filter(tags__slug=request.GET['tag'])
+    return [(posts, 'updated_at')]
+
+
+def blog_detail_sources(request, slug):
+    return [(BlogPost.objects.filter(slug=slug), 'updated_at')]
+
+
+def gallery_category_sources(request, category_slug):
+    return [
+        (GalleryCategory.objects.filter(slug=category_slug), 'updated_at'),
+        (Artwork.objects.filter(category__slug=category_slug), 'updated_at'),
+    ]
+
+
+def artwork_detail_sources(request, artwork_slug):
+    # The related strip's rows are rewritten whenever the list is recomputed (core/related.py).
+    related = RelatedArtwork.objects.filter(artwork__slug=artwork_slug)
+    return [
+        (Artwork.objects.filter(slug=artwork_slug), 'updated_at'),
+        (GalleryCategory.objects.filter(artworks__slug=artwork_slug), 'updated_at'),
+        (AdditionalArtworkImage.objects.filter(artwork__slug=artwork_slug), 'updated_at'),
+        (related, 'computed_at'),
+        (Artwork.objects.filter(pk__in=related.values('related_id')), 'updated_at'),
+    ]
+
+
+def sitemap_sources(request, *args, **kwargs):
+    # Sitemaps and feeds list every artwork, category and post.
+    return [
+        (Artwork.objects.all(), 'updated_at'),
+        (GalleryCategory.objects.all(), 'updated_at'),
+        (BlogPost.objects.all(), 'updated_at'),
+    ]
@@ -1,12 +1,18 @@
 # core/context_processors.py
-from .models import SocialLink # Import your SocialLink model
+from django.conf import settings
+from .caching import SOCIAL_LINKS_VERSION_KEY, get_active_social_links, get_version
 
 def global_context(request):
     # This function makes its return dictionary available in all templates
-    active_social_links = SocialLink.objects.filter(is_active=True).order_by('order')
     return {
-        'social_links': active_social_links,
+        # Passed uncalled: the template only calls it when the cached footer fragment has to be
+        # re-rendered. Social links come from a per-process cache (see core/caching.py) anyway.
+        'social_links': get_active_social_links,
+        # Keys for the cached header/footer fragments in base.html
+        'site_chrome_version': settings.SITE_CHROME_VERSION,
+        'site_chrome_timeout': settings.SITE_CHROME_CACHE_TIMEOUT,
+        'social_links_version': get_version(SOCIAL_LINKS_VERSION_KEY),
         # You can add other global context variables here later if needed
         # For example:
         # 'site_name': "Caroline J Hill Art",
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,91 @@
+# core/facets.py
+# Tag counts for tag clouds and "filter by tag" sidebars, read from the TagCount table instead
+# of a GROUP BY over taggit's generic TaggedItem table on every request.
+#
+# Counts are recalculated per tag (only the tags that changed) after each commit by the signal
+# handlers in core/signals.py; bulk_add_tags() schedules the same. Artwork counts are also kept
+# per GalleryCategory (scope = category id), with scope 0 holding the count across everything.
+# `python manage.py rebuild_tag_counts` recalculates the whole table.
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+from taggit.models import TaggedItem
+from .models import Artwork, BlogPost, TagCount
+
+ALL_ITEMS = 0
+RECOUNT_CHUNK_SIZE = 500
+TAGGED_MODELS = (Artwork, BlogPost)
+
+
+def _counts(model, content_type, tag_ids):
+    counts = {}
+    totals = (
+        TaggedItem.objects.filter(content_type=content_type, tag_id__in=tag_ids)
+        .values('tag_id').annotate(n=Count('id')).order_by()
+    )
+    for row in totals:
+        counts[row['tag_id'], ALL_ITEMS] = row['n']
+    if model is Artwork:
+        per_category = (
+            Artwork.objects.filter(tags__in=tag_ids)
+            .values('tags', 'category').annotate(n=Count('id')).order_by()
+        )
+        for row in per_category:
+            counts[row['tags'], row['category']] = row['n']
+    return counts
+
+
+def recount(model, tag_ids):
+    tag_ids = list(set(tag_ids))
+    if not tag_ids:
+        return
+    content_type = ContentType.objects.get_for_model(model)
+    for start in range(0, len(tag_ids), RECOUNT_CHUNK_SIZE):
+        chunk = tag_ids[start:start + RECOUNT_CHUNK_SIZE]
+        counts = _counts(model, content_type, chunk)
+        with transaction.atomic():
+            # Zero the old rows, upsert the fresh counts, then drop whatever is still zero
+            # (tags no longer used, or no longer used in a category).
+            TagCount.objects.filter(content_type=content_type, tag_id__in=chunk).update(count=0)
+            TagCount.objects.bulk_create(
+                [
+                    TagCount(content_type=content_type, tag_id=tag_id, scope=scope, count=n)
+                    for (tag_id, scope), n in counts.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['content_type', 'tag', 'scope'],
+                update_fields=['count'],
+            )
+            TagCount.objects.filter(content_type=content_type, tag_id__in=chunk, count=0).delete()
+
+
+def recount_on_commit(model, tag_ids):
+    tag_ids = set(tag_ids)
+    if tag_ids:
+        transaction.on_commit(lambda: recount(model, tag_ids))
+
+
+def rebuild(models=None):
+    rebuilt = 0
+    for model in models or TAGGED_MODELS:
+        content_type = ContentType.objects.get_for_model(model)
+        tag_ids = TaggedItem.objects.filter(content_type=content_type).values_list('tag_id', flat=True).distinct()
+        with transaction.atomic():
+            TagCount.objects.filter(content_type=content_type).delete()
+            recount(model, tag_ids)
+        rebuilt += TagCount.objects.filter(content_type=content_type, scope=ALL_ITEMS).count()
+    return rebuilt
+
+
+def top_tags(model, limit=20, category=None):
+    # Returns [(tag, count), ...], most used first. `category` (a GalleryCategory or its id)
+    # limits artwork counts to that category.
+    scope = ALL_ITEMS
+    if category is not None:
+        scope = getattr(category, 'pk', category)
+    rows = (
+        TagCount.objects.filter(content_type=ContentType.objects.get_for_model(model), scope=scope)
+        .select_related('tag')
+        .order_by('-count', 'tag__name')[:limit]
+    )
+    return [(row.tag, row.count) for row in rows]
@@ -0,0 +1,133 @@
+# core/images.py
+# Storing image bytes we fetched or generated ourselves (imports, syncs) rather than files uploaded
+# through an admin form, which CloudinaryField.pre_save already handles.
+#
+# Also image analysis: for each image in ANALYSED_IMAGE_FIELDS we store its intrinsic width and
+# height, a tiny JPEG placeholder (LQIP, as a data: URI) and its dominant colour, so templates can
+# reserve the right space and show something before the real image arrives. New and replaced
+# images are analysed on the background pool after the save (see core/signals.py), imports analyse
+# the bytes they upload, and `manage.py analyse_images` backfills the rest.
+import base64
+import io
+import logging
+import requests
+from cloudinary import uploader
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from . import caching, local_images
+from .models import AdditionalArtworkImage, Artwork, HeroSlide
+
+logger = logging.getLogger(__name__)
+
+# Model -> image field. The results go in <field>_width, _height, _placeholder and _color.
+ANALYSED_IMAGE_FIELDS = {
+    Artwork: 'primary_image',
+    AdditionalArtworkImage: 'image',
+    HeroSlide: 'image',
+}
+ANALYSIS_KEYS = ('width', 'height', 'placeholder', 'color')
+PLACEHOLDER_SIZE = 16  # Longest side in pixels; the browser scales (and blurs) it up
+PLACEHOLDER_QUALITY = 40
+COLOR_SAMPLE_SIZE = 64
+FETCH_TIMEOUT = 30
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}  # EXIF orientations that swap width and height
+
+
+def upload_image(content, filename):
+    # Returns a CloudinaryResource that can be assigned straight to a CloudinaryField.
+    # Safe to call from worker threads; each call is an independent HTTPS request.
+    file = io.BytesIO(content)
+    file.name = filename
+    if settings.IMAGE_STORAGE == 'local':
+        return local_images.store(file)
+    return uploader.upload_resource(file, type='upload', resource_type='image')
+
+
+def analyse_image(content):
+    # Returns {'width', 'height', 'placeholder', 'color'} for an image's bytes.
+    with Image.open(io.BytesIO(content)) as image:
+        # Size as browsers display it, i.e. after EXIF rotation; read before draft() shrinks it.
+        width, height = image.size
+        if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+            width, height = height, width
+        # JPEGs can be decoded at a fraction of their size, which is all the rest needs.
+        image.draft('RGB', (COLOR_SAMPLE_SIZE * 2, COLOR_SAMPLE_SIZE * 2))
+        sample = ImageOps.exif_transpose(image).convert('RGB')
+    sample.thumbnail((COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+
+    placeholder = sample.copy()
+    placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    placeholder.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+
+    # Dominant colour: the most common colour once the image is reduced to a small palette.
+    palette_image = sample.quantize(colors=5)
+    _, index = max(palette_image.getcolors())
+    red, green, blue = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return {
+        'width': width,
+        'height': height,
+        'placeholder': 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+        'color': f'#{red:02x}{green:02x}{blue:02x}',
+    }
+
+
+def analysis_fields(model):
+    field = ANALYSED_IMAGE_FIELDS[model]
+    return [f'{field}_{key}' for key in ANALYSIS_KEYS]
+
+
+def try_analyse_image(content):
+    # analyse_image() for code that has the bytes anyway (imports); None if Pillow can't read them.
+    try:
+        return analyse_image(content)
+    except (OSError, Image.DecompressionBombError) as exc:  # Unreadable files raise OSErrors
+        logger.warning("Could not analyse an image: %s", exc)
+        return None
+
+
+def analysis_values(model, result):
+    # Field values for `model` from an analyse_image() result, e.g. Artwork(..., **analysis_values(Artwork, result)).
+    if result is None:
+        return {}
+    return dict(zip(analysis_fields(model), [result[key] for key in ANALYSIS_KEYS]))
+
+
+def _fetch(image):
+    if settings.IMAGE_STORAGE == 'local':
+        return local_images.read_original(image)
+    response = requests.get(image.url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def analyse_rows(model, pks):
+    # Analyses the images of the given rows and stores the results. Returns how many succeeded.
+    field = ANALYSED_IMAGE_FIELDS[model]
+    analysed = 0
+    # `stored` is the column as saved; a CloudinaryResource doesn't always turn back into it.
+    rows = model.objects.filter(pk__in=pks).annotate(stored=Cast(field, TextField()))
+    for pk, image, stored in rows.values_list('pk', field, 'stored'):
+        if not image:
+            continue
+        try:
+            content = _fetch(image)
+        except (requests.RequestException, OSError) as exc:  # OSError: a missing local original
+            logger.warning("Could not fetch the %s %s image: %s", model.__name__, pk, exc)
+            continue
+        changes = analysis_values(model, try_analyse_image(content))  # Empty if unreadable
+        if not changes:
+            continue
+        if hasattr(model, 'updated_at'):
+            changes['updated_at'] = timezone.now()  # The page now renders differently: new ETag
+        # The image may have been replaced while it was fetched; its analysis then no longer applies.
+        if model.objects.filter(pk=pk, **{field: stored}).update(**changes):
+            analysed += 1
+    if analysed:
+        # update() sends no signals, so drop the pages that were cached without the new details.
+        caching.invalidate_homepage()
+        caching.bump_gallery_version()
+    return analysed
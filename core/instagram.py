@@ -0,0 +1,270 @@
+# core/instagram.py
+# Pulls posts from the Instagram Graph API into InstagramImportedItem.
+#
+# Media-list pages are requested with every field an import needs (caption, image URL, ...), so
+# each page is one API call however many posts on it are new. Pages come one at a time, since each
+# holds the cursor for the next, so the only concurrency is fetching the next page while this one
+# is saved: one background thread and one keep-alive connection.
+#
+# The second half of this module turns imported posts into Artworks (the "Process into artworks"
+# admin action), in batches, on a background thread or via `manage.py process_instagram_imports`.
+from concurrent.futures import ThreadPoolExecutor
+import re
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import caching, related, search
+from .background import start_in_background
+from .images import analysis_values, try_analyse_image, upload_image
+from .slugs import assign_unique_slugs
+from .models import Artwork, InstagramImportedItem, InstagramImportJob, InstagramSyncState
+from .tagging import bulk_add_tags
+
+MEDIA_FIELDS = 'id,caption,media_type,media_url,thumbnail_url,timestamp'
+
+
+class InstagramAPIError(Exception):
+    pass
+
+
+def pooled_session(workers):
+    # One keep-alive pool sized to the number of worker threads, with retries for rate limits.
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class InstagramClient:
+    def __init__(self, access_token=None, base_url=None, timeout=15):
+        self.access_token = access_token or settings.INSTAGRAM_ACCESS_TOKEN
+        if not self.access_token:
+            raise InstagramAPIError("No INSTAGRAM_ACCESS_TOKEN configured.")
+        self.base_url = (base_url or settings.INSTAGRAM_API_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.session = pooled_session(1)  # One request in flight at a time (see above)
+
+    def get(self, path, **params):
+        params['access_token'] = self.access_token
+        try:
+            response = self.session.get(f'{self.base_url}/{path}', params=params, timeout=self.timeout)
+        except requests.RequestException as exc:
+            raise InstagramAPIError(f"Request to {path} failed: {exc}") from exc
+        if response.status_code >= 400:
+            raise InstagramAPIError(f"Instagram API returned {response.status_code} for {path}: {response.text[:200]}")
+        return response.json()
+
+    def media_page(self, after=None, limit=None):
+        params = {'fields': MEDIA_FIELDS, 'limit': limit or settings.INSTAGRAM_PAGE_SIZE}
+        if after:
+            params['after'] = after
+        payload = self.get('me/media', **params)
+        paging = payload.get('paging', {})
+        # Graph API only includes "next" when there is another page to fetch.
+        next_cursor = paging.get('cursors', {}).get('after') if paging.get('next') else None
+        return payload.get('data', []), next_cursor
+
+    def close(self):
+        self.session.close()
+
+
+def _build_item(details):
+    # Videos are imported through their poster frame; carousels through their first image.
+    if details.get('media_type') == 'VIDEO':
+        image_url = details.get('thumbnail_url')
+    else:
+        image_url = details.get('media_url')
+    if not image_url:
+        return None
+    return InstagramImportedItem(
+        instagram_post_id=details['id'],
+        image_url_from_instagram=image_url,
+        caption_from_instagram=details.get('caption') or '',
+    )
+
+
+class InstagramSync:
+    def __init__(self, client, max_pages=None, log=None):
+        self.client = client
+        self.max_pages = max_pages
+        self.log = log or (lambda message: None)
+        self.created = 0
+        self.pages = 0
+
+    def run(self):
+        state = InstagramSyncState.load()
+        with ThreadPoolExecutor(max_workers=1) as pool:  # Fetches the next page
+            if not state.backfill_complete:
+                self._walk(pool, state, backfill=True)
+            # New posts appear at the top of the feed; stop at the first page holding a known post.
+            self._walk(pool, state, backfill=False)
+        state.last_synced_at = timezone.now()
+        state.save(update_fields=['last_synced_at'])
+        return self.created
+
+    def _save_new(self, items):
+        # Returns how many rows were inserted. ignore_conflicts skips posts a concurrent run
+        # imported since the check in _walk(), so those are counted out rather than assumed new.
+        post_ids = [item.instagram_post_id for item in items]
+        if not post_ids:
+            return 0
+        existing = InstagramImportedItem.objects.filter(instagram_post_id__in=post_ids)
+        with transaction.atomic():
+            before = existing.count()
+            InstagramImportedItem.objects.bulk_create(items, ignore_conflicts=True)
+            return existing.count() - before
+
+    def _walk(self, pool, state, backfill):
+        cursor = (state.backfill_cursor or None) if backfill else None
+        walked = 0
+        page_future = pool.submit(self.client.media_page, cursor)
+        while page_future is not None:
+            media, next_cursor = page_future.result()
+            media_ids = [details['id'] for details in media]
+            walked += 1
+            self.pages += 1
+            # max_pages bounds how much of the back catalogue one run imports.
+            out_of_pages = backfill and self.max_pages is not None and walked >= self.max_pages
+
+            known_ids = set(
+                InstagramImportedItem.objects.filter(instagram_post_id__in=media_ids)
+                .values_list('instagram_post_id', flat=True)
+            )
+            reached_known = not backfill and bool(known_ids)
+            # Ask for the next page before saving this one.
+            page_future = None
+            if next_cursor and not reached_known and not out_of_pages:
+                page_future = pool.submit(self.client.media_page, next_cursor)
+
+            items = [_build_item(details) for details in media if details['id'] not in known_ids]
+            items = [item for item in items if item is not None]
+            created = self._save_new(items)
+            self.created += created
+            self.log(f"Page {self.pages}: {len(media_ids)} post(s), {created} new.")
+
+            if backfill:
+                state.backfill_cursor = next_cursor or ''
+                state.backfill_complete = next_cursor is None
+                state.save(update_fields=['backfill_cursor', 'backfill_complete'])
+
+
+def sync_instagram(client=None, max_pages=None, log=None):
+    owns_client = client is None
+    client = client or InstagramClient()
+    try:
+        return InstagramSync(client, max_pages=max_pages, log=log).run()
+    finally:
+        if owns_client:
+            client.close()
+
+
+# --- Processing imported posts into Artworks ---
+
+HASHTAG_RE = re.compile(r'#(\w+)')
+TITLE_MAX_LENGTH = Artwork._meta.get_field('title').max_length
+
+
+def caption_hashtags(caption):
+    return HASHTAG_RE.findall(caption or '')
+
+
+def caption_title(item):
+    # First line of the caption with the hashtags taken out, e.g. "Guildford High Street #ink" -> "Guildford High Street"
+    text = HASHTAG_RE.sub('', item.caption_from_instagram or '').strip()
+    first_line = text.splitlines()[0].strip() if text else ''
+    return (first_line or f"Instagram post {item.instagram_post_id}")[:TITLE_MAX_LENGTH]
+
+
+class ArtworkPromotion:
+    def __init__(self, job, workers=None, batch_size=None):
+        self.job = job
+        self.workers = workers or settings.INSTAGRAM_SYNC_WORKERS
+        self.batch_size = batch_size or settings.INSTAGRAM_IMPORT_BATCH_SIZE
+        self.session = pooled_session(self.workers)
+
+    def _download_and_upload(self, item):
+        response = self.session.get(item.image_url_from_instagram, timeout=30)
+        response.raise_for_status()
+        # Analysed here, while we have the bytes, rather than fetched again later (see core/images.py).
+        return upload_image(response.content, f'instagram-{item.instagram_post_id}'), try_analyse_image(response.content)
+
+    def _process_batch(self, pool, items):
+        # Downloads and uploads run in parallel; only the database writes are serial.
+        futures = [(item, pool.submit(self._download_and_upload, item)) for item in items]
+        ready, images, errors = [], [], []
+        for item, future in futures:
+            try:
+                images.append(future.result())
+                ready.append(item)
+            except Exception as exc:  # One bad image shouldn't sink the whole batch
+                errors.append(f"{item.instagram_post_id}: {exc}")
+        if not ready:
+            return 0, errors
+
+        with transaction.atomic():
+            artworks = assign_unique_slugs([
+                Artwork(
+                    title=caption_title(item), primary_image=image, description=item.caption_from_instagram,
+                    category=self.job.category, **analysis_values(Artwork, analysis),
+                )
+                for item, (image, analysis) in zip(ready, images)
+            ], 'title')
+            Artwork.objects.bulk_create(artworks)
+            bulk_add_tags({artwork: caption_hashtags(item.caption_from_instagram) for item, artwork in zip(ready, artworks)})
+            for item, artwork in zip(ready, artworks):
+                item.created_artwork = artwork
+                item.status = 'processed'
+            InstagramImportedItem.objects.bulk_update(ready, ['created_artwork', 'status'])
+            # bulk_create/bulk_add_tags send no signals, so do what core/signals.py would have done.
+            search.index_artwork_ids([artwork.pk for artwork in artworks])
+            related.refresh_on_commit([artwork.pk for artwork in artworks])
+            transaction.on_commit(caching.bump_gallery_version)
+        return len(ready), errors
+
+    def run(self):
+        job = self.job
+        job.status, job.started_at = 'running', timezone.now()
+        job.processed, job.failed, job.errors = 0, 0, ''
+        job.save(update_fields=['status', 'started_at', 'processed', 'failed', 'errors'])
+        item_ids = list(job.item_ids)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for start in range(0, len(item_ids), self.batch_size):
+                    batch_ids = item_ids[start:start + self.batch_size]
+                    # Items already turned into artworks (e.g. by an earlier, interrupted run) are skipped.
+                    items = list(InstagramImportedItem.objects.filter(pk__in=batch_ids, created_artwork__isnull=True))
+                    done, errors = self._process_batch(pool, items)
+                    job.processed += done + (len(batch_ids) - len(items))
+                    job.failed += len(errors)
+                    if errors:
+                        job.errors += ''.join(f"{error}\n" for error in errors)
+                    job.save(update_fields=['processed', 'failed', 'errors'])
+        finally:
+            self.session.close()
+        job.status, job.finished_at = 'finished', timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
+
+
+def run_import_job(job):
+    try:
+        ArtworkPromotion(job).run()
+    except Exception as exc:
+        job.status, job.finished_at = 'failed', timezone.now()
+        job.errors += f"Job stopped: {exc}\n"
+        job.save(update_fields=['status', 'finished_at', 'errors'])
+        raise
+
+
+def start_import_job(job):
+    # Called from the admin action. Without in-process mode the job stays queued for the command.
+    if settings.INSTAGRAM_IMPORT_RUN_IN_PROCESS:
+        start_in_background(_run_queued_import_job, job.pk)
+
+
+def _run_queued_import_job(job_id):
+    run_import_job(InstagramImportJob.objects.select_related('category').get(pk=job_id))
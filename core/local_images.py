@@ -0,0 +1,334 @@
+# core/local_images.py
+# Local disk storage for CloudinaryField images, used when settings.IMAGE_STORAGE is 'local'
+# (DJANGO_IMAGE_STORAGE=local): dev, test and load-test runs without the network, or a
+# self-hosted fallback if Cloudinary is unavailable.
+#
+# Images keep exactly the shape they have on Cloudinary, so nothing else has to know where they
+# live: the database holds 'image/upload/v<version>/<public id>.<format>', and the Cloudinary SDK
+# still builds every URL (renditions, .url, srcsets). configure_urls() only points those URLs at
+# LOCAL_IMAGES_URL, where serve() answers them:
+#
+#   originals  LOCAL_IMAGES_ROOT/originals/<public id>.<format>, written once per upload
+#   resized    made with Pillow from the transformation in the URL (w_, h_, c_, f_, q_) the first
+#              time it's asked for, then kept in LOCAL_IMAGES_ROOT/cache. Only the renditions'
+#              transformations are made (core/renditions.py), so anonymous URLs can't ask for
+#              any size or quality. The cache is bounded by LOCAL_IMAGES_CACHE_MAX_BYTES; the least
+#              recently served files are deleted first.
+#
+# Files are written to a temporary name and renamed into place, so a reader never sees half an
+# image, and requests arriving together for the same missing size wait for one thread to make it
+# rather than each resizing the original. (Separate processes may both make it; the rename keeps
+# that harmless.)
+import glob
+import hashlib
+import io
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import cloudinary
+from cloudinary import CloudinaryResource
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.utils.text import slugify
+from django.views.decorators.http import require_safe
+from . import renditions
+
+# Format in the URL/public id -> (Pillow format, Content-Type)
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'gif': ('GIF', 'image/gif'),
+    'webp': ('WEBP', 'image/webp'),
+}
+PILLOW_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp', 'MPO': 'jpg'}  # MPO: some phone JPEGs
+TRANSFORMATION_KEYS = {'w', 'h', 'c', 'f', 'q'}
+AUTO_QUALITY = 80
+TOUCH_INTERVAL = 60  # Seconds; a cached file's mtime (its place in the LRU order) is refreshed at most this often
+EVICT_TO = 0.9  # Evicting stops at this fraction of the limit, so it doesn't run again on the next write
+ORIGINAL_MAX_AGE = 60 * 60 * 24 * 365  # URLs carry the upload's version, so a new upload gets a new URL
+
+_locks = {}  # Cache key -> [lock, number of threads using it]
+_locks_guard = threading.Lock()
+_evict_lock = threading.Lock()
+_cache_bytes = None  # This process's running total, recounted whenever it evicts
+
+
+def _originals_dir():
+    return os.path.join(settings.LOCAL_IMAGES_ROOT, 'originals')
+
+
+def _cache_dir():
+    return os.path.join(settings.LOCAL_IMAGES_ROOT, 'cache')
+
+
+def configure_urls():
+    # Called from CoreConfig.ready(). Cloudinary's "private CDN" settings put our own host and
+    # LOCAL_IMAGES_URL in front of the usual /image/upload/... path.
+    site = urlsplit(settings.SITE_URL)
+    distribution = site.netloc + settings.LOCAL_IMAGES_URL.rstrip('/')
+    cloudinary.config(
+        cloud_name='local', private_cdn=True, secure=site.scheme == 'https',
+        secure_distribution=distribution, cname=distribution, cdn_subdomain=False,
+    )
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _public_id(name, folder):
+    stem = slugify(os.path.splitext(os.path.basename(name or ''))[0])[:40] or 'image'
+    public_id = f'{stem}_{secrets.token_hex(4)}'  # Like Cloudinary, never reuse an id
+    return f"{folder.strip('/')}/{public_id}" if folder else public_id
+
+
+def store(file, folder=''):
+    # Saves an uploaded file (or anything with read() and a name) as a new original. Returns a
+    # CloudinaryResource that can be assigned straight to a CloudinaryField, like
+    # cloudinary.uploader.upload_resource() does. Raises OSError if it isn't an image we can serve.
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    content = file.read()
+    with Image.open(io.BytesIO(content)) as image:
+        extension = PILLOW_EXTENSIONS.get(image.format)
+        if extension is None:
+            raise OSError(f"{image.format} images aren't supported by local image storage.")
+        width, height = image.size
+    public_id = _public_id(getattr(file, 'name', ''), folder)
+    _write_atomic(os.path.join(_originals_dir(), f'{public_id}.{extension}'), content)
+    return CloudinaryResource(
+        public_id, format=extension, version=str(int(time.time())), type='upload', resource_type='image',
+        metadata={'width': width, 'height': height},
+    )
+
+
+def original_path(public_id, format=None):
+    # Path of an original, or None. Also guards serve() against ids like '../../settings'.
+    root = os.path.realpath(_originals_dir())
+    base = os.path.realpath(os.path.join(root, public_id))
+    if not base.startswith(root + os.sep):
+        return None
+    if format:
+        path = f'{base}.{format}'
+        return path if os.path.isfile(path) else None
+    matches = glob.glob(glob.escape(base) + '.*')  # Ids without a format, e.g. set in code
+    return matches[0] if matches else None
+
+
+def read_original(image):
+    # The original's bytes for a CloudinaryResource (what images.analyse_rows() fetches).
+    path = original_path(image.public_id, image.format)
+    if path is None:
+        raise FileNotFoundError(f"No local original for {image.public_id!r}")
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def parse_transformation(text):
+    # 'c_limit,f_auto,q_auto,w_320' -> {'c': 'limit', 'f': 'auto', 'q': 'auto', 'w': 320}; None
+    # unless a rendition uses it.
+    if text not in renditions.transformations():
+        return None
+    parameters = dict(part.split('_', 1) for part in text.split(','))
+    for key in ('w', 'h'):
+        if key in parameters:
+            parameters[key] = int(parameters[key])
+    return parameters
+
+
+def _parse_path(path):
+    # 'image/upload/[<transformation>/][v<version>/]<public id>[.<format>]', as the SDK builds it.
+    parts = path.split('/')
+    if parts[:2] != ['image', 'upload'] or len(parts) < 3:
+        return None
+    parts = parts[2:]
+    transformation = None
+    if len(parts) > 1 and parts[0].split('_', 1)[0] in TRANSFORMATION_KEYS:
+        transformation = parse_transformation(parts.pop(0))
+        if transformation is None:
+            return None
+    versioned = len(parts) > 1 and re.fullmatch(r'v\d+', parts[0]) is not None
+    if versioned:
+        parts.pop(0)
+    public_id, _, format = '/'.join(parts).rpartition('.')
+    if not public_id or format.lower() not in FORMATS:
+        public_id, format = '/'.join(parts), None
+    return transformation, versioned, public_id, format and format.lower()
+
+
+def _output_format(parameters, source_format, accept):
+    # f_auto: WebP for browsers that say they take it, otherwise keep the original's format.
+    requested = parameters.get('f', 'auto')
+    if requested != 'auto':
+        return requested
+    if 'image/webp' in accept:
+        return 'webp'
+    return source_format
+
+
+def render(source, parameters, format):
+    # The derivative's bytes: `source` (a path) resized per `parameters` and saved as `format`.
+    width, height = parameters.get('w'), parameters.get('h')
+    crop = parameters.get('c', 'scale')
+    quality = parameters.get('q', 'auto')
+    with Image.open(source) as image:
+        if width or height:
+            # JPEGs can be decoded straight at 1/2, 1/4 or 1/8 size when that's still big enough.
+            # Asking for a square keeps both sides big enough whatever the crop or EXIF rotation.
+            side = max(width or 0, height or 0)
+            image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        if width or height:
+            target = (width or image.width * height // image.height, height or image.height * width // image.width)
+            if crop == 'fill':
+                image = ImageOps.fit(image, (width or target[0], height or target[1]), Image.LANCZOS)
+            elif crop == 'limit':
+                image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)  # Never upscales
+            else:  # scale and fit can upscale; scale stretches to both sizes when given both
+                image = ImageOps.contain(image, target, Image.LANCZOS) if crop == 'fit' else image.resize(target, Image.LANCZOS)
+        pillow_format = FORMATS[format][0]
+        if pillow_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif pillow_format == 'GIF' and image.mode not in ('P', 'L'):
+            image = image.convert('P', palette=Image.ADAPTIVE)
+        buffer = io.BytesIO()
+        options = {'optimize': True} if pillow_format in ('JPEG', 'PNG') else {}
+        if pillow_format in ('JPEG', 'WEBP'):
+            options['quality'] = AUTO_QUALITY if quality == 'auto' else int(quality)
+        image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+@contextmanager
+def _key_lock(key):
+    # One lock per derivative being made, dropped once no thread is waiting on it.
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[key]
+
+
+def _touch(path):
+    # Marks a cached file as recently used; eviction deletes the oldest mtimes first.
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+        return True
+    except FileNotFoundError:  # Evicted since we looked
+        return False
+
+
+def _cache_files():
+    for directory, _, names in os.walk(_cache_dir()):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict(max_bytes=None):
+    # Deletes the least recently used derivatives until the cache is under EVICT_TO of its limit.
+    # Returns how many bytes it freed.
+    global _cache_bytes
+    max_bytes = settings.LOCAL_IMAGES_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        files = sorted(_cache_files())
+        total = sum(size for _, size, _ in files)
+        freed = 0
+        if total > max_bytes:
+            for _, size, path in files:
+                if total - freed <= max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                freed += size
+        _cache_bytes = total - freed
+        return freed
+
+
+def _added_to_cache(size):
+    global _cache_bytes
+    if _cache_bytes is None:
+        evict()  # First write in this process: count what's already there
+    else:
+        _cache_bytes += size
+    if _cache_bytes > settings.LOCAL_IMAGES_CACHE_MAX_BYTES:
+        evict()
+
+
+def derivative(public_id, format, parameters, accept=''):
+    # (path, output format) of the derivative, making and caching it if needed; None if there's
+    # no such original.
+    source = original_path(public_id, format)
+    if source is None:
+        return None
+    source_format = os.path.splitext(source)[1][1:].lower()
+    output = _output_format(parameters, source_format, accept)
+    signature = f'{public_id}|{os.stat(source).st_mtime_ns}|{sorted(parameters.items())}|{output}'
+    key = hashlib.sha256(signature.encode()).hexdigest()
+    path = os.path.join(_cache_dir(), key[:2], f'{key}.{output}')
+    if _touch(path):
+        return path, output
+    with _key_lock(key):
+        if not os.path.exists(path):  # Otherwise another thread made it while we waited
+            content = render(source, parameters, output)
+            _write_atomic(path, content)
+            _added_to_cache(len(content))
+    return path, output
+
+
+@require_safe
+def serve(request, path):
+    # Answers the image URLs the SDK builds once configure_urls() has run (see artwebsite/urls.py).
+    parsed = _parse_path(path)
+    if parsed is None:
+        raise Http404("Not an image URL.")
+    parameters, versioned, public_id, format = parsed
+    vary_accept = False
+    if parameters is None:
+        found = original_path(public_id, format)
+        if found is None:
+            raise Http404("No such image.")
+        output = os.path.splitext(found)[1][1:].lower()
+    else:
+        found = derivative(public_id, format, parameters, request.headers.get('Accept', ''))
+        if found is None:
+            raise Http404("No such image.")
+        found, output = found
+        vary_accept = parameters.get('f', 'auto') == 'auto'
+    response = FileResponse(open(found, 'rb'), content_type=FORMATS[output][1])
+    if versioned:
+        response['Cache-Control'] = f'public, max-age={ORIGINAL_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    if vary_accept:
+        response['Vary'] = 'Accept'
+    return response
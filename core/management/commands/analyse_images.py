@@ -0,0 +1,44 @@
+# core/management/commands/analyse_images.py
+# Backfills image size, placeholder and dominant colour (core/images.py) for images that were
+# added before analysis existed, by bulk imports of stub ids, or whose analysis failed.
+# Images are fetched and analysed in parallel.
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.images import ANALYSED_IMAGE_FIELDS, analyse_rows
+
+
+def _analyse_batch(model, pks):
+    try:
+        return analyse_rows(model, pks)
+    finally:
+        connection.close()  # Each worker thread has its own connection
+
+
+class Command(BaseCommand):
+    help = "Stores the size, placeholder and dominant colour of images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-analyse every image, not just missing ones.")
+        parser.add_argument('--workers', type=int, default=4, help="Images fetched and analysed at once (1: no threads).")
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pool = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        for model, field in ANALYSED_IMAGE_FIELDS.items():
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            if not options['all']:
+                rows = rows.filter(**{f'{field}_width__isnull': True})
+            pks = list(rows.order_by('pk').values_list('pk', flat=True))
+            batches = [pks[start:start + batch_size] for start in range(0, len(pks), batch_size)]
+            analysed = self.analyse(pool, model, batches)
+            self.stdout.write(f"  {model._meta.verbose_name_plural}: {analysed}/{len(pks)} analysed")
+        if pool is not None:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS("Image analysis done."))
+
+    def analyse(self, pool, model, batches):
+        if pool is None:  # --workers 1: everything on this thread
+            return sum(analyse_rows(model, batch) for batch in batches)
+        return sum(pool.map(_analyse_batch, [model] * len(batches), batches))
@@ -0,0 +1,127 @@
+# core/management/commands/benchmark_concurrency.py
+# Compares throughput of the sync views under WSGI-style threads with the async views
+# (core/async_views.py) on a single ASGI event loop, at high concurrency, e.g.
+#
+#   python manage.py benchmark_concurrency --requests 2000 --concurrency 200 --threads 8
+#
+# Each mode runs in its own subprocess, because core/urls.py picks sync or async views at import
+# time from ASYNC_VIEWS. Requests go through the full middleware stack via the test client
+# handlers (no sockets), so this measures Django and the database, not a particular server.
+# For numbers from real servers, point a load tester at gunicorn and uvicorn instead.
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+DEFAULT_URLS = ['core:home', 'core:gallery_home', 'core:all_artworks_api']
+
+
+def _summary(mode, timings, statuses, elapsed):
+    timings = sorted(timings)
+    return {
+        'mode': mode,
+        'requests': len(timings),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        'errors': sum(1 for status in statuses if status >= 500),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares WSGI (sync views, thread pool) and ASGI (async views, event loop) throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per mode.")
+        parser.add_argument('--concurrency', type=int, default=100, help="Requests in flight at once (ASGI).")
+        parser.add_argument('--threads', type=int, default=8, help="Worker threads (WSGI), like gunicorn --threads.")
+        parser.add_argument('--url', action='append', dest='urls', help="URL name to request (repeatable).")
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        if options['mode'] == 'both':
+            return self.compare(options)
+
+        if (options['mode'] == 'asgi') != settings.ASYNC_VIEWS:
+            raise CommandError("Run with DJANGO_ASYNC_VIEWS=True for --mode asgi (and without it for wsgi).")
+        paths = [reverse(name) for name in options['urls'] or DEFAULT_URLS]
+        # The test client's host is "testserver", which ALLOWED_HOSTS doesn't normally include.
+        with override_settings(ALLOWED_HOSTS=['*']):
+            if options['mode'] == 'wsgi':
+                result = self.run_wsgi(paths, options['requests'], options['threads'])
+            else:
+                result = asyncio.run(self.run_asgi(paths, options['requests'], options['concurrency']))
+        self.stdout.write(json.dumps(result))
+
+    def compare(self, options):
+        results = []
+        for mode, async_views in [('wsgi', 'False'), ('asgi', 'True')]:
+            command = [
+                sys.executable, sys.argv[0], 'benchmark_concurrency', '--mode', mode,
+                '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+                '--threads', str(options['threads']),
+            ]
+            for name in options['urls'] or []:
+                command += ['--url', name]
+            env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'DJANGO_ASYNC_VIEWS': async_views}
+            run = subprocess.run(command, env=env, capture_output=True, text=True)
+            if run.returncode:
+                raise CommandError(f"The {mode} run failed:\n{run.stderr}")
+            results.append(json.loads(run.stdout.strip().splitlines()[-1]))
+
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<5} {result['requests_per_second']:>8} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+                f"p95 {result['p95_ms']:>8.2f}ms  {result['errors']} errors"
+            )
+        wsgi, asgi = results
+        self.stdout.write(f"ASGI/WSGI throughput: {asgi['requests_per_second'] / wsgi['requests_per_second']:.2f}x")
+
+    def run_wsgi(self, paths, total, threads):
+        local = threading.local()
+        timings, statuses = [], []
+
+        def request(number):
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False)
+            started = time.perf_counter()
+            response = local.client.get(paths[number % len(paths)])
+            timings.append((time.perf_counter() - started) * 1000)
+            statuses.append(response.status_code)
+
+        for path in paths:
+            Client().get(path)  # Warm-up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(request, range(total)))
+        return _summary('wsgi', timings, statuses, time.perf_counter() - started)
+
+    async def run_asgi(self, paths, total, concurrency):
+        client = AsyncClient(raise_request_exception=False)
+        slots = asyncio.Semaphore(concurrency)
+        timings, statuses = [], []
+
+        async def request(number):
+            async with slots:
+                started = time.perf_counter()
+                response = await client.get(paths[number % len(paths)])
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses.append(response.status_code)
+
+        for path in paths:
+            await client.get(path)  # Warm-up
+        started = time.perf_counter()
+        await asyncio.gather(*(request(number) for number in range(total)))
+        return _summary('asgi', timings, statuses, time.perf_counter() - started)
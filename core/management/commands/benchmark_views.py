@@ -0,0 +1,174 @@
+# core/management/commands/benchmark_views.py
+# Requests every routed page of the site through Django's test client and reports latency
+# (p50/p95), SQL queries and response size per URL, e.g.
+#
+#   python manage.py generate_sample_data --seed 1
+#   python manage.py benchmark_views --output before.json
+#   ... make a change ...
+#   python manage.py benchmark_views --output after.json --compare before.json
+#   python manage.py benchmark_views --diff before.json after.json   (compare two saved runs)
+#
+# Runs against whatever database is configured, so use a test copy, not production.
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from core import urls as core_urls
+from core.models import Artwork, BlogPost, GalleryCategory, Subscriber
+
+# Routes that change data (or just redirect) are left out.
+SKIPPED_ROUTES = {'unsubscribe_blog', 'subscribe_to_blog', 'confirm_subscription'}
+
+# Extra variants worth timing on their own, on top of each route's plain URL.
+EXTRA_REQUESTS = [
+    ('search_artworks', {'q': 'bridge'}),
+    ('search_artworks', {'q': 'ink wash'}),
+    ('all_artworks_api', {'limit': 100}),
+]
+
+
+def _sample_kwargs():
+    # URL kwargs for routes that need one, taken from the newest row of each model.
+    artwork = Artwork.objects.order_by('-date_uploaded').only('slug').first()
+    category = GalleryCategory.objects.order_by('name').only('slug').first()
+    post = BlogPost.objects.order_by('-publish_date').only('slug').first()
+    subscriber = Subscriber.objects.only('unsubscribe_token').first()
+    return {
+        'artwork_slug': artwork and artwork.slug,
+        'category_slug': category and category.slug,
+        'slug': post and post.slug,
+        'token': subscriber and subscriber.unsubscribe_token,
+    }
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Times every routed view (p50/p95 latency, queries, bytes) and writes the results to JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30, help="Timed requests per URL.")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Earlier results file to compare against.")
+        parser.add_argument('--diff', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two results files without running anything.")
+
+    def handle(self, *args, **options):
+        if options['diff']:
+            before, after = (json.loads(Path(path).read_text()) for path in options['diff'])
+            for label, result in after['results'].items():
+                self.stdout.write(self.format_row(label, result, before))
+            return
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+
+        targets = self.targets()
+        client = Client(raise_request_exception=False)
+        results = {}
+        # The test client's host is "testserver", which ALLOWED_HOSTS doesn't normally include.
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for label, url in targets:
+                results[label] = self.measure(client, url, options['requests'], options['cold'])
+                self.stdout.write(self.format_row(label, results[label], baseline))
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'requests_per_url': options['requests'],
+                'cold_cache': options['cold'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'rows': {model.__name__: model.objects.count() for model in (Artwork, GalleryCategory, BlogPost, Subscriber)},
+            },
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def targets(self):
+        sample_kwargs = _sample_kwargs()
+        targets = []
+        for pattern in core_urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if not name or name in SKIPPED_ROUTES:
+                continue
+            converters = pattern.pattern.converters
+            kwargs = {key: sample_kwargs.get(key) for key in converters}
+            if any(value is None for value in kwargs.values()):
+                self.stderr.write(f"Skipping {name}: no sample data for {', '.join(converters)}.")
+                continue
+            try:
+                targets.append((name, reverse(f'{core_urls.app_name}:{name}', kwargs=kwargs)))
+            except NoReverseMatch as exc:
+                self.stderr.write(f"Skipping {name}: {exc}")
+        names = {name for name, _ in targets}
+        for name, params in EXTRA_REQUESTS:
+            if name in names:
+                query = urlencode(params)
+                targets.append((f'{name}?{query}', f"{reverse(f'{core_urls.app_name}:{name}')}?{query}"))
+        return targets
+
+    def measure(self, client, url, requests, cold):
+        timings, queries, sizes, statuses = [], [], [], set()
+        client.get(url)  # Warm-up: imports, template loading, first cache fill
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = client.get(url)
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(_percentile(timings, 95), 2),
+            'queries': max(queries),
+            'bytes': max(sizes),
+        }
+
+    def format_row(self, label, result, baseline):
+        row = f"{label:<45} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  {result['queries']:>3} queries  {result['bytes']:>8} bytes"
+        before = (baseline or {}).get('results', {}).get(label)
+        if before:
+            changes = []
+            for key, unit in [('p50_ms', 'ms'), ('p95_ms', 'ms'), ('queries', ''), ('bytes', 'B')]:
+                delta = result[key] - before[key]
+                percent = f" ({100 * delta / before[key]:+.0f}%)" if before[key] else ''
+                changes.append(f"{key} {round(delta, 2):+g}{unit}{percent}")
+            row += '\n    vs baseline: ' + ', '.join(changes)
+        if result['status'] != [200]:
+            row += f"  status {result['status']}"
+        return row
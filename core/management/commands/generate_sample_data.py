@@ -0,0 +1,202 @@
+# core/management/commands/generate_sample_data.py
+# Fills the database with a realistic, reproducible synthetic dataset for load testing and
+# `manage.py benchmark_views`: categories, artworks with additional images, blog posts,
+# subscribers and Instagram imports. Tag usage follows a Zipf distribution (a few tags on
+# almost everything, a long tail used once or twice), like the real archive.
+#
+# Images are stub Cloudinary public ids ("synthetic/artwork-12"), so nothing is uploaded.
+# The same --seed always produces the same data. Earlier synthetic rows are removed first;
+# real content is never touched (synthetic rows are recognisable by name, see SYNTHETIC_* below).
+import random
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from taggit.models import Tag
+from core import caching, related, search
+from core.models import AdditionalArtworkImage, Artwork, BlogPost, GalleryCategory, InstagramImportedItem, Subscriber
+from core.richtext import apply_rendition
+from core.tagging import bulk_add_tags
+
+SYNTHETIC_CATEGORY_PREFIX = 'Synthetic '
+SYNTHETIC_IMPORT_KEY_PREFIX = 'synthetic:'
+SYNTHETIC_SLUG_PREFIX = 'synthetic-'
+SYNTHETIC_TAG_PREFIX = 'sample-'
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.invalid'
+SYNTHETIC_POST_ID_PREFIX = 'synthetic-'
+SYNTHETIC_AUTHOR = 'synthetic-author'
+
+WORDS = (
+    'line wash ink watercolour sketch study river bridge castle street market garden harbour '
+    'morning evening light shadow figure portrait tree cathedral rooftop window boat field '
+    'autumn winter spring summer rain fog sunset cafe station lane hill meadow'
+).split()
+
+
+def _zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = "Generates a reproducible synthetic dataset (replacing any earlier one) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--artworks', type=int, default=2000)
+        parser.add_argument('--images-per-artwork', type=int, default=3, help="Additional images per artwork.")
+        parser.add_argument('--tags', type=int, default=300, help="Size of the tag vocabulary.")
+        parser.add_argument('--tags-per-artwork', type=int, default=5, help="Maximum tags per artwork or post.")
+        parser.add_argument('--blog-posts', type=int, default=300)
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--instagram-items', type=int, default=3000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help="Allow running with DEBUG off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("Refusing to generate synthetic data with DEBUG off. Use --force if this really is a test database.")
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Spread dates over the last three years, ending at a fixed point relative to today.
+        self.newest = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+        self.clear()
+        tag_names = [f'{SYNTHETIC_TAG_PREFIX}{self.random.choice(WORDS)}-{rank:04d}' for rank in range(1, options['tags'] + 1)]
+        self.tag_weights = (tag_names, _zipf_weights(len(tag_names)))
+        self.max_tags = options['tags_per_artwork']
+
+        categories = self.create_categories(options['categories'])
+        self.create_artworks(categories, options['artworks'], options['images_per_artwork'])
+        self.create_blog_posts(options['blog_posts'])
+        self.create_subscribers(options['subscribers'])
+        self.create_instagram_items(options['instagram_items'])
+        # Bulk writes send no signals, so do what core/signals.py would have done.
+        related.rebuild()
+        caching.bump_gallery_version()
+        caching.invalidate_homepage()
+        self.stdout.write(self.style.SUCCESS("Synthetic dataset ready."))
+
+    def clear(self):
+        # Artworks first: categories are PROTECTed while they have any.
+        Artwork.objects.filter(import_key__startswith=SYNTHETIC_IMPORT_KEY_PREFIX).delete()
+        GalleryCategory.objects.filter(name__startswith=SYNTHETIC_CATEGORY_PREFIX).delete()
+        BlogPost.objects.filter(slug__startswith=SYNTHETIC_SLUG_PREFIX).delete()
+        Subscriber.objects.filter(email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}').delete()
+        InstagramImportedItem.objects.filter(instagram_post_id__startswith=SYNTHETIC_POST_ID_PREFIX).delete()
+        Tag.objects.filter(name__startswith=SYNTHETIC_TAG_PREFIX).delete()
+
+    def pick_tags(self):
+        names, weights = self.tag_weights
+        count = self.random.randint(1, self.max_tags)
+        return list(dict.fromkeys(self.random.choices(names, weights, k=count)))
+
+    def sentence(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words)).capitalize()
+
+    def date(self, number, total):
+        # Evenly spaced, oldest first, with some jitter so timestamps aren't perfectly regular.
+        days_ago = (total - number) * 3 * 365 / max(total, 1)
+        return self.newest - timedelta(days=days_ago, minutes=self.random.randint(0, 600))
+
+    def batches(self, count):
+        for start in range(0, count, self.batch_size):
+            yield range(start, min(start + self.batch_size, count))
+
+    def create_categories(self, count):
+        categories = [
+            GalleryCategory(name=f'{SYNTHETIC_CATEGORY_PREFIX}{self.sentence(2)} {number + 1}', slug=f'{SYNTHETIC_SLUG_PREFIX}category-{number + 1}')
+            for number in range(count)
+        ]
+        GalleryCategory.objects.bulk_create(categories)
+        # Some categories have a cover; the rest fall back to their newest artwork.
+        for category in categories[::2]:
+            category.representative_image = f'synthetic/{category.slug}'
+        GalleryCategory.objects.bulk_update(categories[::2], ['representative_image'])
+        self.stdout.write(f"  {count} categories")
+        return categories
+
+    def create_artworks(self, categories, count, images_per_artwork):
+        for numbers in self.batches(count):
+            with transaction.atomic():
+                artworks = [
+                    Artwork(
+                        title=self.sentence(3),
+                        slug=f'{SYNTHETIC_SLUG_PREFIX}artwork-{number + 1}',
+                        description=self.sentence(self.random.randint(10, 60)),
+                        category=self.random.choice(categories),
+                        primary_image=f'synthetic/artwork-{number + 1}',
+                        import_key=f'{SYNTHETIC_IMPORT_KEY_PREFIX}{number + 1}',
+                    )
+                    for number in numbers
+                ]
+                Artwork.objects.bulk_create(artworks)
+                # date_uploaded is auto_now_add, so spread the dates out afterwards.
+                for number, artwork in zip(numbers, artworks):
+                    artwork.date_uploaded = self.date(number, count)
+                Artwork.objects.bulk_update(artworks, ['date_uploaded'])
+                AdditionalArtworkImage.objects.bulk_create([
+                    AdditionalArtworkImage(artwork=artwork, image=f'synthetic/artwork-{number + 1}-{order}', caption=self.sentence(4), order=order)
+                    for number, artwork in zip(numbers, artworks)
+                    for order in range(1, images_per_artwork + 1)
+                ])
+                bulk_add_tags({artwork: self.pick_tags() for artwork in artworks})
+                search.index_artwork_ids([artwork.pk for artwork in artworks])
+            self.stdout.write(f"  {numbers.stop}/{count} artworks")
+
+    def create_blog_posts(self, count):
+        author, _ = get_user_model().objects.get_or_create(username=SYNTHETIC_AUTHOR)
+        for numbers in self.batches(count):
+            with transaction.atomic():
+                posts = [
+                    BlogPost(
+                        title=self.sentence(5),
+                        slug=f'{SYNTHETIC_SLUG_PREFIX}post-{number + 1}',
+                        # Post bodies are long in real life; keep them that way here.
+                        content=''.join(f'<p>{self.sentence(self.random.randint(40, 120))}.</p>' for _ in range(self.random.randint(5, 40))),
+                        summary=self.sentence(30),
+                        cover_image=f'synthetic/post-{number + 1}' if number % 3 else None,
+                        author=author,
+                    )
+                    for number in numbers
+                ]
+                for post in posts:
+                    apply_rendition(post)  # bulk_create() skips BlogPost.save()
+                BlogPost.objects.bulk_create(posts)
+                for number, post in zip(numbers, posts):
+                    post.publish_date = self.date(number, count)
+                BlogPost.objects.bulk_update(posts, ['publish_date'])
+                bulk_add_tags({post: self.pick_tags()[:3] for post in posts})
+        self.stdout.write(f"  {count} blog posts")
+
+    def token(self):
+        # A random UUID from the seeded generator (uuid4() would differ on every run).
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def create_subscribers(self, count):
+        for numbers in self.batches(count):
+            Subscriber.objects.bulk_create([
+                Subscriber(
+                    email=f'subscriber{number + 1}@{SYNTHETIC_EMAIL_DOMAIN}', is_active=self.random.random() < 0.9,
+                    confirmation_token=self.token(), unsubscribe_token=self.token(),
+                )
+                for number in numbers
+            ])
+        self.stdout.write(f"  {count} subscribers")
+
+    def create_instagram_items(self, count):
+        statuses = [choice for choice, _ in InstagramImportedItem.STATUS_CHOICES if choice != 'processed']
+        for numbers in self.batches(count):
+            InstagramImportedItem.objects.bulk_create([
+                InstagramImportedItem(
+                    instagram_post_id=f'{SYNTHETIC_POST_ID_PREFIX}{number + 1}',
+                    image_url_from_instagram=f'https://example.com/synthetic/instagram-{number + 1}.jpg',
+                    caption_from_instagram=f"{self.sentence(6)} #{' #'.join(self.pick_tags())}",
+                    status=self.random.choice(statuses),
+                )
+                for number in numbers
+            ])
+        self.stdout.write(f"  {count} Instagram imports")
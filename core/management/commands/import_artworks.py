@@ -0,0 +1,169 @@
+# core/management/commands/import_artworks.py
+# Bulk-imports artworks from a folder of images plus a manifest, e.g. to bring in the archive
+# without 2,000 trips through the admin.
+#
+# JSON manifest: a list of objects
+#   {"key": "...", "title": "...", "category": "...", "tags": ["ink", "Guildford"], "description": "...",
+#    "image": "primary.jpg", "additional_images": [{"image": "detail.jpg", "caption": "...", "order": 1}]}
+# CSV manifest: columns key, title, category, tags, description, image, additional_images, where
+#   tags are separated by ";" and additional_images look like "detail.jpg|Caption;other.jpg|Caption".
+#
+# "key" is optional and defaults to the primary image path. It is stored on Artwork.import_key,
+# so re-running the same manifest (e.g. after an interruption) skips rows already imported.
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core import caching, related, search
+from core.images import analysis_values, try_analyse_image, upload_image
+from core.models import AdditionalArtworkImage, Artwork, GalleryCategory
+from core.slugs import assign_unique_slugs
+from core.tagging import bulk_add_tags
+
+
+def _split(value, separator=';'):
+    return [part.strip() for part in (value or '').split(separator) if part.strip()]
+
+
+def _read_manifest(path):
+    if path.suffix.lower() == '.json':
+        with path.open(encoding='utf-8') as manifest:
+            rows = json.load(manifest)
+    else:
+        with path.open(encoding='utf-8', newline='') as manifest:
+            rows = []
+            for row in csv.DictReader(manifest):
+                row['tags'] = _split(row.get('tags'))
+                row['additional_images'] = [
+                    {'image': entry.split('|', 1)[0].strip(), 'caption': entry.split('|', 1)[1].strip() if '|' in entry else '', 'order': order}
+                    for order, entry in enumerate(_split(row.get('additional_images')), start=1)
+                ]
+                rows.append(row)
+    for row in rows:
+        row['key'] = (row.get('key') or row.get('image') or '').strip()
+        if isinstance(row.get('tags'), str):
+            row['tags'] = _split(row['tags'].replace(',', ';'))
+        row.setdefault('tags', [])
+        row.setdefault('additional_images', [])
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Imports artworks (with categories, tags and additional images) from an image folder and a CSV/JSON manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Path to the .csv or .json manifest.")
+        parser.add_argument('--images-dir', help="Folder the image paths are relative to (default: the manifest's folder).")
+        parser.add_argument('--batch-size', type=int, default=50, help="Artworks uploaded and committed together.")
+        parser.add_argument('--workers', type=int, default=8, help="Parallel image uploads.")
+        parser.add_argument('--dry-run', action='store_true', help="Check the manifest and files without uploading anything.")
+
+    def handle(self, *args, **options):
+        manifest_path = Path(options['manifest'])
+        if not manifest_path.exists():
+            raise CommandError(f"Manifest {manifest_path} not found.")
+        self.images_dir = Path(options['images_dir']) if options['images_dir'] else manifest_path.parent
+
+        rows, problems, keys = [], [], set()
+        for number, row in enumerate(_read_manifest(manifest_path), start=1):
+            missing = [name for name in [row.get('image')] + [extra['image'] for extra in row['additional_images']]
+                       if not name or not (self.images_dir / name).is_file()]
+            if not row.get('title') or not row.get('category') or missing:
+                problems.append(f"Row {number} ({row['key'] or 'no key'}): missing title/category or files {missing}")
+            elif row['key'] in keys:
+                problems.append(f"Row {number}: duplicate key {row['key']}")
+            else:
+                keys.add(row['key'])
+                rows.append(row)
+        for problem in problems:
+            self.stderr.write(problem)
+
+        already_imported = set(
+            Artwork.objects.filter(import_key__in=[row['key'] for row in rows]).values_list('import_key', flat=True)
+        )
+        rows = [row for row in rows if row['key'] not in already_imported]
+        self.stdout.write(f"{len(rows)} artwork(s) to import, {len(already_imported)} already imported, {len(problems)} skipped.")
+        if options['dry_run'] or not rows:
+            return
+
+        self.categories = self._categories({row['category'].strip() for row in rows})
+        batch_size = options['batch_size']
+        imported = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(rows), batch_size):
+                done = self._import_batch(pool, rows[start:start + batch_size])
+                imported += done
+                failed += min(batch_size, len(rows) - start) - done
+                self.stdout.write(f"  {min(start + batch_size, len(rows))}/{len(rows)} done")
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Imported {imported} artwork(s); {failed} failed to upload (re-run to retry them)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {imported} artwork(s)."))
+
+    def _categories(self, names):
+        categories = {category.name: category for category in GalleryCategory.objects.filter(name__in=names)}
+        new_categories = assign_unique_slugs([GalleryCategory(name=name) for name in names if name not in categories], 'name')
+        GalleryCategory.objects.bulk_create(new_categories)
+        categories.update((category.name, category) for category in new_categories)
+        return categories
+
+    def _upload(self, name):
+        # Returns (uploaded image, analysis); see core/images.py.
+        content = (self.images_dir / name).read_bytes()
+        return upload_image(content, Path(name).name), try_analyse_image(content)
+
+    def _import_batch(self, pool, rows):
+        # Uploads run in parallel. A row with a failed upload is reported and left out, and the rest
+        # of the batch still goes in; being unimported, it is retried by the next run. Returns how
+        # many rows were imported.
+        names = {row['image'] for row in rows} | {extra['image'] for row in rows for extra in row['additional_images']}
+        futures = [(name, pool.submit(self._upload, name)) for name in names]
+        uploaded, errors = {}, {}
+        for name, future in futures:
+            try:
+                uploaded[name] = future.result()
+            except Exception as exc:  # One bad upload shouldn't sink the whole batch
+                errors[name] = exc
+        ready = []
+        for row in rows:
+            failed = [name for name in [row['image']] + [extra['image'] for extra in row['additional_images']] if name in errors]
+            if failed:
+                self.stderr.write(f"{row['key']}: upload failed: " + '; '.join(f"{name}: {errors[name]}" for name in failed))
+            else:
+                ready.append(row)
+        rows = ready
+        if not rows:
+            return 0
+
+        with transaction.atomic():
+            artworks = assign_unique_slugs([
+                Artwork(
+                    title=row['title'].strip(),
+                    description=(row.get('description') or '').strip(),
+                    category=self.categories[row['category'].strip()],
+                    primary_image=uploaded[row['image']][0],
+                    import_key=row['key'],
+                    **analysis_values(Artwork, uploaded[row['image']][1]),
+                )
+                for row in rows
+            ], 'title')
+            Artwork.objects.bulk_create(artworks)
+            AdditionalArtworkImage.objects.bulk_create([
+                AdditionalArtworkImage(
+                    artwork=artwork,
+                    image=uploaded[extra['image']][0],
+                    caption=extra.get('caption') or '',
+                    order=extra.get('order') or order,
+                    **analysis_values(AdditionalArtworkImage, uploaded[extra['image']][1]),
+                )
+                for row, artwork in zip(rows, artworks)
+                for order, extra in enumerate(row['additional_images'], start=1)
+            ])
+            bulk_add_tags({artwork: row['tags'] for row, artwork in zip(rows, artworks) if row['tags']})
+            # Bulk writes send no signals, so do what core/signals.py would have done.
+            search.index_artwork_ids([artwork.pk for artwork in artworks])
+            related.refresh_on_commit([artwork.pk for artwork in artworks])
+            transaction.on_commit(caching.bump_gallery_version)
+        return len(rows)
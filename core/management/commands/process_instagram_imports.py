@@ -0,0 +1,22 @@
+# core/management/commands/process_instagram_imports.py
+from django.core.management.base import BaseCommand
+from core.instagram import run_import_job
+from core.models import InstagramImportJob
+
+
+class Command(BaseCommand):
+    help = "Runs queued 'Process into artworks' jobs (or re-runs one interrupted job)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help="Run this job id, whatever its status. Already processed items are skipped.")
+
+    def handle(self, *args, **options):
+        jobs = InstagramImportJob.objects.select_related('category')
+        if options['job']:
+            jobs = jobs.filter(pk=options['job'])
+        else:
+            jobs = jobs.filter(status='queued').order_by('created_at')
+        for job in jobs:
+            self.stdout.write(f"Running {job}...")
+            run_import_job(job)
+            self.stdout.write(self.style.SUCCESS(f"{job}"))
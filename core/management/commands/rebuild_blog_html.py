@@ -0,0 +1,35 @@
+# core/management/commands/rebuild_blog_html.py
+# Rebuilds the precompiled post HTML (core/richtext.py) for posts built by an older
+# RENDITION_VERSION or never built at all (bulk-created), or for every post with --all.
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import BlogPost
+from core.richtext import RENDITION_FIELDS, RENDITION_VERSION, apply_rendition
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the stored HTML, table of contents and reading time of blog posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild every post, not just out-of-date ones.")
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.only('pk', 'content', 'rendition_version').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(rendition_version__lt=RENDITION_VERSION)
+
+        batch, total = [], 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            apply_rendition(post)
+            post.updated_at = timezone.now()  # New ETag for the post page (bulk_update skips auto_now)
+            batch.append(post)
+            if len(batch) == options['batch_size']:
+                total += self.save(batch)
+                batch = []
+        total += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} post(s)."))
+
+    def save(self, posts):
+        BlogPost.objects.bulk_update(posts, [*RENDITION_FIELDS, 'updated_at'])
+        return len(posts)
@@ -0,0 +1,11 @@
+# core/management/commands/rebuild_related_artworks.py
+from django.core.management.base import BaseCommand
+from core import related
+
+
+class Command(BaseCommand):
+    help = "Recalculates the related artworks shown on artwork pages from scratch."
+
+    def handle(self, *args, **options):
+        count = related.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} related artwork(s)."))
@@ -0,0 +1,11 @@
+# core/management/commands/rebuild_tag_counts.py
+from django.core.management.base import BaseCommand
+from core import facets
+
+
+class Command(BaseCommand):
+    help = "Recalculates the tag counts behind tag clouds and tag filters from scratch."
+
+    def handle(self, *args, **options):
+        count = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Counted {count} tag(s)."))
@@ -0,0 +1,33 @@
+# core/management/commands/send_newsletter.py
+from django.core.management.base import BaseCommand, CommandError
+from core.models import BlogPost, NewsletterDispatch
+from core.newsletter import run_dispatch
+
+
+class Command(BaseCommand):
+    help = "Emails a blog post to active subscribers, or resumes unfinished newsletter dispatches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', help="Slug of the blog post to send (creates a new dispatch).")
+        parser.add_argument('--resume', action='store_true', help="Run every queued, interrupted or failed dispatch.")
+        parser.add_argument('--max-per-second', type=float, default=None, help="Override NEWSLETTER_MAX_PER_SECOND.")
+
+    def handle(self, *args, **options):
+        if options['post']:
+            try:
+                post = BlogPost.objects.get(slug=options['post'])
+            except BlogPost.DoesNotExist:
+                raise CommandError(f"No blog post with slug '{options['post']}'.")
+            if NewsletterDispatch.objects.filter(blog_post=post).exists():
+                raise CommandError(f"'{post.title}' has already been sent; use --resume to finish an interrupted send.")
+            dispatches = [NewsletterDispatch.objects.create(blog_post=post)]
+        elif options['resume']:
+            dispatches = NewsletterDispatch.objects.exclude(status='finished').select_related('blog_post').order_by('created_at')
+        else:
+            raise CommandError("Pass --post <slug> or --resume.")
+
+        for dispatch in dispatches:
+            if not run_dispatch(dispatch, max_per_second=options['max_per_second']):
+                self.stdout.write(f"{dispatch}: skipped, another run is sending it.")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"{dispatch}: sent {dispatch.sent_count} of {dispatch.total}."))
@@ -0,0 +1,25 @@
+# core/management/commands/sync_instagram.py
+from django.core.management.base import BaseCommand, CommandError
+from core.instagram import InstagramAPIError, sync_instagram
+from core.models import InstagramSyncState
+
+
+class Command(BaseCommand):
+    help = "Imports new Instagram posts into InstagramImportedItem, resuming the back-catalogue import where it stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-pages', type=int, default=None, help="Stop the back-catalogue import after this many pages.")
+        parser.add_argument('--restart', action='store_true', help="Forget the stored cursor and walk the whole feed again.")
+
+    def handle(self, *args, **options):
+        if options['restart']:
+            InstagramSyncState.objects.filter(pk=1).update(backfill_cursor='', backfill_complete=False)
+        verbose = options['verbosity'] > 1
+        try:
+            created = sync_instagram(
+                max_pages=options['max_pages'],
+                log=self.stdout.write if verbose else None,
+            )
+        except InstagramAPIError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} new Instagram post(s)."))
@@ -0,0 +1,147 @@
+# core/metrics.py
+# Per-request performance numbers: SQL query count and time, template render time and cache
+# hits/misses. RequestMetricsMiddleware collects them for every request and can send them back
+# as a Server-Timing header (visible in the browser's network panel) and/or log them.
+#
+# The numbers are also attached to the response as `response.request_metrics`, which is what
+# the query budget tests in core/tests.py check.
+import contextvars
+import json
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger('core.metrics')
+
+_current = contextvars.ContextVar('core_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'render_ms': round(self.render_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+def _record_query(execute, sql, params, many, context):
+    # Installed on every database connection (see _install_query_recorder), so it sees every
+    # query, DEBUG or not, including those async views run on sync_to_async threads: the request's
+    # metrics travel in a context variable, which asgiref copies into those threads.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def _install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def record_cache_lookup(hit):
+    # Called by core/caching.py for each cache read.
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+_original_template_render = DjangoTemplate.render
+
+
+def _timed_template_render(self, context=None, request=None):
+    # render(), render_to_string() and TemplateResponse all go through the template backend's
+    # render(); {% include %} and {% extends %} don't, so nothing is counted twice.
+    metrics = _current.get()
+    if metrics is None:
+        return _original_template_render(self, context, request)
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context, request)
+    finally:
+        metrics.render_time += time.perf_counter() - started
+
+
+def install():
+    # Hooks query and render timing into Django. Called once from CoreConfig.ready(), and only
+    # when RequestMetricsMiddleware is in MIDDLEWARE; outside a request the hooks do nothing.
+    DjangoTemplate.render = _timed_template_render
+    connection_created.connect(_install_query_recorder, dispatch_uid='core.metrics.query_recorder')
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection)
+
+
+class RequestMetricsMiddleware:
+    # Works under WSGI and ASGI without forcing async requests through a thread.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        response.request_metrics = metrics
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response['Server-Timing'] = metrics.server_timing()
+        if getattr(settings, 'REQUEST_METRICS_LOG', False):
+            logger.info(json.dumps({'method': request.method, 'path': request.path, 'status': response.status_code, **metrics.as_dict()}))
+        return response
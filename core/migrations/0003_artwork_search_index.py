@@ -0,0 +1,40 @@
+# Creates the full-text search table used by core/search.py. The SQL differs per database, so it
+# runs through RunPython. Existing artworks are indexed with `python manage.py rebuild_search_index`.
+
+from django.db import migrations
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_artwork_search "
+    "USING fts5(title, description, tags, category, tokenize='porter unicode61')"
+)
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS core_artwork_search ("
+    "artwork_id bigint PRIMARY KEY REFERENCES core_artwork (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS core_artwork_search_document_gin ON core_artwork_search USING GIN (document)",
+]
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS core_artwork_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_artwork_uploaded_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
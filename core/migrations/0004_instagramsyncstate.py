@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_artwork_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('backfill_cursor', models.CharField(blank=True, help_text="Graph API 'after' cursor of the last fully imported page.", max_length=512)),
+                ('backfill_complete', models.BooleanField(default=False, help_text='True once every older post has been imported.')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Instagram Sync State',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_instagramsyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('item_ids', models.JSONField(default=list, help_text='Primary keys of the InstagramImportedItems to process.')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('errors', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(help_text='Category given to the new artworks.', on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.gallerycategory')),
+            ],
+            options={
+                'verbose_name': 'Instagram Import Job',
+                'verbose_name_plural': 'Instagram Import Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-publish_date', '-id'], name='core_blogpost_published_id_idx'),
+        ),
+    ]
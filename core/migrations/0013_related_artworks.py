@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_image_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArtwork',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('artwork', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.artwork')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.artwork')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='relatedartwork',
+            constraint=models.UniqueConstraint(fields=('artwork', 'rank'), name='unique_related_artwork_rank'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_related_artworks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletterdispatch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddConstraint(
+            model_name='newsletterdispatch',
+            constraint=models.UniqueConstraint(fields=('blog_post',), name='unique_newsletter_dispatch_per_post'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_newsletter_dispatch_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='additionalartworkimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='relatedartwork',
+            name='computed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,27 +1,31 @@
 # core/models.py
 from django.db import models
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 from ckeditor_uploader.fields import RichTextUploadingField
 from taggit.managers import TaggableManager
 import uuid # For tokens
+from .richtext import RENDITION_FIELDS, RENDITION_VERSION, apply_rendition
+from .slugs import save_with_unique_slug
 
 # Define GalleryCategory first if Artwork uses it
 class GalleryCategory(models.Model):
     name = models.CharField(max_length=100, unique=True, help_text="Name of the art category.")
     slug = models.SlugField(unique=True, max_length=100, blank=True, help_text="Unique URL-friendly version of the name.")
     representative_image = CloudinaryField('gallery_category_representative_image', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True) # ETag for pages (see core/conditional.py)
     # ... Meta, __str__, save, get_absolute_url methods ...
     class Meta:
         verbose_name_plural = "Gallery Categories"
         ordering = ['name']
     def __str__(self): return self.name
-    def save(self, *args, **kwargs): # Basic slug generation
-        from django.utils.text import slugify
-        if not self.slug: self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
-    def get_absolute_url(self): return reverse('gallery_category_view', kwargs={'category_slug': self.slug})
+    def save(self, *args, **kwargs): # Slug generated from the name if left blank (see core/slugs.py)
+        if self.slug: return super().save(*args, **kwargs)
+        save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
+    def get_absolute_url(self): return reverse('core:gallery_category_view', kwargs={'category_slug': self.slug})
 
 
 # THEN define Artwork
@@ -29,27 +33,44 @@ class Artwork(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, max_length=255, blank=True)
     primary_image = CloudinaryField('artwork_primary_image')
+    # Filled in by core/images.py after upload: intrinsic size, tiny placeholder (data: URI), dominant colour
+    primary_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    primary_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    primary_image_placeholder = models.TextField(blank=True, editable=False)
+    primary_image_color = models.CharField(max_length=7, blank=True, editable=False)
     description = models.TextField(blank=True)
     category = models.ForeignKey(GalleryCategory, on_delete=models.PROTECT, related_name='artworks')
     tags = TaggableManager(verbose_name="Artwork Tags", blank=True, related_name="artworks_tagged_directly") # Changed related_name
     date_uploaded = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # ETag for pages (see core/conditional.py)
+    # Set by `manage.py import_artworks` so re-running an import skips pieces it already created
+    import_key = models.CharField(max_length=255, unique=True, null=True, blank=True, editable=False)
     # ... Meta, __str__, save, get_absolute_url methods ...
     class Meta:
         ordering = ['-date_uploaded']
+        indexes = [
+            # Backs keyset pagination in the gallery API (ORDER BY date_uploaded DESC, id DESC)
+            models.Index(fields=['-date_uploaded', '-id'], name='core_artwork_uploaded_id_idx'),
+        ]
     def __str__(self): return self.title
-    def save(self, *args, **kwargs): # Basic slug generation
-        from django.utils.text import slugify
-        if not self.slug: self.slug = slugify(self.title)
-        super().save(*args, **kwargs) # Ensure unique slug logic if needed
-    def get_absolute_url(self): return reverse('artwork_detail', kwargs={'artwork_slug': self.slug})
+    def save(self, *args, **kwargs): # Slug generated from the title if left blank (see core/slugs.py)
+        if self.slug: return super().save(*args, **kwargs)
+        save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+    def get_absolute_url(self): return reverse('core:artwork_detail', kwargs={'artwork_slug': self.slug})
 
 
 # THEN define AdditionalArtworkImage (if it depends on Artwork)
 class AdditionalArtworkImage(models.Model):
     artwork = models.ForeignKey(Artwork, related_name='additional_images', on_delete=models.CASCADE)
     image = CloudinaryField('artwork_additional_image')
+    # Filled in by core/images.py after upload: intrinsic size, tiny placeholder (data: URI), dominant colour
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
     caption = models.CharField(max_length=255, blank=True, null=True)
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True) # ETag for pages (see core/conditional.py)
     # ... Meta, __str__ methods ...
     class Meta:
         ordering = ['order']
@@ -60,9 +81,15 @@ class AdditionalArtworkImage(models.Model):
 class HeroSlide(models.Model):
     title = models.CharField(max_length=100, help_text="Title for the slide (shown on overlay).")
     image = CloudinaryField('hero_slide_image', help_text="Image for the hero slide.")
+    # Filled in by core/images.py after upload: intrinsic size, tiny placeholder (data: URI), dominant colour
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
     link_url = models.URLField(max_length=255, blank=True, null=True, help_text="Optional URL this slide links to.")
     order = models.PositiveIntegerField(default=0, help_text="Order of display.")
     is_active = models.BooleanField(default=True, help_text="Display this slide?")
+    updated_at = models.DateTimeField(auto_now=True)
     # ... Meta, __str__ methods ...
     class Meta:
         ordering = ['order']
@@ -76,6 +103,7 @@ class FeaturedHomepageArtwork(models.Model):
     artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, help_text="Select an artwork to feature on the homepage.")
     order = models.PositiveIntegerField(default=0, help_text="Order of display (1, 2, 3).")
     is_active = models.BooleanField(default=True, help_text="Display this featured artwork?")
+    updated_at = models.DateTimeField(auto_now=True)
     # ... Meta, __str__ methods ...
     class Meta:
         ordering = ['order']
@@ -111,6 +139,52 @@ class InstagramImportedItem(models.Model):
     def __str__(self):
         return f"Instagram Import ({self.instagram_post_id}) - Status: {self.get_status_display()}"
 
+class InstagramSyncState(models.Model):
+    # Single row (pk=1) remembering how far the Instagram back-catalogue import has got,
+    # so an interrupted `sync_instagram` run carries on from the same page next time.
+    backfill_cursor = models.CharField(max_length=512, blank=True, help_text="Graph API 'after' cursor of the last fully imported page.")
+    backfill_complete = models.BooleanField(default=False, help_text="True once every older post has been imported.")
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Instagram Sync State"
+
+    def __str__(self):
+        return f"Instagram sync (last run: {self.last_synced_at or 'never'})"
+
+    @classmethod
+    def load(cls):
+        state, _ = cls.objects.get_or_create(pk=1)
+        return state
+
+class InstagramImportJob(models.Model):
+    # A batch of InstagramImportedItems being turned into Artworks in the background
+    # (see the "Process into artworks" admin action and core/instagram.py).
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    item_ids = models.JSONField(default=list, help_text="Primary keys of the InstagramImportedItems to process.")
+    category = models.ForeignKey(GalleryCategory, on_delete=models.PROTECT, related_name='+', help_text="Category given to the new artworks.")
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Instagram Import Job"
+        verbose_name_plural = "Instagram Import Jobs"
+
+    def __str__(self):
+        return f"Import job #{self.pk} ({self.get_status_display()}: {self.processed + self.failed}/{self.total})"
+
 # ... (SocialLink model definition as you have it) ...
 # class SocialLink(models.Model):
 # ...
@@ -142,6 +216,12 @@ class BlogPost(models.Model):
         editable=False,
         help_text="The date and time this post was published."
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # ETag for pages (see core/conditional.py)
+    # Precompiled from `content` on save, so the post page never has to parse it (see core/richtext.py)
+    content_html = models.TextField(blank=True, editable=False)
+    table_of_contents = models.JSONField(default=list, blank=True, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Estimated reading time in minutes.")
+    rendition_version = models.PositiveSmallIntegerField(default=0, editable=False)
     tags = TaggableManager(
         verbose_name="Blog Tags",
         help_text="Comma-separated list of tags. Artist can create new tags.",
@@ -154,6 +234,10 @@ class BlogPost(models.Model):
 
     class Meta:
         ordering = ['-publish_date'] # Newest posts first
+        indexes = [
+            # Backs keyset pagination in the blog listing (ORDER BY publish_date DESC, id DESC)
+            models.Index(fields=['-publish_date', '-id'], name='core_blogpost_published_id_idx'),
+        ]
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
 
@@ -161,30 +245,22 @@ class BlogPost(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        from django.utils.text import slugify # Import slugify here or at top of file
-        if not self.slug: # If slug is not set
-            self.slug = slugify(self.title)
-            # Ensure uniqueness if multiple posts might have similar titles
-            original_slug = self.slug
-            counter = 1
-            # Check if a post with this slug already exists (excluding self if updating)
-            queryset = BlogPost.objects.filter(slug=self.slug)
-            if self.pk:
-                queryset = queryset.exclude(pk=self.pk)
-            while queryset.exists():
-                self.slug = f'{original_slug}-{counter}'
-                counter += 1
-                queryset = BlogPost.objects.filter(slug=self.slug)
-                if self.pk:
-                    queryset = queryset.exclude(pk=self.pk)
-
         # Author setting is typically handled in the Admin's save_model method
         # if not self.pk and 'user' in kwargs: 
         #     self.author = kwargs.pop('user', None)
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields or self.rendition_version < RENDITION_VERSION:
+            # Also catches up posts built by an older RENDITION_VERSION, whatever else is saved
+            apply_rendition(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *RENDITION_FIELDS}
+        if self.slug:
+            return super().save(*args, **kwargs)
+        # Ensure uniqueness if multiple posts might have similar titles (one query, see core/slugs.py)
+        save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
 
     def get_absolute_url(self):
-        return reverse('blog_detail', kwargs={'slug': self.slug}) # Assumes URL name 'blog_detail'
+        return reverse('core:blog_detail', kwargs={'slug': self.slug})
 
 class Subscriber(models.Model):
     email = models.EmailField(unique=True, help_text="Email address of the subscriber.")
@@ -202,6 +278,92 @@ class Subscriber(models.Model):
         return f"{self.email} ({'Active' if self.is_active else 'Pending/Inactive'})"
 
 
+class NewsletterDispatch(models.Model):
+    # One "send this post to the mailing list" run. Progress is recorded per recipient in
+    # NewsletterDelivery, so an interrupted run picks up where it stopped (see core/newsletter.py).
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+    blog_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='newsletter_dispatches')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0, help_text="Active subscribers when the send started.")
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    errors = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True) # Moves with every batch; see claim_dispatch() in core/newsletter.py
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Newsletter Dispatch"
+        verbose_name_plural = "Newsletter Dispatches"
+        constraints = [
+            # A post is only ever emailed out once; interrupted sends are resumed, not repeated.
+            models.UniqueConstraint(fields=['blog_post'], name='unique_newsletter_dispatch_per_post'),
+        ]
+
+    def __str__(self):
+        return f"'{self.blog_post.title}' to subscribers ({self.get_status_display()})"
+
+
+class NewsletterDelivery(models.Model):
+    dispatch = models.ForeignKey(NewsletterDispatch, on_delete=models.CASCADE, related_name='deliveries')
+    subscriber = models.ForeignKey(Subscriber, on_delete=models.CASCADE, related_name='newsletter_deliveries')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dispatch', 'subscriber'], name='unique_newsletter_delivery'),
+        ]
+
+    def __str__(self):
+        return f"{self.subscriber.email} ({self.sent_at:%Y-%m-%d %H:%M})"
+
+
+class TagCount(models.Model):
+    # Materialised "how many items use this tag" numbers for tag clouds and filter sidebars,
+    # kept current by core/facets.py. Artwork counts are also stored per GalleryCategory.
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    tag = models.ForeignKey('taggit.Tag', on_delete=models.CASCADE, related_name='+')
+    scope = models.PositiveBigIntegerField(default=0, help_text="GalleryCategory id this count is limited to, or 0 for all items.")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'tag', 'scope'], name='unique_tag_count'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'scope', '-count'], name='core_tagcount_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag_id} x{self.count}"
+
+
+class RelatedArtwork(models.Model):
+    # Precomputed "you may also like" lists for artwork pages, kept current by core/related.py.
+    # One row per (artwork, rank), rank 0 being the closest match, so a page reads its list
+    # with a single lookup on the unique index.
+    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now) # ETag for pages (see core/conditional.py)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artwork', 'rank'], name='unique_related_artwork_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.artwork_id} -> {self.related_id} (#{self.rank})"
+
+
 class SocialLink(models.Model):
     PLATFORM_CHOICES = [
         ('facebook', 'Facebook'), 
@@ -215,6 +377,7 @@ class SocialLink(models.Model):
     url = models.URLField(help_text="Full URL to your social media profile page")
     icon_svg_or_class = models.CharField(max_length=100, blank=True, help_text="Optional: SVG code for icon, or a CSS class name if using an icon font")
     is_active = models.BooleanField(default=True, help_text="Display this link on the site?")
+    updated_at = models.DateTimeField(auto_now=True)
 
     # THIS FIELD IS LIKELY MISSING OR MISNAMED IN YOUR FILE:
     order = models.PositiveIntegerField(default=0, help_text="Order of display (e.g., 0 first, 1 second)") 
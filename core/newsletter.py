@@ -0,0 +1,178 @@
+# core/newsletter.py
+# Sends a BlogPost to every active Subscriber.
+#
+# - Subscribers are streamed with .iterator(), NEWSLETTER_BATCH_SIZE at a time, and each batch
+#   goes out over a single SMTP connection (one TLS handshake per batch, not per email).
+# - The email is rendered once per run; only the unsubscribe link differs per subscriber and is
+#   swapped in as a string.
+# - Every successful send is recorded as a NewsletterDelivery, so re-running an interrupted
+#   dispatch only emails the people who haven't had it yet.
+# - A run first claims its dispatch (claim_dispatch()), so the admin's background thread and
+#   `send_newsletter --resume` can never both be sending the same one.
+#
+# Also the confirmation email for new signups (double opt-in, see subscribe_view).
+import smtplib
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Exists, OuterRef, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from .background import start_in_background
+from .models import NewsletterDelivery, NewsletterDispatch, Subscriber
+
+UNSUBSCRIBE_URL_PLACEHOLDER = '__newsletter_unsubscribe_url__'
+# A dispatch still 'sending' with no progress for this long belongs to a run that died.
+DISPATCH_STALE_AFTER = timedelta(minutes=10)
+
+
+def absolute_url(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def claim_dispatch(dispatch):
+    # Marks `dispatch` as sending with one conditional UPDATE; False if another run has it.
+    now = timezone.now()
+    claimable = Q(status__in=['queued', 'failed']) | Q(status='sending', updated_at__lt=now - DISPATCH_STALE_AFTER)
+    if not NewsletterDispatch.objects.filter(claimable, pk=dispatch.pk).update(status='sending', started_at=now, updated_at=now):
+        return False
+    dispatch.status, dispatch.started_at, dispatch.updated_at = 'sending', now, now
+    return True
+
+
+class NewsletterSender:
+    def __init__(self, dispatch, batch_size=None, max_per_second=None):
+        self.dispatch = dispatch
+        self.batch_size = batch_size or settings.NEWSLETTER_BATCH_SIZE
+        self.max_per_second = settings.NEWSLETTER_MAX_PER_SECOND if max_per_second is None else max_per_second
+        self._next_send_at = 0.0
+
+    def _render(self):
+        post = self.dispatch.blog_post
+        context = {
+            'post': post,
+            'post_url': absolute_url(post.get_absolute_url()),
+            'unsubscribe_url': UNSUBSCRIBE_URL_PLACEHOLDER,
+        }
+        self.subject = f"New on the blog: {post.title}"
+        self.text_body = render_to_string('core/emails/new_blog_post.txt', context)
+        self.html_body = render_to_string('core/emails/new_blog_post.html', context)
+
+    def pending_subscribers(self):
+        already_sent = NewsletterDelivery.objects.filter(dispatch=self.dispatch, subscriber=OuterRef('pk'))
+        return (
+            Subscriber.objects.filter(is_active=True)
+            .exclude(Exists(already_sent))
+            .only('pk', 'email', 'unsubscribe_token')
+            .order_by('pk')
+        )
+
+    def build_message(self, subscriber, connection):
+        unsubscribe_url = absolute_url(reverse('core:unsubscribe_blog', args=[subscriber.unsubscribe_token]))
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.text_body.replace(UNSUBSCRIBE_URL_PLACEHOLDER, unsubscribe_url),
+            to=[subscriber.email],
+            # One-click unsubscribe (RFC 8058): the mail client POSTs to the link itself.
+            headers={'List-Unsubscribe': f'<{unsubscribe_url}>', 'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click'},
+            connection=connection,
+        )
+        message.attach_alternative(self.html_body.replace(UNSUBSCRIBE_URL_PLACEHOLDER, unsubscribe_url), 'text/html')
+        return message
+
+    def _throttle(self):
+        if not self.max_per_second:
+            return
+        now = time.monotonic()
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+        self._next_send_at = max(now, self._next_send_at) + 1.0 / self.max_per_second
+
+    def _send_batch(self, subscribers):
+        sent, failed = [], []
+        connection = get_connection()
+        connection.open()
+        try:
+            # Messages go one at a time over the open connection so each success can be recorded
+            # and the throttle applies per email; the connection itself is shared by the batch.
+            for subscriber in subscribers:
+                self._throttle()
+                try:
+                    connection.send_messages([self.build_message(subscriber, connection)])
+                except smtplib.SMTPRecipientsRefused as exc:
+                    failed.append(f"{subscriber.email}: {exc.recipients}")
+                else:
+                    sent.append(subscriber)
+        finally:
+            connection.close()
+            # Recorded even if the batch was cut short, so a resumed run skips these people.
+            NewsletterDelivery.objects.bulk_create(
+                [NewsletterDelivery(dispatch=self.dispatch, subscriber=subscriber) for subscriber in sent],
+                ignore_conflicts=True,
+            )
+            self.dispatch.sent_count += len(sent)
+            self.dispatch.failed_count += len(failed)
+            self.dispatch.errors += ''.join(f"{error}\n" for error in failed)
+            self.dispatch.save(update_fields=['sent_count', 'failed_count', 'errors', 'updated_at'])
+
+    def run(self):
+        # Returns False, without sending anything, if another run is already sending this dispatch.
+        dispatch = self.dispatch
+        if not claim_dispatch(dispatch):
+            return False
+        self._render()
+        pending = self.pending_subscribers()
+        dispatch.sent_count = dispatch.deliveries.count()
+        dispatch.total = dispatch.sent_count + pending.count()
+        dispatch.failed_count, dispatch.errors = 0, ''
+        dispatch.save(update_fields=['sent_count', 'total', 'failed_count', 'errors', 'updated_at'])
+
+        batch = []
+        for subscriber in pending.iterator(chunk_size=self.batch_size):
+            batch.append(subscriber)
+            if len(batch) >= self.batch_size:
+                self._send_batch(batch)
+                batch = []
+        if batch:
+            self._send_batch(batch)
+
+        dispatch.status, dispatch.finished_at = 'finished', timezone.now()
+        dispatch.save(update_fields=['status', 'finished_at', 'updated_at'])
+        return True
+
+
+def run_dispatch(dispatch, **kwargs):
+    try:
+        return NewsletterSender(dispatch, **kwargs).run()
+    except Exception as exc:
+        dispatch.status, dispatch.finished_at = 'failed', timezone.now()
+        dispatch.errors += f"Send stopped: {exc}\n"
+        dispatch.save(update_fields=['status', 'finished_at', 'errors', 'updated_at'])
+        raise
+
+
+def start_dispatch(dispatch):
+    # Called from the admin action. Without in-process mode the dispatch stays queued for the command.
+    if settings.NEWSLETTER_RUN_IN_PROCESS:
+        start_in_background(_run_queued_dispatch, dispatch.pk)
+
+
+def _run_queued_dispatch(dispatch_id):
+    run_dispatch(NewsletterDispatch.objects.select_related('blog_post').get(pk=dispatch_id))
+
+
+# --- Subscribing (double opt-in) ---
+
+def send_confirmation(subscriber_id):
+    # The "please confirm" email for a new signup; run on the background pool by subscribe_view.
+    subscriber = Subscriber.objects.filter(pk=subscriber_id, is_active=False).first()
+    if subscriber is None:
+        return  # Confirmed (or removed) since
+    context = {'confirm_url': absolute_url(reverse('core:confirm_subscription', args=[subscriber.confirmation_token]))}
+    EmailMultiAlternatives(
+        subject="Please confirm your subscription",
+        body=render_to_string('core/emails/confirm_subscription.txt', context),
+        to=[subscriber.email],
+    ).send()
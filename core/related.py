@@ -0,0 +1,223 @@
+# core/related.py
+# "Related artworks" for artwork pages, read from the RelatedArtwork table (one indexed lookup)
+# instead of comparing tags against every artwork through taggit's generic TaggedItem table.
+#
+# An artwork's score against another is the sum of:
+#   - tag similarity: cosine similarity of their tag sets, each tag weighted by how rare it is
+#     (idf), so sharing "seascape" counts for more than sharing "painting". Tags on more than
+#     COMMON_TAG_LIMIT artworks are ignored; they say little and would make every pair a candidate.
+#   - CATEGORY_WEIGHT if both are in the same GalleryCategory
+#   - up to RECENCY_WEIGHT for newer pieces, halving every RECENCY_HALF_LIFE_DAYS
+# and the TOP_K best are stored. Scores come from an inverted index (tag -> artworks), i.e. the
+# sparse artwork x tag matrix multiplied by its transpose one row at a time, so an artwork only
+# meets the artworks it shares a tag (or category) with.
+#
+# Saves, deletions and tag changes refresh the lists they affect after commit, on the background
+# pool (see core/signals.py): the edited artworks, the artworks sharing a tag with them and the ones already
+# listing them; `python manage.py rebuild_related_artworks` recomputes the
+# whole table (run it after large imports, or nightly to keep the recency part fresh).
+import heapq
+import math
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from taggit.models import TaggedItem
+from . import background
+from .models import Artwork, RelatedArtwork
+
+TOP_K = 8
+CATEGORY_WEIGHT = 0.3
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_DAYS = 365
+COMMON_TAG_LIMIT = 1000
+QUERY_CHUNK_SIZE = 500  # Ids per IN (...) list
+WRITE_BATCH_SIZE = 500  # Artworks whose lists are replaced per transaction
+
+
+def _chunks(ids, size=QUERY_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class _Index:
+    # What scoring needs to know about a set of artworks: their tags, the artworks behind each of
+    # those tags, and category/upload date of everything involved.
+    def __init__(self, tagged, document_frequency, total):
+        self.tags = defaultdict(set)
+        self.postings = defaultdict(list)
+        for artwork_id, tag_id in tagged:
+            self.tags[artwork_id].add(tag_id)
+            self.postings[tag_id].append(artwork_id)
+        self.idf = {
+            tag_id: math.log((total + 1) / count) if count <= COMMON_TAG_LIMIT else 0.0
+            for tag_id, count in document_frequency.items()
+        }
+        self.info = {}  # artwork id -> (category id, date uploaded)
+        self.recent = {}  # category id -> newest artwork ids
+
+    def norm(self, artwork_id):
+        return math.sqrt(sum(self.idf.get(tag_id, 0.0) ** 2 for tag_id in self.tags.get(artwork_id, ())))
+
+    def scores(self, artwork_id, now):
+        # The TOP_K best [(score, related id), ...] for one artwork.
+        overlap = defaultdict(float)
+        for tag_id in self.tags.get(artwork_id, ()):
+            weight = self.idf.get(tag_id, 0.0) ** 2
+            if weight:
+                for other in self.postings[tag_id]:
+                    overlap[other] += weight
+        category = self.info[artwork_id][0]
+        candidates = set(overlap) | set(self.recent.get(category, ()))
+        candidates.discard(artwork_id)
+        norm = self.norm(artwork_id)
+        scored = []
+        for other in candidates:
+            if other not in self.info:  # TaggedItem rows can outlive their artwork
+                continue
+            other_category, uploaded = self.info[other]
+            score = 0.0
+            if overlap.get(other):
+                score += overlap[other] / (norm * self.norm(other))
+            if other_category == category:
+                score += CATEGORY_WEIGHT
+            age_days = max((now - uploaded).total_seconds(), 0) / 86400
+            score += RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+            scored.append((score, other))
+        return heapq.nlargest(TOP_K, scored)
+
+
+def _load_info(index, artwork_ids):
+    for chunk in _chunks(set(artwork_ids) - set(index.info)):
+        for pk, category_id, uploaded in Artwork.objects.filter(pk__in=chunk).values_list('pk', 'category_id', 'date_uploaded'):
+            index.info[pk] = (category_id, uploaded)
+
+
+def _load_recent(index, category_ids):
+    # Artworks related only by category score by recency alone, so the newest TOP_K + 1 (one may
+    # be the artwork itself) are the only category-only candidates worth considering.
+    for category_id in set(category_ids) - set(index.recent):
+        index.recent[category_id] = list(
+            Artwork.objects.filter(category_id=category_id)
+            .order_by('-date_uploaded', '-id').values_list('pk', flat=True)[:TOP_K + 1]
+        )
+    _load_info(index, [pk for pks in index.recent.values() for pk in pks])
+
+
+def _full_index():
+    content_type = ContentType.objects.get_for_model(Artwork)
+    tagged = list(TaggedItem.objects.filter(content_type=content_type).values_list('object_id', 'tag_id'))
+    frequency = defaultdict(int)
+    for _, tag_id in tagged:
+        frequency[tag_id] += 1
+    index = _Index(tagged, frequency, Artwork.objects.count())
+    for pk, category_id, uploaded in Artwork.objects.values_list('pk', 'category_id', 'date_uploaded'):
+        index.info[pk] = (category_id, uploaded)
+    _load_recent(index, {category_id for category_id, _ in index.info.values()})
+    return index
+
+
+def _partial_index(artwork_ids):
+    # Just enough of the index to score `artwork_ids`: their tags, every artwork sharing one of
+    # those tags, and those artworks' own tags (for their norms).
+    content_type = ContentType.objects.get_for_model(Artwork)
+    items = TaggedItem.objects.filter(content_type=content_type)
+    tag_ids = set()
+    for chunk in _chunks(artwork_ids):
+        tag_ids.update(items.filter(object_id__in=chunk).values_list('tag_id', flat=True))
+    frequency = {}
+    for chunk in _chunks(tag_ids):
+        frequency.update(items.filter(tag_id__in=chunk).values('tag_id').annotate(n=Count('id')).values_list('tag_id', 'n').order_by())
+    shared = [tag_id for tag_id in tag_ids if frequency[tag_id] <= COMMON_TAG_LIMIT]
+    candidate_ids = set(artwork_ids)
+    for chunk in _chunks(shared):
+        candidate_ids.update(items.filter(tag_id__in=chunk).values_list('object_id', flat=True))
+    tagged = []
+    for chunk in _chunks(candidate_ids):
+        tagged.extend(items.filter(object_id__in=chunk).values_list('object_id', 'tag_id'))
+    extra_tags = {tag_id for _, tag_id in tagged} - set(frequency)
+    for chunk in _chunks(extra_tags):
+        frequency.update(items.filter(tag_id__in=chunk).values('tag_id').annotate(n=Count('id')).values_list('tag_id', 'n').order_by())
+    # Postings are only complete for the scored artworks' own tags, which are the only ones
+    # scores() walks; the candidates' other tags just feed their norms.
+    index = _Index(tagged, frequency, Artwork.objects.count())
+    _load_info(index, candidate_ids)
+    _load_recent(index, {index.info[pk][0] for pk in artwork_ids if pk in index.info})
+    return index
+
+
+def _store(index, artwork_ids):
+    now = timezone.now()
+    stored = 0
+    for chunk in _chunks(artwork_ids, WRITE_BATCH_SIZE):
+        rows = [
+            RelatedArtwork(artwork_id=pk, related_id=other, rank=rank, score=score, computed_at=now)
+            for pk in chunk
+            for rank, (score, other) in enumerate(index.scores(pk, now))
+        ]
+        with transaction.atomic():
+            # Upserted, not just inserted: two refreshes of the same artwork may overlap.
+            RelatedArtwork.objects.filter(artwork_id__in=chunk).delete()
+            RelatedArtwork.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['artwork', 'rank'], update_fields=['related', 'score', 'computed_at'],
+            )
+        stored += len(rows)
+    return stored
+
+
+def rebuild():
+    # Recomputes every list. Returns how many rows were stored.
+    index = _full_index()
+    with transaction.atomic():
+        RelatedArtwork.objects.all().delete()
+        return _store(index, sorted(index.info))
+
+
+def recompute(artwork_ids):
+    # Recomputes the lists of exactly `artwork_ids` (ids of deleted artworks are skipped).
+    existing = set()
+    for chunk in _chunks(artwork_ids):
+        existing.update(Artwork.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+    if not existing:
+        return 0
+    return _store(_partial_index(existing), sorted(existing))
+
+
+def affected_artwork_ids(artwork_ids):
+    # The artworks whose lists may change when `artwork_ids` change: themselves, the artworks
+    # sharing a (not too common) tag with them and the ones listing them now.
+    artwork_ids = set(artwork_ids)
+    affected = set(artwork_ids)
+    content_type = ContentType.objects.get_for_model(Artwork)
+    items = TaggedItem.objects.filter(content_type=content_type)
+    for chunk in _chunks(artwork_ids):
+        tag_ids = (
+            items.filter(tag_id__in=items.filter(object_id__in=chunk).values('tag_id'))
+            .values('tag_id').annotate(n=Count('id')).filter(n__lte=COMMON_TAG_LIMIT).values('tag_id')
+        )
+        affected.update(items.filter(tag_id__in=tag_ids).values_list('object_id', flat=True))
+        affected.update(RelatedArtwork.objects.filter(related_id__in=chunk).values_list('artwork_id', flat=True))
+    return affected
+
+
+def refresh(artwork_ids):
+    # Recomputes the lists affected by changes to `artwork_ids`.
+    return recompute(affected_artwork_ids(artwork_ids))
+
+
+def refresh_on_commit(artwork_ids):
+    # After the commit, on the background pool, so the admin save doesn't wait for it.
+    artwork_ids = set(artwork_ids)
+    if artwork_ids:
+        background.submit_to_pool(refresh, artwork_ids)
+
+
+def related_artworks(artwork, limit=TOP_K):
+    # The stored list for `artwork` (or its id), closest first: one query on the unique index.
+    rows = (
+        RelatedArtwork.objects.filter(artwork=getattr(artwork, 'pk', artwork))
+        .select_related('related').order_by('rank')[:limit]
+    )
+    return [row.related for row in rows]
@@ -0,0 +1,80 @@
+# core/renditions.py
+# Named image renditions for CloudinaryField images, so pages send an image sized for the slot it
+# fills (a 300px tile gets a ~300px file, not the 4000px original), in the best format the browser
+# takes (f_auto) at automatic quality (q_auto).
+#
+# Each rendition lists the widths Cloudinary should produce (the srcset) and the `sizes` telling
+# the browser how wide the slot is. Use them in templates with the tags in
+# core/templatetags/renditions.py, e.g. <img {% srcset art_piece.primary_image 'card' %} alt="...">.
+#
+# Building a URL with the Cloudinary SDK takes ~80us, which adds up over a grid of images with
+# several widths each. URLs only depend on the image (a new upload gets a new public id/version)
+# and the rendition, so each set is built once per process and memoised.
+from functools import lru_cache
+from cloudinary import CloudinaryResource
+from cloudinary.utils import generate_transformation_string
+from cloudinary.models import CloudinaryField
+
+RENDITIONS = {
+    # name: widths to generate (px), sizes attribute, width used where only one URL fits (CSS backgrounds)
+    'thumb': {'widths': (160, 320), 'sizes': '160px', 'default': 320},
+    'card': {'widths': (320, 480, 640, 960), 'sizes': '(max-width: 600px) 100vw, 360px', 'default': 640},
+    'hero': {'widths': (640, 1024, 1600, 2400), 'sizes': '100vw', 'default': 1600},
+    'full': {'widths': (800, 1200, 1600, 2400), 'sizes': '(max-width: 1200px) 100vw, 1200px', 'default': 1600},
+}
+TRANSFORMATION = {'crop': 'limit', 'fetch_format': 'auto', 'quality': 'auto'}  # c_limit never upscales
+URL_CACHE_SIZE = 20000  # Image/rendition pairs per process, a few MB at most
+
+_field = CloudinaryField()
+
+
+def _resource(image):
+    # Model instances hold a CloudinaryResource once loaded from the database, but a plain string
+    # (public id or stored value) until then.
+    if isinstance(image, str):
+        image = _field.to_python(image)
+    return image if isinstance(image, CloudinaryResource) and image.public_id else None
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def _urls(public_id, format, version, type, resource_type, name):
+    resource = CloudinaryResource(public_id, format=format, version=version, type=type, resource_type=resource_type)
+    rendition = RENDITIONS[name]
+    widths = sorted({*rendition['widths'], rendition['default']})
+    return {width: resource.build_url(width=width, **TRANSFORMATION) for width in widths}
+
+
+@lru_cache(maxsize=None)
+def transformations():
+    # Every transformation a rendition URL carries, e.g. 'c_limit,f_auto,q_auto,w_320'. Local image
+    # storage makes these and nothing else (core/local_images.py).
+    widths = {width for rendition in RENDITIONS.values() for width in (*rendition['widths'], rendition['default'])}
+    return frozenset(generate_transformation_string(width=width, **TRANSFORMATION)[0] for width in widths)
+
+
+def rendition_urls(image, name):
+    # {width: URL} for `image` in rendition `name`; empty if there's no image.
+    if name not in RENDITIONS:
+        raise ValueError(f"Unknown image rendition {name!r}; choose from {', '.join(RENDITIONS)}.")
+    resource = _resource(image)
+    if resource is None:
+        return {}
+    return _urls(resource.public_id, resource.format, resource.version, resource.type, resource.resource_type, name)
+
+
+def rendition_url(image, name):
+    # A single URL, for places that can't take a srcset (CSS backgrounds, JSON, emails).
+    return rendition_urls(image, name).get(RENDITIONS[name]['default'])
+
+
+def srcset_attributes(image, name):
+    # {'src', 'srcset', 'sizes'} for an <img>, or {} if there's no image.
+    urls = rendition_urls(image, name)
+    if not urls:
+        return {}
+    rendition = RENDITIONS[name]
+    return {
+        'src': urls[rendition['default']],
+        'srcset': ', '.join(f'{urls[width]} {width}w' for width in rendition['widths']),
+        'sizes': rendition['sizes'],
+    }
@@ -0,0 +1,181 @@
+# core/richtext.py
+# Blog posts are written in CKEditor, so BlogPost.content is arbitrary HTML. Everything the post
+# page needs done to it happens here, once, when the post is saved (or by
+# `manage.py rebuild_blog_html`), and the result is stored on the post:
+#
+# - content_html: the content sanitised against an allowlist of tags and attributes (scripts,
+#   styles, event handlers and javascript: links are dropped). Images get loading="lazy",
+#   decoding="async" and width/height (from CKEditor's inline style when there are no
+#   attributes), and Cloudinary images are resized for the post column, with a srcset.
+# - table_of_contents: the h2/h3 headings, which get ids to link to.
+# - reading_time: minutes, at WORDS_PER_MINUTE.
+#
+# Bump RENDITION_VERSION whenever the output changes, then run `manage.py rebuild_blog_html`.
+import html
+import math
+import re
+from html.parser import HTMLParser
+from django.utils.text import slugify
+
+RENDITION_VERSION = 2
+RENDITION_FIELDS = ('content_html', 'table_of_contents', 'reading_time', 'rendition_version')
+WORDS_PER_MINUTE = 220
+
+CONTENT_IMAGE_WIDTH = 800  # Width of the post column, in CSS pixels
+RESPONSIVE_WIDTHS = (480, 800, 1200, 1600)
+CONTENT_IMAGE_SIZES = f'(max-width: {CONTENT_IMAGE_WIDTH}px) 100vw, {CONTENT_IMAGE_WIDTH}px'
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup',
+    'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'ol': {'start'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+}
+NUMERIC_ATTRIBUTES = {'width', 'height', 'start', 'colspan', 'rowspan'}
+# Elements that never have an end tag (the full HTML list, not just the allowed ones).
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# Removed together with everything inside them (other unknown tags are removed, keeping their text).
+DROPPED_WITH_CONTENT = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'svg', 'math', 'form'}
+SAFE_URL_SCHEMES = {'http', 'https', 'mailto'}  # Relative URLs are fine too
+TOC_LEVELS = {'h2': 2, 'h3': 3}
+
+CLOUDINARY_UPLOAD_URL = re.compile(r'^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$')
+CLOUDINARY_TRANSFORMATION = re.compile(r'^[a-z]{1,3}_[^/]*/')  # e.g. "c_fill,w_300/" - already sized
+STYLE_DIMENSION = re.compile(r'(width|height)\s*:\s*(\d+)px')
+
+
+def _is_safe_url(url):
+    # Browsers ignore whitespace and control characters inside the scheme ("java\tscript:").
+    scheme = re.match(r'^([a-z][a-z0-9+.-]*):', re.sub(r'[\x00-\x20]', '', url).lower())
+    return scheme is None or scheme.group(1) in SAFE_URL_SCHEMES
+
+
+def _resized_cloudinary_url(url, width):
+    match = CLOUDINARY_UPLOAD_URL.match(url)
+    if not match or CLOUDINARY_TRANSFORMATION.match(match.group(2)):
+        return None
+    return f'{match.group(1)}f_auto,q_auto,c_limit,w_{width}/{match.group(2)}'
+
+
+def _start_tag(tag, attributes):
+    return f'<{tag}' + ''.join(f' {name}="{html.escape(value)}"' for name, value in attributes.items()) + '>'
+
+
+class _RenditionBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.skipping = None  # (DROPPED_WITH_CONTENT tag being skipped, how many of it are open)
+        self.words = 0
+        self.heading = None  # (tag, attributes, index of its start tag in output, text so far)
+        self.table_of_contents = []
+        self.heading_ids = set()
+
+    def handle_starttag(self, tag, attrs):
+        # Only the dropped tag itself is counted while skipping: whatever is inside it may be
+        # void or left unclosed, and must not keep the rest of the post hidden.
+        if self.skipping:
+            if tag == self.skipping[0]:
+                self.skipping = (tag, self.skipping[1] + 1)
+            return
+        if tag in DROPPED_WITH_CONTENT:
+            if tag not in VOID_TAGS:  # <embed> has no content to skip
+                self.skipping = (tag, 1)
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        raw = {name: value for name, value in attrs if value is not None}
+        attributes = {
+            name: value for name, value in raw.items()
+            if name in ALLOWED_ATTRIBUTES.get(tag, ())
+            and (name not in NUMERIC_ATTRIBUTES or value.isdigit())
+            and (name not in ('href', 'src') or _is_safe_url(value))
+        }
+        if tag == 'img':
+            if 'src' not in attributes:
+                return
+            self.prepare_image(attributes, raw.get('style', ''))
+        if tag in TOC_LEVELS and self.heading is None:
+            self.heading = (tag, attributes, len(self.output), [])
+        self.output.append(_start_tag(tag, attributes))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def prepare_image(self, attributes, style):
+        for name, value in STYLE_DIMENSION.findall(style):
+            attributes.setdefault(name, value)
+        attributes.setdefault('alt', '')
+        resized = _resized_cloudinary_url(attributes['src'], CONTENT_IMAGE_WIDTH)
+        if resized:
+            attributes['srcset'] = ', '.join(
+                f'{_resized_cloudinary_url(attributes["src"], width)} {width}w' for width in RESPONSIVE_WIDTHS
+            )
+            attributes['sizes'] = CONTENT_IMAGE_SIZES
+            attributes['src'] = resized
+        attributes['loading'] = 'lazy'
+        attributes['decoding'] = 'async'
+
+    def handle_endtag(self, tag):
+        if self.skipping:
+            if tag == self.skipping[0]:
+                self.skipping = (tag, self.skipping[1] - 1) if self.skipping[1] > 1 else None
+            return
+        if tag not in self.open_tags:
+            return
+        # Anything opened inside it and left unclosed is closed here as well.
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if self.heading and open_tag == self.heading[0]:
+                self.finish_heading()
+            if open_tag == tag:
+                break
+
+    def finish_heading(self):
+        tag, attributes, index, text = self.heading
+        self.heading = None
+        title = ' '.join(''.join(text).split())
+        if not title:
+            return
+        base = slugify(title) or 'section'
+        heading_id, number = base, 1
+        while heading_id in self.heading_ids:
+            number += 1
+            heading_id = f'{base}-{number}'
+        self.heading_ids.add(heading_id)
+        self.output[index] = _start_tag(tag, {'id': heading_id, **attributes})
+        self.table_of_contents.append({'level': TOC_LEVELS[tag], 'id': heading_id, 'title': title})
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        self.words += len(data.split())
+        if self.heading:
+            self.heading[3].append(data)
+        self.output.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        if self.open_tags:  # Close whatever the author left open
+            self.handle_endtag(self.open_tags[0])
+
+
+def build_rendition(content):
+    # Returns (html, table of contents, reading time in minutes).
+    builder = _RenditionBuilder()
+    builder.feed(content or '')
+    builder.close()
+    return ''.join(builder.output), builder.table_of_contents, max(1, math.ceil(builder.words / WORDS_PER_MINUTE))
+
+
+def apply_rendition(post):
+    # Fills in the post's RENDITION_FIELDS from its content, without saving.
+    post.content_html, post.table_of_contents, post.reading_time = build_rendition(post.content)
+    post.rendition_version = RENDITION_VERSION
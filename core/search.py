@@ -0,0 +1,159 @@
+# core/search.py
+# Full-text search over artworks (title, description, tag names, category name).
+#
+# The index lives in its own table, created by migration 0003:
+#   - SQLite: an FTS5 virtual table, ranked with bm25()
+#   - PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank()
+# Other database backends fall back to the old icontains scan.
+# Rows are kept current by the signal handlers in core/signals.py, through index_on_commit(): an
+# admin save sends post_save and then the tag signals, and the artwork is indexed once after the
+# commit. Run `python manage.py rebuild_search_index` after bulk changes that skip signals.
+import re
+import threading
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Artwork
+
+SEARCH_TABLE = 'core_artwork_search'
+MAX_QUERY_TERMS = 8
+
+# Relative importance of each field when ranking (title matches beat description matches)
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 5.0, 3.0)  # title, description, tags, category
+
+SQLITE_UPSERT_SQL = (
+    f'INSERT INTO {SEARCH_TABLE} (rowid, title, description, tags, category) VALUES (%s, %s, %s, %s, %s)'
+)
+POSTGRES_UPSERT_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (artwork_id, document)
+    VALUES (%s, setweight(to_tsvector('english', %s), 'A')
+             || setweight(to_tsvector('english', %s), 'D')
+             || setweight(to_tsvector('english', %s), 'B')
+             || setweight(to_tsvector('english', %s), 'C'))
+    ON CONFLICT (artwork_id) DO UPDATE SET document = EXCLUDED.document
+"""
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def _query_terms(query):
+    # Only plain word characters ever reach MATCH / to_tsquery, so user input can't inject operators.
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+
+
+def _document_values(artwork):
+    tags = ' '.join(tag.name for tag in artwork.tags.all())
+    return [artwork.title, artwork.description, tags, artwork.category.name]
+
+
+def index_artworks(artworks):
+    # Expects artworks fetched with select_related('category') and prefetch_related('tags').
+    if not is_supported():
+        return
+    artworks = list(artworks)
+    if not artworks:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # FTS5 tables have no upsert, so replace the rows outright.
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(a.pk,) for a in artworks])
+            cursor.executemany(SQLITE_UPSERT_SQL, [[a.pk] + _document_values(a) for a in artworks])
+        else:
+            cursor.executemany(POSTGRES_UPSERT_SQL, [[a.pk] + _document_values(a) for a in artworks])
+
+
+def index_artwork_ids(artwork_ids):
+    artworks = Artwork.objects.filter(pk__in=artwork_ids).select_related('category').prefetch_related('tags')
+    index_artworks(artworks)
+
+
+_pending = threading.local()  # Ids waiting for this thread's transaction to commit
+
+
+def _index_pending():
+    artwork_ids, _pending.ids = _pending.ids, None
+    index_artwork_ids(artwork_ids)
+
+
+def _pending_is_queued():
+    # False once its transaction has rolled back (which drops the callback) or committed.
+    return any(entry[1] is _index_pending for entry in connection.run_on_commit)
+
+
+def index_on_commit(artwork_ids):
+    artwork_ids = set(artwork_ids)
+    if not artwork_ids:
+        return
+    if getattr(_pending, 'ids', None) is not None and _pending_is_queued():
+        _pending.ids.update(artwork_ids)
+        return
+    _pending.ids = artwork_ids
+    transaction.on_commit(_index_pending)
+
+
+def remove_artwork(artwork_id):
+    if not is_supported():
+        return
+    key_column = 'rowid' if connection.vendor == 'sqlite' else 'artwork_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE {key_column} = %s', [artwork_id])
+
+
+def rebuild_index(batch_size=500):
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    artworks = Artwork.objects.select_related('category').prefetch_related('tags').order_by('pk')
+    count = 0
+    batch = []
+    for artwork in artworks.iterator(chunk_size=batch_size):
+        batch.append(artwork)
+        if len(batch) >= batch_size:
+            index_artworks(batch)
+            count += len(batch)
+            batch = []
+    index_artworks(batch)
+    return count + len(batch)
+
+
+def _ranked_ids(terms, limit):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Every term must match; the last one is a prefix so results appear while typing.
+            match = ' '.join(f'"{term}"' for term in terms[:-1])
+            match = f'{match} "{terms[-1]}"*'.strip()
+            weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s',
+                [match, limit],
+            )
+        else:
+            tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+            cursor.execute(
+                f"SELECT artwork_id FROM {SEARCH_TABLE}, to_tsquery('english', %s) query "
+                f'WHERE document @@ query ORDER BY ts_rank(document, query) DESC, artwork_id DESC LIMIT %s',
+                [tsquery, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_artworks(query, limit=50):
+    # Returns Artwork objects, best match first.
+    terms = _query_terms(query)
+    if not terms:
+        return []
+    if not is_supported():
+        lookup = Q()
+        for term in terms:
+            lookup &= (
+                Q(title__icontains=term) | Q(description__icontains=term)
+                | Q(tags__name__icontains=term) | Q(category__name__icontains=term)
+            )
+        return list(Artwork.objects.filter(lookup).select_related('category').distinct()[:limit])
+
+    ids = _ranked_ids(terms, limit)
+    artworks = Artwork.objects.select_related('category').in_bulk(ids)
+    return [artworks[pk] for pk in ids if pk in artworks]
@@ -0,0 +1,258 @@
+# core/signals.py
+from cloudinary import CloudinaryResource
+from cloudinary.models import CloudinaryField
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag
+from . import background, caching, facets, images, local_images, related, search
+from .models import AdditionalArtworkImage, Artwork, BlogPost, FeaturedHomepageArtwork, GalleryCategory, HeroSlide, RelatedArtwork, SocialLink
+
+# Invalidation waits for the transaction to commit (admin saves are atomic). Clearing earlier
+# would let a concurrent request re-cache the old rows before the new ones are visible.
+
+
+@receiver([post_save, post_delete], sender=HeroSlide)
+@receiver([post_save, post_delete], sender=FeaturedHomepageArtwork)
+@receiver([post_save, post_delete], sender=Artwork)
+@receiver([post_save, post_delete], sender=SocialLink)
+def invalidate_homepage_cache(sender, **kwargs):
+    transaction.on_commit(caching.invalidate_homepage)
+
+
+@receiver([post_save, post_delete], sender=SocialLink)
+def bump_social_links_version(sender, **kwargs):
+    # Every worker compares this counter on its next request and reloads its copy of the links.
+    transaction.on_commit(caching.bump_social_links_version)
+
+
+@receiver([post_save, post_delete], sender=Artwork)
+@receiver([post_save, post_delete], sender=AdditionalArtworkImage)
+@receiver([post_save, post_delete], sender=GalleryCategory)
+@receiver([post_save, post_delete], sender=Tag)
+def bump_gallery_version(sender, **kwargs):
+    # Gallery API ETags are derived from this counter (see core/views.py).
+    transaction.on_commit(caching.bump_gallery_version)
+
+
+@receiver(m2m_changed, sender=Artwork.tags.through)
+def bump_gallery_version_on_tag_change(sender, instance, action, **kwargs):
+    # TaggedItem is shared with BlogPost, so only react to artwork tags.
+    if isinstance(instance, Artwork) and action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(caching.bump_gallery_version)
+
+
+# --- Conditional GET (core/conditional.py) ---
+# Page ETags come from updated_at, which adding, removing or renaming a tag doesn't touch by
+# itself, but artwork and post pages show their tags.
+
+def _touch(model, pks):
+    now = timezone.now()
+    if pks:
+        model.objects.filter(pk__in=pks).update(updated_at=now)
+    return now
+
+
+@receiver(m2m_changed, sender=Artwork.tags.through)
+def touch_retagged_items(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse:
+        # tag.artworks_tagged_directly.add(...) and friends: `instance` is the Tag.
+        if model in facets.TAGGED_MODELS and action in ('post_add', 'post_remove'):
+            _touch(model, pk_set)
+    elif isinstance(instance, facets.TAGGED_MODELS) and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.updated_at = _touch(type(instance), [instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_items_with_changed_tag(sender, instance, created=False, **kwargs):
+    if not created:
+        for model in facets.TAGGED_MODELS:
+            _touch(model, list(model.objects.filter(tags=instance).values_list('pk', flat=True)))
+
+
+# --- Full-text search index (core/search.py) ---
+# Indexing waits for the commit and runs once per transaction, however many of these fire.
+# Removals run inside the deleting transaction, so they roll back with it.
+
+@receiver(post_save, sender=Artwork)
+def index_artwork(sender, instance, **kwargs):
+    search.index_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Artwork)
+def unindex_artwork(sender, instance, **kwargs):
+    search.remove_artwork(instance.pk)
+
+
+@receiver(m2m_changed, sender=Artwork.tags.through)
+def reindex_artwork_tags(sender, instance, action, **kwargs):
+    if isinstance(instance, Artwork) and action in ('post_add', 'post_remove', 'post_clear'):
+        search.index_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=GalleryCategory)
+def reindex_category_artworks(sender, instance, created, **kwargs):
+    if not created:
+        search.index_on_commit(instance.artworks.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_renamed_tag(sender, instance, created, **kwargs):
+    if not created:
+        search.index_on_commit(Artwork.objects.filter(tags=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def reindex_deleted_tag(sender, instance, **kwargs):
+    # The tagged items are gone by post_delete, so collect the artworks now.
+    search.index_on_commit(Artwork.objects.filter(tags=instance).values_list('pk', flat=True))
+
+
+# --- Previous values ---
+# Several handlers below compare a saved row with what it was; it is read once per save, here. The
+# image is only read when it has an analysis that replacing it would make stale.
+
+PREVIOUS_VALUE_FIELDS = {
+    Artwork: ['category_id', 'primary_image'],
+    AdditionalArtworkImage: ['image'],
+    HeroSlide: ['image'],
+}
+
+
+@receiver(pre_save, sender=Artwork)
+@receiver(pre_save, sender=AdditionalArtworkImage)
+@receiver(pre_save, sender=HeroSlide)
+def remember_previous_values(sender, instance, **kwargs):
+    instance._previous = {}
+    image_field = images.ANALYSED_IMAGE_FIELDS[sender]
+    needed = [
+        name for name in PREVIOUS_VALUE_FIELDS[sender]
+        if name != image_field or getattr(instance, f'{image_field}_width') is not None
+    ]
+    if instance.pk and needed:
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*needed).first() or {}
+
+
+def _previous(instance, name):
+    return getattr(instance, '_previous', {}).get(name)
+
+
+# --- Tag counts (core/facets.py) ---
+# Only the tags touched by a change are recounted, after commit.
+
+def _tag_ids(instance):
+    return list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Artwork.tags.through)
+def recount_changed_tags(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse:
+        # tag.artworks_tagged_directly.add(...) and friends: `instance` is the Tag.
+        if model in facets.TAGGED_MODELS and action in ('post_add', 'post_remove', 'post_clear'):
+            facets.recount_on_commit(model, [instance.pk])
+        return
+    if not isinstance(instance, facets.TAGGED_MODELS):
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = _tag_ids(instance)
+    elif action == 'post_clear':
+        facets.recount_on_commit(type(instance), instance.__dict__.pop('_cleared_tag_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        facets.recount_on_commit(type(instance), pk_set or [])
+
+
+@receiver(pre_delete, sender=Artwork)
+@receiver(pre_delete, sender=BlogPost)
+def recount_deleted_item_tags(sender, instance, **kwargs):
+    # The tagged items go with the object, so collect its tags now.
+    facets.recount_on_commit(sender, _tag_ids(instance))
+
+
+@receiver(post_save, sender=Artwork)
+def recount_moved_artwork_tags(sender, instance, created, **kwargs):
+    # Per-category counts change when an artwork moves to another category.
+    previous = _previous(instance, 'category_id')
+    if not created and previous is not None and previous != instance.category_id:
+        facets.recount_on_commit(Artwork, _tag_ids(instance))
+
+
+# --- Image analysis (core/images.py) ---
+
+@receiver(pre_save, sender=Artwork)
+@receiver(pre_save, sender=AdditionalArtworkImage)
+@receiver(pre_save, sender=HeroSlide)
+def forget_replaced_image_analysis(sender, instance, **kwargs):
+    field = images.ANALYSED_IMAGE_FIELDS[sender]
+    if field not in getattr(instance, '_previous', {}):
+        return  # A new row, or one with nothing analysed to forget
+    previous = instance._previous[field]
+    # A new upload is still a file here (not a CloudinaryResource), so it has no public_id yet.
+    if getattr(getattr(instance, field), 'public_id', None) != getattr(previous, 'public_id', None):
+        for name in images.analysis_fields(sender):
+            setattr(instance, name, None if name.endswith(('_width', '_height')) else '')
+
+
+@receiver(post_save, sender=Artwork)
+@receiver(post_save, sender=AdditionalArtworkImage)
+@receiver(post_save, sender=HeroSlide)
+def analyse_new_image(sender, instance, **kwargs):
+    # Uploads are CloudinaryResources by now; plain strings are public ids set in code (tests,
+    # sample data) with nothing behind them to fetch.
+    field = images.ANALYSED_IMAGE_FIELDS[sender]
+    if isinstance(getattr(instance, field), CloudinaryResource) and getattr(instance, f'{field}_width') is None:
+        background.submit_to_pool(images.analyse_rows, sender, [instance.pk])
+
+
+# --- Local image storage (core/local_images.py) ---
+
+@receiver(pre_save, sender=Artwork)
+@receiver(pre_save, sender=AdditionalArtworkImage)
+@receiver(pre_save, sender=HeroSlide)
+@receiver(pre_save, sender=GalleryCategory)
+@receiver(pre_save, sender=BlogPost)
+def store_uploads_locally(sender, instance, **kwargs):
+    # CloudinaryField.pre_save sends uploaded files to Cloudinary; with local storage they become
+    # local originals first, so the field only sees the resulting CloudinaryResource.
+    if settings.IMAGE_STORAGE != 'local':
+        return
+    for field in sender._meta.concrete_fields:
+        value = getattr(instance, field.attname)
+        if isinstance(field, CloudinaryField) and isinstance(value, UploadedFile):
+            setattr(instance, field.attname, local_images.store(value, field.options.get('folder', '')))
+
+
+# --- Related artworks (core/related.py) ---
+# Like tag counts, recomputed after commit for just the artworks a change can affect.
+
+@receiver(post_save, sender=Artwork)
+def refresh_related_artworks(sender, instance, created, **kwargs):
+    previous = _previous(instance, 'category_id')
+    if created or (previous is not None and previous != instance.category_id):
+        related.refresh_on_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=Artwork.tags.through)
+def refresh_related_artworks_on_tag_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse and isinstance(instance, Artwork):
+        related.refresh_on_commit([instance.pk])
+    elif reverse and model is Artwork:
+        related.refresh_on_commit(pk_set or [])
+
+
+@receiver(pre_delete, sender=Artwork)
+def refresh_related_artworks_on_delete(sender, instance, **kwargs):
+    # Only the lists it was on change; collect them before the cascade deletes those rows.
+    listing = list(RelatedArtwork.objects.filter(related=instance).values_list('artwork_id', flat=True))
+    if listing:
+        background.submit_to_pool(related.recompute, listing)
+
+
+@receiver(pre_delete, sender=Tag)
+def refresh_related_artworks_on_tag_delete(sender, instance, **kwargs):
+    related.refresh_on_commit(Artwork.objects.filter(tags=instance).values_list('pk', flat=True))
@@ -0,0 +1,256 @@
+# core/sitemaps.py
+# sitemap.xml and RSS/Atom feeds, so crawlers and feed readers find new artworks and posts from
+# one small, cheap response instead of crawling (and rendering) every page.
+#
+# /sitemap.xml is an index pointing at one sitemap per section (/sitemap-artworks.xml, ...).
+# Sections longer than the protocol's SITEMAP_MAX_URLS are split into pages (?p=2, ...).
+# Sitemaps are written out while the rows are read with .iterator(), so even a full 50,000-URL
+# page never holds more than SITEMAP_CHUNK_SIZE rows in memory. Artwork entries list their
+# primary and additional images (Google's image sitemap extension).
+#
+# Sitemaps and feeds answer conditional GETs (core/conditional.py): a crawler revalidating its
+# copy gets a 304 after one aggregate query, until an artwork, category or post changes.
+# /robots.txt points crawlers at the index.
+import math
+from xml.sax.saxutils import escape
+from django.contrib.syndication.views import Feed
+from django.db.models import Max, Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template.defaultfilters import linebreaks
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import format_html
+from django.views.decorators.http import require_safe
+from .conditional import conditional_page, sitemap_sources, source_freshness
+from .models import AdditionalArtworkImage, Artwork, BlogPost, GalleryCategory
+from .renditions import rendition_url
+
+SITEMAP_MAX_URLS = 50000  # Per sitemap file; the protocol's limit
+SITEMAP_CHUNK_SIZE = 2000  # Rows read per query while streaming
+SITEMAP_WRITE_SIZE = 64 * 1024  # Characters gathered before each write to the client
+STATIC_PAGES = ['core:home', 'core:gallery_home', 'core:blog_list', 'core:about', 'core:contact']
+FEED_ITEMS = 30
+SITE_NAME = 'Caroline J Hill'
+
+URLSET_START = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+
+
+# --- Sections ---
+# Each returns [(path, lastmod or None, [images]), ...] for the given slice of its rows.
+
+def _artwork_entries(start, stop):
+    artworks = (
+        Artwork.objects.only('slug', 'primary_image', 'date_uploaded')
+        .prefetch_related(Prefetch('additional_images', queryset=AdditionalArtworkImage.objects.only('artwork', 'image', 'order')))
+        .order_by('pk')[start:stop]
+    )
+    for artwork in artworks.iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        images = [artwork.primary_image, *(extra.image for extra in artwork.additional_images.all())]
+        yield artwork.get_absolute_url(), artwork.date_uploaded, images
+
+
+def _category_entries(start, stop):
+    # A category page changes when an artwork is added to it.
+    categories = (
+        GalleryCategory.objects.only('slug').annotate(latest_upload=Max('artworks__date_uploaded'))
+        .order_by('pk')[start:stop]
+    )
+    for category in categories.iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        yield category.get_absolute_url(), category.latest_upload, []
+
+
+def _blog_entries(start, stop):
+    posts = BlogPost.objects.only('slug', 'publish_date').order_by('pk')[start:stop]
+    for post in posts.iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        yield post.get_absolute_url(), post.publish_date, []
+
+
+def _page_entries(start, stop):
+    for name in STATIC_PAGES[start:stop]:
+        yield reverse(name), None, []
+
+
+# name: (entries, (queryset, lastmod field) for the index, or None for STATIC_PAGES)
+SECTIONS = {
+    'pages': (_page_entries, None),
+    'artworks': (_artwork_entries, (Artwork.objects.all(), 'date_uploaded')),
+    'categories': (_category_entries, (GalleryCategory.objects.all(), 'updated_at')),
+    'blog': (_blog_entries, (BlogPost.objects.all(), 'publish_date')),
+}
+
+
+def _lastmod(moment):
+    return f'<lastmod>{moment.isoformat(timespec="seconds")}</lastmod>' if moment else ''
+
+
+def _buffered(parts):
+    # Many small strings -> fewer, larger writes.
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= SITEMAP_WRITE_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _urlset(base, entries):
+    yield URLSET_START
+    for path, lastmod, images in entries:
+        yield f'<url><loc>{escape(base + path)}</loc>{_lastmod(lastmod)}'
+        for image in images:
+            url = rendition_url(image, 'full')
+            if url:
+                yield f'<image:image><image:loc>{escape(url)}</image:loc></image:image>'
+        yield '</url>\n'
+    yield '</urlset>\n'
+
+
+def _xml_response(parts):
+    return StreamingHttpResponse(_buffered(parts), content_type='application/xml; charset=utf-8')
+
+
+def _base_url(request):
+    return request.build_absolute_uri('/')[:-1]
+
+
+@require_safe
+@conditional_page(sitemap_sources)
+def sitemap_index_view(request):
+    # One query for every section's size and newest lastmod.
+    sections = [(name, source) for name, (_, source) in SECTIONS.items() if source is not None]
+    freshness = dict(zip([name for name, _ in sections], source_freshness([source for _, source in sections])))
+    base = _base_url(request)
+
+    def parts():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for name in SECTIONS:
+            latest, count = freshness.get(name, (None, len(STATIC_PAGES)))
+            location = base + reverse('core:sitemap_section', kwargs={'section': name})
+            for page in range(1, max(math.ceil(count / SITEMAP_MAX_URLS), 1) + 1):
+                url = location if page == 1 else f'{location}?p={page}'
+                yield f'<sitemap><loc>{escape(url)}</loc>{_lastmod(latest)}</sitemap>\n'
+        yield '</sitemapindex>\n'
+    return _xml_response(parts())
+
+
+@require_safe
+@conditional_page(sitemap_sources)
+def sitemap_section_view(request, section):
+    if section not in SECTIONS:
+        raise Http404("No such sitemap.")
+    page = request.GET.get('p', '1')
+    if not page.isdigit() or int(page) < 1:
+        raise Http404("Invalid page.")
+    start = (int(page) - 1) * SITEMAP_MAX_URLS
+    entries, source = SECTIONS[section]
+    if start and (source is None or not source[0].order_by('pk')[start:].exists()):
+        raise Http404("Invalid page.")
+    return _xml_response(_urlset(_base_url(request), entries(start, start + SITEMAP_MAX_URLS)))
+
+
+@require_safe
+def robots_txt_view(request):
+    lines = [
+        'User-agent: *',
+        f"Disallow: {reverse('admin:index')}",
+        f"Sitemap: {request.build_absolute_uri(reverse('core:sitemap_index'))}",
+    ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; charset=utf-8')
+
+
+# --- Feeds ---
+# The newest FEED_ITEMS items, read with .iterator() (tags are still prefetched per chunk).
+
+class SiteFeed(Feed):
+    def __call__(self, request, *args, **kwargs):
+        # Feed sends Last-Modified from the newest item's date. Like the pages, feeds only send an
+        # ETag (see core/conditional.py): a deleted item doesn't move that date.
+        response = super().__call__(request, *args, **kwargs)
+        del response['Last-Modified']
+        return response
+
+
+class BlogFeed(SiteFeed):
+    title = f'{SITE_NAME} - Blog'
+    description = 'New posts from the blog.'
+
+    def link(self):
+        return reverse('core:blog_list')
+
+    def items(self):
+        # Only what the feed shows; post bodies can be hundreds of KB.
+        return (
+            BlogPost.objects.select_related('author').defer('content', 'content_html', 'table_of_contents')
+            .prefetch_related('tags').order_by('-publish_date', '-id')[:FEED_ITEMS]
+            .iterator(chunk_size=FEED_ITEMS)
+        )
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.summary
+
+    def item_pubdate(self, item):
+        return item.publish_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [tag.name for tag in item.tags.all()]
+
+
+class AtomBlogFeed(BlogFeed):
+    feed_type = Atom1Feed
+    subtitle = BlogFeed.description
+
+
+class ArtworkFeed(SiteFeed):
+    title = f'{SITE_NAME} - New artworks'
+    description = 'New pieces added to the gallery.'
+
+    def link(self):
+        return reverse('core:gallery_home')
+
+    def items(self):
+        return (
+            Artwork.objects.select_related('category').prefetch_related('tags')
+            .order_by('-date_uploaded', '-id')[:FEED_ITEMS].iterator(chunk_size=FEED_ITEMS)
+        )
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return format_html('<p><img src="{}" alt="{}"></p>{}', rendition_url(item.primary_image, 'card') or '', item.title, linebreaks(item.description))
+
+    def item_pubdate(self, item):
+        return item.date_uploaded
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return [item.category.name, *(tag.name for tag in item.tags.all())]
+
+
+class AtomArtworkFeed(ArtworkFeed):
+    feed_type = Atom1Feed
+    subtitle = ArtworkFeed.description
+
+
+blog_feed_view = conditional_page(sitemap_sources)(BlogFeed())
+blog_atom_feed_view = conditional_page(sitemap_sources)(AtomBlogFeed())
+artwork_feed_view = conditional_page(sitemap_sources)(ArtworkFeed())
+artwork_atom_feed_view = conditional_page(sitemap_sources)(AtomArtworkFeed())
@@ -0,0 +1,97 @@
+# core/slugs.py
+# Unique slug allocation shared by Artwork, BlogPost and GalleryCategory.
+#
+# A slug is "<base>" or "<base>-<n>". All slugs already using a base are fetched with one
+# prefix query (LIKE 'base%', which the slug's unique index can serve) and the next free suffix
+# is picked in Python, instead of one exists() query per collision. Two saves racing for the
+# same slug are handled by retrying on IntegrityError.
+from django.db import IntegrityError, models, transaction
+from django.utils.text import slugify
+
+SAVE_ATTEMPTS = 5
+BULK_QUERY_BASES = 200  # Bases OR-ed together per prefix query in bulk mode
+
+
+def _base_slug(model, source_text, field_name):
+    max_length = model._meta.get_field(field_name).max_length
+    base = slugify(source_text) or model._meta.model_name
+    # Leave room for a "-<n>" suffix so allocated slugs always fit the column.
+    return base[:max_length - 6].strip('-') or model._meta.model_name
+
+
+def _taken_slugs(model, bases, field_name, exclude_pk=None):
+    taken = set()
+    bases = list(bases)
+    for start in range(0, len(bases), BULK_QUERY_BASES):
+        prefix_filter = models.Q()
+        for base in bases[start:start + BULK_QUERY_BASES]:
+            prefix_filter |= models.Q(**{f'{field_name}__startswith': base})
+        queryset = model._default_manager.filter(prefix_filter).order_by()
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        taken.update(queryset.values_list(field_name, flat=True))
+    return taken
+
+
+class _Allocator:
+    # Hands out "<base>", "<base>-1", "<base>-2", ... skipping anything in `taken`. The next suffix
+    # to try is remembered per base, so n objects sharing a title cost O(n), not O(n^2).
+    def __init__(self, taken):
+        self.taken = taken
+        self.next_suffix = {}
+
+    def allocate(self, base):
+        suffix = self.next_suffix.get(base, 0)
+        slug = base if suffix == 0 else f'{base}-{suffix}'
+        while slug in self.taken:
+            suffix += 1
+            slug = f'{base}-{suffix}'
+        self.next_suffix[base] = suffix + 1
+        self.taken.add(slug)
+        return slug
+
+
+def unique_slug(instance, source_text, field_name='slug'):
+    model = type(instance)
+    base = _base_slug(model, source_text, field_name)
+    return _Allocator(_taken_slugs(model, [base], field_name, exclude_pk=instance.pk)).allocate(base)
+
+
+def save_with_unique_slug(instance, source_text, save, *args, field_name='slug', **kwargs):
+    # `save` is the model's parent save method, e.g. save_with_unique_slug(self, self.title, super().save, ...)
+    for attempt in range(1, SAVE_ATTEMPTS + 1):
+        setattr(instance, field_name, unique_slug(instance, source_text, field_name))
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            # Only retry if another save took our slug in the meantime; anything else is a real error.
+            slug_taken = (
+                type(instance)._default_manager
+                .filter(**{field_name: getattr(instance, field_name)})
+                .exclude(pk=instance.pk)
+                .exists()
+            )
+            if not slug_taken or attempt == SAVE_ATTEMPTS:
+                raise
+
+
+def assign_unique_slugs(instances, source_attr, field_name='slug'):
+    # Bulk mode for unsaved objects about to go through bulk_create(): a handful of prefix
+    # queries for the whole list, then every slug is allocated in memory. Objects that already
+    # have a slug keep it (and it is reserved so nothing else gets it).
+    instances = list(instances)
+    if not instances:
+        return instances
+    model = type(instances[0])
+    bases = {}
+    for instance in instances:
+        if not getattr(instance, field_name):
+            bases[id(instance)] = _base_slug(model, getattr(instance, source_attr), field_name)
+    taken = _taken_slugs(model, set(bases.values()), field_name) if bases else set()
+    taken.update(getattr(instance, field_name) for instance in instances if getattr(instance, field_name))
+    allocator = _Allocator(taken)
+    for instance in instances:
+        if id(instance) in bases:
+            setattr(instance, field_name, allocator.allocate(bases[id(instance)]))
+    return instances
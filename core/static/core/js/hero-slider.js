@@ -0,0 +1,85 @@
+// Hero Slider JavaScript
+// Ensure this script correctly finds your dynamically generated .hero-slide elements
+// and that the data-title and data-link attributes are correctly used.
+if (document.querySelector('.hero-section')) { 
+    const slides = document.querySelectorAll('.hero-section .hero-slide'); // This selector should still work
+    const dotsContainer = document.querySelector('.hero-slider-dots');
+    const heroSlideTitleElement = document.getElementById('heroSlideTitle');
+    const heroSlideLinkElement = document.getElementById('heroSlideLink');
+
+    let currentSlide = 0;
+    const slideInterval = 4000; 
+
+    function updateSlideText(slideIndex) {
+        if (!slides[slideIndex] || !heroSlideTitleElement || !heroSlideLinkElement) return; 
+        const activeSlide = slides[slideIndex];
+        const title = activeSlide.dataset.title || "Artwork Title"; 
+        const link = activeSlide.dataset.link || "#"; 
+        heroSlideTitleElement.textContent = title;
+        heroSlideLinkElement.href = link;
+    }
+    function createDots() {
+        if (!dotsContainer || slides.length <= 1) return;
+        dotsContainer.innerHTML = ''; 
+        slides.forEach((slide, index) => {
+            const dot = document.createElement('span');
+            dot.classList.add('dot');
+            if (index === 0) dot.classList.add('active');
+            dot.addEventListener('click', () => {
+                goToSlide(index);
+                resetInterval();
+            });
+            dotsContainer.appendChild(dot);
+        });
+    }
+    function updateDots() {
+        if (!dotsContainer) return;
+        const dots = dotsContainer.querySelectorAll('.dot');
+        dots.forEach((dot, index) => {
+            if(dot) dot.classList.toggle('active', index === currentSlide);
+        });
+    }
+    function goToSlide(slideIndex) {
+        // Ensure currentSlide is valid before trying to remove 'active'
+        if (slides[currentSlide] && slides.length > 0) {
+             slides[currentSlide].classList.remove('active');
+        }
+        currentSlide = (slideIndex + slides.length) % slides.length; 
+        if (slides[currentSlide]) { // Check again for currentSlide after update
+            slides[currentSlide].classList.add('active');
+            updateSlideText(currentSlide); 
+            updateDots();
+        }
+    }
+    function nextSlide() {
+        goToSlide(currentSlide + 1);
+    }
+    let heroSliderInterval;
+    function startInterval() {
+        if (slides.length > 1) {
+            heroSliderInterval = setInterval(nextSlide, slideInterval);
+        }
+    }
+    function resetInterval() {
+        if (slides.length > 1) {
+            clearInterval(heroSliderInterval);
+            startInterval();
+        }
+    }
+
+    if (slides.length > 0) { 
+        goToSlide(0); // Initialize first slide correctly
+        if (slides.length > 1) {
+            // createDots(); // Call createDots after goToSlide(0) has set currentSlide
+            // startInterval(); // Call startInterval after createDots
+        }
+    }
+     // Slight re-order for init if slides.length > 0
+    if (document.querySelector('.hero-section') && slides.length > 0) {
+        goToSlide(0); // Set initial slide and text
+        if (slides.length > 1) {
+            createDots(); // Then create dots
+            startInterval(); // Then start interval
+        }
+    }
+}
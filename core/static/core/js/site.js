@@ -0,0 +1,14 @@
+// Copyright Year Update (Site-wide)
+document.getElementById('currentYear').textContent = new Date().getFullYear();
+
+// Mobile Navigation Toggle JavaScript (Site-wide)
+const navToggle = document.querySelector('.mobile-nav-toggle');
+const mainNav = document.querySelector('.main-navigation');
+
+if (navToggle && mainNav) {
+    navToggle.addEventListener('click', () => {
+        mainNav.classList.toggle('nav-open');
+        const isExpanded = mainNav.classList.contains('nav-open');
+        navToggle.setAttribute('aria-expanded', isExpanded);
+    });
+}
@@ -0,0 +1,146 @@
+# core/staticfiles.py
+# Static files for production, without a CDN or a separate web server:
+#
+# - CompressedManifestStaticFilesStorage: `collectstatic` writes content-hashed copies
+#   (main.3f2a9c1b.css) listed in staticfiles.json, so {% static %} URLs change whenever the file
+#   does, plus .gz and .br siblings of every text file, compressed once at build time.
+# - StaticFilesMiddleware: serves STATIC_ROOT, picking the .br/.gz sibling the browser accepts.
+#   Hashed files are sent as immutable for a year; anything else revalidates after a minute.
+import gzip
+import mimetypes
+import os
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.xml', '.html', '.map')
+MIN_COMPRESS_SIZE = 256  # Bytes; smaller files aren't worth a second request header
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHORT_CACHE_CONTROL = 'public, max-age=60'
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+def accepted_encodings(header):
+    # Accept-Encoding -> {coding: q}, e.g. 'gzip;q=0, br' -> {'gzip': 0.0, 'br': 1.0}.
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [piece.strip() for piece in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities
+
+
+def accepts_encoding(qualities, coding):
+    # q=0 means "not this one"; '*' covers codings the header doesn't name.
+    return qualities.get(coding, qualities.get('*', 0)) > 0
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Unhashed originals are compressed too, for anything that links to them directly.
+        for name in list(self.hashed_files) + list(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as original:
+            data = original.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as output:
+                    output.write(compressed)
+
+    def url(self, name, force=False):
+        # Before the first collectstatic (development, tests) there's no manifest to look names up
+        # in, so hand out plain URLs rather than failing every page render.
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.root = settings.STATIC_ROOT
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        self.hashed_names = set(hashed_files.values())
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_static(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        # Only a stat() and an open(); the file itself is streamed by the server.
+        response = self.serve_static(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve_static(self, request):
+        if self.root and request.path.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            return self.serve(request, request.path[len(self.prefix):])
+        return None
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None  # Falls through to the normal 404
+
+        stat = os.stat(path)
+        immutable = name in self.hashed_names
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        served_path, encoding, has_variants = path, None, False
+        for suffix, name_of_encoding in (('.br', 'br'), ('.gz', 'gzip')):
+            if os.path.isfile(path + suffix):
+                has_variants = True
+                if encoding is None and accepts_encoding(accepted, name_of_encoding):
+                    served_path, encoding = path + suffix, name_of_encoding
+
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(
+            open(served_path, 'rb'), content_type=content_type or 'application/octet-stream', filename=os.path.basename(path),
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if has_variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else SHORT_CACHE_CONTROL
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        return response
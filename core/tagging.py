@@ -0,0 +1,49 @@
+# core/tagging.py
+# Bulk helpers for django-taggit. TaggableManager.add() costs a few queries per object, which is
+# fine in the admin but not when importing hundreds of artworks at once.
+#
+# Note: these write TaggedItem rows directly, so no m2m_changed signal is sent. Tag counts
+# (core/facets.py) are recounted here; callers are responsible for refreshing anything else the
+# signal handlers in core/signals.py would normally update.
+from django.contrib.contenttypes.models import ContentType
+from taggit.models import Tag, TaggedItem
+from . import facets
+
+TAG_NAME_MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def clean_tag_names(names):
+    cleaned = []
+    for name in names:
+        name = name.strip()[:TAG_NAME_MAX_LENGTH]
+        if name and name not in cleaned:
+            cleaned.append(name)
+    return cleaned
+
+
+def get_or_create_tags(names):
+    # One query for the tags that exist already; new ones go through Tag.save() for its slug handling.
+    names = clean_tag_names(names)
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    for name in names:
+        if name not in tags:
+            tags[name], _ = Tag.objects.get_or_create(name=name)
+    return tags
+
+
+def bulk_add_tags(tag_names_by_object):
+    # tag_names_by_object maps saved model instances (all of one model) to lists of tag names.
+    if not tag_names_by_object:
+        return 0
+    tag_names_by_object = {obj: clean_tag_names(names) for obj, names in tag_names_by_object.items()}
+    tags = get_or_create_tags(name for names in tag_names_by_object.values() for name in names)
+    content_type = ContentType.objects.get_for_model(next(iter(tag_names_by_object)))
+    tagged_items = [
+        TaggedItem(content_type=content_type, object_id=obj.pk, tag=tags[name])
+        for obj, names in tag_names_by_object.items()
+        for name in names
+    ]
+    # TaggedItem is unique on (content_type, object_id, tag), so re-running an import is harmless.
+    TaggedItem.objects.bulk_create(tagged_items, ignore_conflicts=True)
+    facets.recount_on_commit(type(next(iter(tag_names_by_object))), [item.tag_id for item in tagged_items])
+    return len(tagged_items)
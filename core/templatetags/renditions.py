@@ -0,0 +1,20 @@
+# core/templatetags/renditions.py
+# {% load renditions %}
+#   <img {% srcset art_piece.primary_image 'card' %} alt="...">  -> src, srcset and sizes attributes
+#   style="background-image: url('{% rendition_url slide.image 'hero' %}')"
+# Rendition names and widths are in core/renditions.py.
+from django import template
+from django.utils.html import format_html_join
+from core.renditions import rendition_url as _rendition_url, srcset_attributes
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, name):
+    return format_html_join(' ', '{}="{}"', srcset_attributes(image, name).items())
+
+
+@register.simple_tag
+def rendition_url(image, name):
+    return _rendition_url(image, name) or ''
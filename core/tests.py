@@ -1,3 +1,1339 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from PIL import Image
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.mail import get_connection
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import Http404
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from taggit.models import Tag
+
+from . import async_views, caching, facets, images, local_images, related, search, views
+from .context_processors import global_context
+from .instagram import ArtworkPromotion, InstagramClient, InstagramSync, sync_instagram
+from .metrics import RequestMetricsMiddleware
+from .models import (
+    AdditionalArtworkImage, Artwork, BlogPost, FeaturedHomepageArtwork, GalleryCategory, HeroSlide, InstagramImportedItem, InstagramImportJob, InstagramSyncState, NewsletterDelivery, NewsletterDispatch, SocialLink, Subscriber,
+)
+from .newsletter import DISPATCH_STALE_AFTER, NewsletterSender, run_dispatch
+from .renditions import RENDITIONS, rendition_urls
+from .richtext import RENDITION_VERSION, build_rendition
+from .sitemaps import STATIC_PAGES
+from .slugs import assign_unique_slugs
+from .tagging import bulk_add_tags
+
+
+class HomepageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        HeroSlide.objects.create(title='Bridge', image='bridge-image')
+
+    def cached(self, audience='anonymous'):
+        return cache.get(caching.HOMEPAGE_CACHE_KEY.format(audience=audience))
+
+    def test_one_copy_per_audience(self):
+        self.assertContains(self.client.get(reverse('core:home')), 'Bridge')
+        self.assertIn('Bridge', self.cached())
+        self.assertIsNone(self.cached('authenticated'))
+        with self.assertNumQueries(0):  # The ETag signature is cached too (core/conditional.py)
+            self.assertContains(self.client.get(reverse('core:home')), 'Bridge')
+        self.client.force_login(User.objects.create_user('caroline'))
+        self.client.get(reverse('core:home'))
+        self.assertIsNotNone(self.cached('authenticated'))
+
+    def test_each_visitor_gets_their_own_csrf_token(self):
+        first = self.client.get(reverse('core:home')).content.decode()
+        second = self.client_class().get(reverse('core:home')).content.decode()
+        self.assertIn(caching.CSRF_TOKEN_PLACEHOLDER, self.cached())
+        for html in (first, second):
+            self.assertNotIn(caching.CSRF_TOKEN_PLACEHOLDER, html)
+            self.assertIn('name="csrfmiddlewaretoken"', html)
+        token = 'name="csrfmiddlewaretoken" value="'
+        self.assertNotEqual(first.split(token)[1][:64], second.split(token)[1][:64])
+
+    def test_pages_with_messages_are_not_stored(self):
+        with mock.patch('core.caching.get_messages', return_value=['Thanks for subscribing!']):
+            self.assertContains(self.client.get(reverse('core:home')), 'Bridge')
+        self.assertIsNone(self.cached())
+
+    def test_content_changes_invalidate_after_commit(self):
+        self.client.get(reverse('core:home'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            HeroSlide.objects.create(title='River', image='river-image')
+            self.assertIsNotNone(self.cached())  # Not before the change is committed
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(self.cached())
+        self.assertContains(self.client.get(reverse('core:home')), 'River')
+
+
+class GlobalContextTests(TestCase):
+    footer = Template('{% for link in social_links %}{{ link.get_platform_name_display }}|{% endfor %}')
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialLink.objects.create(platform_name='instagram', url='https://instagram.com/example', order=1)
+            SocialLink.objects.create(platform_name='facebook', url='https://facebook.com/example', order=0)
+            SocialLink.objects.create(platform_name='twitter', url='https://x.com/example', is_active=False)
+
+    def render_footer(self):
+        return self.footer.render(Context(global_context(self.request)))
+
+    def test_cached_footer_render_issues_no_queries(self):
+        self.assertEqual(self.render_footer(), 'Facebook|Instagram|')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render_footer(), 'Facebook|Instagram|')
+
+    def test_saving_a_link_reloads_on_next_request(self):
+        self.render_footer()
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialLink.objects.create(platform_name='pinterest', url='https://pinterest.com/example', order=2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render_footer(), 'Facebook|Instagram|Pinterest|')
+
+    def test_deleting_a_link_reloads_on_next_request(self):
+        self.render_footer()
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialLink.objects.get(platform_name='facebook').delete()
+        self.assertEqual(self.render_footer(), 'Instagram|')
+
+    def test_cached_footer_fragment_follows_link_changes(self):
+        self.assertContains(self.client.get(reverse('core:gallery_home')), 'Instagram')
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialLink.objects.create(platform_name='pinterest', url='https://pinterest.com/example', order=2)
+        self.assertContains(self.client.get(reverse('core:gallery_home')), 'Pinterest')
+
+    @override_settings(CONTACT_EMAIL='hello@example.com')
+    def test_about_and_contact_pages(self):
+        self.assertContains(self.client.get(reverse('core:about')), 'About The Artist')
+        response = self.client.get(reverse('core:contact'))
+        self.assertContains(response, 'mailto:hello@example.com')
+        self.assertContains(response, 'https://instagram.com/example')
+
+
+class GalleryIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ink = GalleryCategory.objects.create(name='Ink', representative_image='ink-cover')
+            self.paint = GalleryCategory.objects.create(name='Paint')
+            GalleryCategory.objects.create(name='Sketches')
+            for title in ['Bridge', 'River']:
+                Artwork.objects.create(title=title, category=self.paint, primary_image=f'{title.lower()}-image')
+            Artwork.objects.create(title='Castle', category=self.ink, primary_image='castle-image')
+
+    def index(self):
+        return caching.get_or_build_gallery_data('index', views._gallery_index)
+
+    def test_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            index = self.index()
+        self.assertEqual([(c['name'], c['artwork_count']) for c in index], [('Ink', 1), ('Paint', 2), ('Sketches', 0)])
+        self.assertIn('ink-cover', index[0]['cover_image'])
+        self.assertIn('river-image', index[1]['cover_image'])  # Newest artwork stands in for a missing cover
+        self.assertIsNone(index[2]['cover_image'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.index(), index)
+
+    def test_artwork_changes_rebuild_the_index(self):
+        self.index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Artwork.objects.filter(category=self.paint).first().delete()
+        self.assertEqual(self.index()[1]['artwork_count'], 1)
+
+    def test_page_links_each_category(self):
+        response = self.client.get(reverse('core:gallery_home'))
+        for category in GalleryCategory.objects.all():
+            self.assertContains(response, f'href="{category.get_absolute_url()}"')
+
+
+class ArtworksApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        paint = GalleryCategory.objects.create(name='Paint')
+        for number in range(5):
+            Artwork.objects.create(title=f'Bridge {number}', category=paint, primary_image=f'bridge-{number}')
+        # Uploaded in the same instant, so only the id tie-break keeps pages apart
+        Artwork.objects.update(date_uploaded=Artwork.objects.first().date_uploaded)
+
+    def get(self, **params):
+        return self.client.get(reverse('core:all_artworks_api'), params)
+
+    def test_pages_with_tied_timestamps_cover_every_artwork_once(self):
+        slugs, cursor = [], None
+        while True:
+            with self.assertNumQueries(3):
+                data = self.get(limit=2, **({'cursor': cursor} if cursor else {})).json()
+            slugs += [artwork['slug'] for artwork in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(slugs, list(Artwork.objects.order_by('-id').values_list('slug', flat=True)))
+        self.assertEqual(data['results'][-1]['url'], Artwork.objects.order_by('id').first().get_absolute_url())
+
+    def test_cursor_and_limit_validation(self):
+        self.assertEqual(self.get(cursor='not-a-cursor').status_code, 400)
+        self.assertEqual(self.get(limit='x').json(), {'error': 'limit must be a whole number.'})
+        self.assertEqual(len(self.get(limit=0).json()['results']), 1)
+        with mock.patch('core.views.ARTWORKS_API_MAX_LIMIT', 3):
+            self.assertEqual(len(self.get(limit=1000).json()['results']), 3)
+
+    def test_etag_revalidation(self):
+        first = self.get(limit=2)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('core:all_artworks_api'), {'limit': 2}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.get(limit=3)['ETag'], first['ETag'])  # Each URL has its own
+        with self.captureOnCommitCallbacks(execute=True):
+            Artwork.objects.first().tags.add('new')
+        response = self.client.get(reverse('core:all_artworks_api'), {'limit': 2}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.category = GalleryCategory.objects.create(name='Landscapes')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sketch = Artwork.objects.create(title='Cat portrait', category=self.category, primary_image='cat', description='Ink sketch near the river')
+            self.river = Artwork.objects.create(title='River at dusk', category=self.category, primary_image='river', description='Watercolour')
+            self.sketch.tags.add('Guildford')
+
+    def titles(self, query):
+        return [artwork.title for artwork in search.search_artworks(query)]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.titles('river'), ['River at dusk', 'Cat portrait'])
+        self.assertEqual(self.titles('guild'), ['Cat portrait'])  # Last term matches as a prefix
+        self.assertEqual(self.titles('river ink'), ['Cat portrait'])
+        self.assertEqual(self.titles('"OR ('), [])
+
+    def test_changes_update_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Seascapes'
+            self.category.save()
+        self.assertEqual(self.titles('landscapes'), [])
+        self.assertEqual(len(self.titles('seascapes')), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.get(name='Guildford').delete()
+        self.assertEqual(self.titles('guildford'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.river.delete()
+        self.assertEqual(self.titles('river'), ['Cat portrait'])
+
+    def test_a_save_and_its_tags_are_indexed_once(self):
+        # What an admin save does: the row, then its tags, in one transaction.
+        with mock.patch('core.search.index_artwork_ids', wraps=search.index_artwork_ids) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.river.title = 'River Wey at dusk'
+                self.river.save()
+                self.river.tags.add('Wey', 'Autumn')
+        self.assertEqual(index.call_count, 1)
+        self.assertEqual(self.titles('wey autumn'), ['River Wey at dusk'])
+
+    def test_rebuild_index_picks_up_bulk_updates(self):
+        Artwork.objects.filter(pk=self.river.pk).update(title='Harbour at dusk')  # Skips the signals
+        self.assertEqual(self.titles('harbour'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.titles('harbour'), ['Harbour at dusk'])
+
+    def test_icontains_fallback_on_other_databases(self):
+        with mock.patch('core.search.is_supported', return_value=False):
+            self.assertEqual(sorted(self.titles('river')), ['Cat portrait', 'River at dusk'])
+            self.assertEqual(self.titles('guildford landscapes'), ['Cat portrait'])
+            self.assertEqual(search.rebuild_index(), 0)
+
+
+class AsyncViewTests(TestCase):
+    # The async views (used under ASGI) must return what their sync counterparts do.
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            paint = GalleryCategory.objects.create(name='Paint')
+            for title in ['Bridge', 'River', 'Castle']:
+                Artwork.objects.create(title=title, category=paint, primary_image=f'{title.lower()}-image')
+
+    def get(self, factory, path):
+        request = factory.get(path)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_gallery_index_is_cached(self):
+        # Through the metrics middleware, which counts the queries run on sync_to_async threads.
+        view = RequestMetricsMiddleware(async_views.gallery_home_view)
+        response = await view(self.get(AsyncRequestFactory(), '/gallery/'))
+        self.assertContains(response, 'Paint')
+        self.assertEqual(response.request_metrics.queries, 3)  # Freshness (core/conditional.py), index, social links
+        cached = await view(self.get(AsyncRequestFactory(), '/gallery/'))
+        self.assertEqual(cached.request_metrics.queries, 0)  # Freshness, index and social links all cached now
+
+    async def test_all_artworks_matches_sync_view(self):
+        path = '/gallery/api/all-artworks/?limit=2'
+        response = await async_views.all_artworks_view(self.get(AsyncRequestFactory(), path))
+        expected = await sync_to_async(views.all_artworks_view)(self.get(RequestFactory(), path))
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertEqual(response['ETag'], expected['ETag'])
+        bad = await async_views.all_artworks_view(self.get(AsyncRequestFactory(), '/gallery/api/all-artworks/?limit=x'))
+        self.assertEqual(bad.status_code, 400)
+
+    async def test_category_and_blog_pages_match_sync_views(self):
+        await sync_to_async(BlogPost.objects.create)(title='Washes', content='<p>Hello</p>', author=await User.objects.acreate(username='caroline'))
+        for name, url_name, kwargs, text in [
+            ('gallery_category_view', 'core:gallery_category_view', {'category_slug': 'paint'}, 'Castle'),
+            ('blog_list_view', 'core:blog_list', {}, 'Washes'),
+            ('blog_detail_view', 'core:blog_detail', {'slug': 'washes'}, '<p>Hello</p>'),
+        ]:
+            with self.subTest(name):
+                path = reverse(url_name, kwargs=kwargs)
+                response = await getattr(async_views, name)(self.get(AsyncRequestFactory(), path), **kwargs)
+                expected = await sync_to_async(getattr(views, name))(self.get(RequestFactory(), path), **kwargs)
+                self.assertContains(response, text)
+                self.assertEqual(response['ETag'], expected['ETag'])
+        with self.assertRaises(Http404):
+            await async_views.blog_detail_view(self.get(AsyncRequestFactory(), '/blog/missing/'), slug='missing')
+
+
+class StubInstagramHandler(BaseHTTPRequestHandler):
+    # Serves a fake Graph API feed of `self.server.posts` (newest first), `page_size` posts per page.
+    page_size = 2
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        posts = self.server.posts
+        self.server.requested_paths.append(url.path)
+        if url.path == '/me/media':
+            start = int(params.get('after', ['0'])[0])
+            page = posts[start:start + self.page_size]
+            payload = {'data': page, 'paging': {'cursors': {'after': str(start + len(page))}}}
+            if start + len(page) < len(posts):
+                payload['paging']['next'] = 'http://stub/next'
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_post(number, media_type='IMAGE'):
+    post = {'id': f'post{number}', 'caption': f'Sketch {number} #ink', 'media_type': media_type}
+    post['thumbnail_url' if media_type == 'VIDEO' else 'media_url'] = f'https://cdn.example.com/{number}.jpg'
+    return post
+
+
+class InstagramSyncTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubInstagramHandler)
+        self.server.posts = [make_post(n) for n in range(5, 0, -1)]
+        self.server.requested_paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def sync(self, **kwargs):
+        client = InstagramClient(access_token='token', base_url=f'http://127.0.0.1:{self.server.server_port}')
+        self.addCleanup(client.close)
+        return sync_instagram(client=client, **kwargs)
+
+    def test_imports_whole_feed(self):
+        self.server.posts.append(make_post(0, media_type='VIDEO'))
+        self.assertEqual(self.sync(), 6)
+        self.assertEqual(InstagramImportedItem.objects.count(), 6)
+        video = InstagramImportedItem.objects.get(instagram_post_id='post0')
+        self.assertEqual(video.image_url_from_instagram, 'https://cdn.example.com/0.jpg')
+        self.assertTrue(InstagramSyncState.load().backfill_complete)
+        # Three backfill pages and the first page again for new posts; no per-post detail requests
+        self.assertEqual(self.server.requested_paths, ['/me/media'] * 4)
+
+    def test_resumes_back_catalogue_from_stored_cursor(self):
+        self.assertEqual(self.sync(max_pages=1), 2)
+        self.assertEqual(InstagramSyncState.load().backfill_cursor, '2')
+        self.assertEqual(self.sync(), 3)
+        self.assertEqual(InstagramImportedItem.objects.count(), 5)
+
+    def test_posts_imported_by_a_concurrent_run_are_not_counted(self):
+        self.sync(max_pages=1)  # post5 and post4
+        sync = InstagramSync(client=None)
+        items = [InstagramImportedItem(instagram_post_id=post_id, image_url_from_instagram='https://cdn.example.com/x.jpg')
+                 for post_id in ('post5', 'post3')]
+        self.assertEqual(sync._save_new(items), 1)
+        self.assertEqual(InstagramImportedItem.objects.count(), 3)
+
+    def test_incremental_run_only_fetches_new_posts(self):
+        self.sync()
+        self.server.posts.insert(0, make_post(6))
+        self.server.requested_paths.clear()
+        self.assertEqual(self.sync(), 1)
+        # One media-list page holds the new post's details too.
+        self.assertEqual(self.server.requested_paths, ['/me/media'])
+
+
+class ArtworkPromotionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = GalleryCategory.objects.create(name='Sketches')
+        for number in range(5):
+            InstagramImportedItem.objects.create(
+                instagram_post_id=f'post{number}', image_url_from_instagram=f'https://cdn.example.com/{number}.jpg',
+                caption_from_instagram=f'Guildford High Street\nMore words #ink #study{number % 2}',
+            )
+        InstagramImportedItem.objects.create(instagram_post_id='broken', image_url_from_instagram='https://cdn.example.com/broken.jpg')
+        self.job = InstagramImportJob.objects.create(
+            item_ids=list(InstagramImportedItem.objects.order_by('pk').values_list('pk', flat=True)), category=self.category, total=6,
+        )
+
+    def download_and_upload(self, item):
+        if item.instagram_post_id == 'broken':
+            raise ValueError('404 from the CDN')
+        return f'image/upload/v1/instagram-{item.instagram_post_id}.jpg', None
+
+    def run_job(self):
+        with mock.patch.object(ArtworkPromotion, '_download_and_upload', self.download_and_upload), \
+                mock.patch('core.instagram.bulk_add_tags', wraps=bulk_add_tags) as tagging, \
+                self.captureOnCommitCallbacks(execute=True):
+            ArtworkPromotion(self.job, workers=2, batch_size=2).run()
+        return tagging.call_count
+
+    def test_batches_tags_and_indexes_new_artworks(self):
+        version = caching.get_version(caching.GALLERY_VERSION_KEY)
+        self.assertEqual(self.run_job(), 3)  # One bulk tagging per batch of two
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.processed, self.job.failed), ('finished', 5, 1))
+        self.assertIn('broken: 404 from the CDN', self.job.errors)
+        artworks = Artwork.objects.filter(category=self.category).order_by('pk')
+        self.assertEqual([artwork.slug for artwork in artworks][:2], ['guildford-high-street', 'guildford-high-street-1'])
+        self.assertEqual(sorted(InstagramImportedItem.objects.get(instagram_post_id='post1').created_artwork.tags.names()), ['ink', 'study1'])
+        self.assertEqual(len(search.search_artworks('study0')), 3)
+        self.assertNotEqual(caching.get_version(caching.GALLERY_VERSION_KEY), version)
+
+    def test_rerun_skips_items_already_processed(self):
+        self.run_job()
+        self.assertEqual(self.run_job(), 0)  # Only the broken item is tried again, and fails again
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.processed, self.job.failed), (5, 1))
+        self.assertEqual(Artwork.objects.count(), 5)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NEWSLETTER_MAX_PER_SECOND=0,
+    SITE_URL='https://example.com',
+)
+class NewsletterTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('caroline')
+        self.post = BlogPost.objects.create(title='A Rose', content='<p>Body</p>', summary='It began with a rose.', author=author)
+        self.subscribers = [Subscriber.objects.create(email=f'reader{n}@example.com', is_active=True) for n in range(5)]
+        Subscriber.objects.create(email='pending@example.com', is_active=False)
+        self.dispatch = NewsletterDispatch.objects.create(blog_post=self.post)
+
+    def test_sends_to_active_subscribers_with_their_own_unsubscribe_link(self):
+        run_dispatch(self.dispatch, batch_size=2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [s.email for s in self.subscribers])
+        for message in mail.outbox:
+            subscriber = Subscriber.objects.get(email=message.to[0])
+            link = f'https://example.com/unsubscribe/{subscriber.unsubscribe_token}/'
+            self.assertIn(link, message.body)
+            self.assertIn(link, message.alternatives[0][0])
+            self.assertEqual(message.extra_headers['List-Unsubscribe'], f'<{link}>')
+            self.assertEqual(message.extra_headers['List-Unsubscribe-Post'], 'List-Unsubscribe=One-Click')
+        self.dispatch.refresh_from_db()
+        self.assertEqual((self.dispatch.status, self.dispatch.sent_count, self.dispatch.total), ('finished', 5, 5))
+
+    def test_reuses_one_connection_per_batch(self):
+        with mock.patch('core.newsletter.get_connection', wraps=get_connection) as connection_factory:
+            run_dispatch(self.dispatch, batch_size=2)
+        self.assertEqual(connection_factory.call_count, 3)  # 5 subscribers in batches of 2
+
+    def test_resumed_run_skips_subscribers_already_sent(self):
+        NewsletterDelivery.objects.bulk_create(
+            [NewsletterDelivery(dispatch=self.dispatch, subscriber=subscriber) for subscriber in self.subscribers[:3]]
+        )
+        run_dispatch(self.dispatch)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [s.email for s in self.subscribers[3:]])
+        self.dispatch.refresh_from_db()
+        self.assertEqual((self.dispatch.sent_count, self.dispatch.total), (5, 5))
+
+    def test_throttle_spaces_out_sends(self):
+        sender = NewsletterSender(self.dispatch, max_per_second=4)
+        with mock.patch('core.newsletter.time.sleep') as sleep:
+            sender.run()
+        self.assertEqual(sleep.call_count, 4)  # Every send after the first waits for its slot
+
+    def test_dispatch_being_sent_elsewhere_is_skipped(self):
+        NewsletterDispatch.objects.filter(pk=self.dispatch.pk).update(status='sending')
+        self.assertFalse(run_dispatch(self.dispatch))
+        self.assertEqual(mail.outbox, [])
+        # A run that stopped making progress long ago has died, and its dispatch can be taken over.
+        stale = timezone.now() - DISPATCH_STALE_AFTER - timedelta(minutes=1)
+        NewsletterDispatch.objects.filter(pk=self.dispatch.pk).update(updated_at=stale)
+        out = io.StringIO()
+        call_command('send_newsletter', resume=True, stdout=out)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(run_dispatch(NewsletterDispatch.objects.get(pk=self.dispatch.pk)))  # Finished
+
+    def test_a_post_is_only_dispatched_once(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.settings(NEWSLETTER_RUN_IN_PROCESS=False):
+            response = self.client.post(
+                reverse('admin:core_blogpost_changelist'), {'action': 'send_to_subscribers', '_selected_action': [self.post.pk]}, follow=True,
+            )
+        self.assertContains(response, 'Skipped 1 post(s) already emailed')
+        self.assertEqual(NewsletterDispatch.objects.count(), 1)
+        with self.assertRaisesMessage(CommandError, 'already been sent'):
+            call_command('send_newsletter', post=self.post.slug)
+
+    def test_unsubscribe_needs_a_post(self):
+        subscriber = self.subscribers[0]
+        url = reverse('core:unsubscribe_blog', args=[subscriber.unsubscribe_token])
+        self.assertContains(self.client.get(url), '<form method="POST"')  # Link scanners only ever GET
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.is_active)
+        # The one-click POST from a mail client has no CSRF token.
+        response = self.client_class(enforce_csrf_checks=True).post(url, {'List-Unsubscribe': 'One-Click'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        subscriber.refresh_from_db()
+        self.assertFalse(subscriber.is_active)
+
+    def test_subscribing_needs_a_confirmation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('core:subscribe'), {'email': ' New@Example.com '})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        subscriber = Subscriber.objects.get(email='new@example.com')
+        self.assertFalse(subscriber.is_active)
+        [message] = mail.outbox
+        confirm_url = reverse('core:confirm_subscription', args=[subscriber.confirmation_token])
+        self.assertIn('https://example.com' + confirm_url, message.body)
+        # Signing up again (or with an address already on the list) sends nothing new and says the same.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('core:subscribe'), {'email': self.subscribers[0].email})
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.assertContains(self.client.get(confirm_url), '<form method="POST"')  # Link scanners only ever GET
+        self.client.post(confirm_url)
+        subscriber.refresh_from_db()
+        self.assertTrue(subscriber.is_active)
+
+    def test_subscribe_rejects_bad_addresses(self):
+        response = self.client.post(reverse('core:subscribe'), {'email': 'not-an-address'}, follow=True)
+        self.assertContains(response, 'Please enter a valid email address.')
+        self.assertFalse(Subscriber.objects.filter(email='not-an-address').exists())
+
+
+class UniqueSlugTests(TestCase):
+    def setUp(self):
+        self.category = GalleryCategory.objects.create(name='Line and Wash')
+
+    def test_category_slug_comes_from_name(self):
+        self.assertEqual(self.category.slug, 'line-and-wash')
+
+    def test_next_free_suffix_found_with_one_query(self):
+        for _ in range(3):
+            Artwork.objects.create(title='Untitled', category=self.category, primary_image='sample')
+        artwork = Artwork(title='Untitled', category=self.category, primary_image='sample')
+        with CaptureQueriesContext(connection) as queries:
+            artwork.save()
+        self.assertEqual(artwork.slug, 'untitled-3')
+        self.assertEqual(len([query for query in queries if 'LIKE' in query['sql']]), 1)
+
+    def test_bulk_mode_allocates_in_memory(self):
+        Artwork.objects.create(title='Untitled', category=self.category, primary_image='sample')
+        artworks = [Artwork(title='Untitled', category=self.category, primary_image='sample') for _ in range(50)]
+        with self.assertNumQueries(1):
+            assign_unique_slugs(artworks, 'title')
+        self.assertEqual([a.slug for a in artworks[:2]], ['untitled-1', 'untitled-2'])
+        Artwork.objects.bulk_create(artworks)
+        self.assertEqual(Artwork.objects.values('slug').distinct().count(), 51)
+
+
+class ImportArtworksTests(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        for name in ['bridge.jpg', 'bridge-detail.jpg', 'river.jpg']:
+            Image.new('RGB', (8, 6), 'navy').save(os.path.join(self.folder.name, name))
+        self.uploads = []
+
+    def write(self, name, text):
+        path = os.path.join(self.folder.name, name)
+        with open(path, 'w', encoding='utf-8') as manifest:
+            manifest.write(text)
+        return path
+
+    def upload(self, content, name):
+        self.uploads.append(name)
+        return f'image/upload/v1/{name}'
+
+    def run_import(self, manifest, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch('core.management.commands.import_artworks.upload_image', self.upload), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('import_artworks', manifest, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_manifest(self):
+        manifest = self.write('archive.csv', (
+            'title,category,tags,description,image,additional_images\n'
+            'Bridge,Ink,ink; Guildford,Pen and wash,bridge.jpg,bridge-detail.jpg|Close up\n'
+            'River,Paint,,,river.jpg,\n'
+            'Castle,Paint,,,castle.jpg,\n'
+        ))
+        out, err = self.run_import(manifest, '--batch-size', '1')
+        self.assertIn('Row 3 (castle.jpg): missing title/category or files', err)
+        self.assertIn('2 artwork(s) to import, 0 already imported, 1 skipped.', out)
+        bridge = Artwork.objects.get(import_key='bridge.jpg')
+        self.assertEqual((bridge.title, bridge.category.name, bridge.description), ('Bridge', 'Ink', 'Pen and wash'))
+        self.assertEqual(sorted(bridge.tags.names()), ['Guildford', 'ink'])
+        self.assertEqual(list(bridge.additional_images.values_list('caption', 'order')), [('Close up', 1)])
+        self.assertEqual(bridge.primary_image_width, 8)  # Analysed from the file that was read for upload
+        self.assertEqual(sorted(GalleryCategory.objects.values_list('name', flat=True)), ['Ink', 'Paint'])
+
+    def test_json_manifest_and_rerun(self):
+        manifest = self.write('archive.json', json.dumps([
+            {'key': 'archive-1', 'title': 'Bridge', 'category': 'Ink', 'tags': 'ink, bridges', 'image': 'bridge.jpg'},
+            {'key': 'archive-2', 'title': 'Bridge', 'category': 'Ink', 'image': 'river.jpg',
+             'additional_images': [{'image': 'bridge-detail.jpg', 'caption': 'Detail', 'order': 3}]},
+        ]))
+        self.run_import(manifest)
+        self.assertEqual(sorted(Artwork.objects.values_list('slug', flat=True)), ['bridge', 'bridge-1'])
+        self.assertEqual(sorted(Artwork.objects.get(import_key='archive-1').tags.names()), ['bridges', 'ink'])
+        self.assertEqual(AdditionalArtworkImage.objects.get().order, 3)
+        self.uploads.clear()
+        out, _ = self.run_import(manifest)  # e.g. after an interruption
+        self.assertIn('0 artwork(s) to import, 2 already imported', out)
+        self.assertEqual(self.uploads, [])
+        self.assertEqual(Artwork.objects.count(), 2)
+
+    def test_a_failed_upload_only_skips_its_row(self):
+        manifest = self.write('archive.csv', (
+            'title,category,image,additional_images\n'
+            'Bridge,Ink,bridge.jpg,bridge-detail.jpg|Close up\n'
+            'River,Paint,river.jpg,\n'
+        ))
+        upload = self.upload
+
+        def flaky_upload(content, name):
+            if name == 'bridge-detail.jpg':
+                raise OSError('connection reset')
+            return upload(content, name)
+
+        self.upload = flaky_upload
+        out, err = self.run_import(manifest)
+        self.assertIn('bridge.jpg: upload failed: bridge-detail.jpg: connection reset', err)
+        self.assertIn('Imported 1 artwork(s); 1 failed to upload', out)
+        self.assertEqual(list(Artwork.objects.values_list('import_key', flat=True)), ['river.jpg'])
+        self.upload = upload
+        out, _ = self.run_import(manifest)  # The failed row is retried
+        self.assertIn('1 artwork(s) to import, 1 already imported', out)
+        self.assertEqual(Artwork.objects.count(), 2)
+
+    def test_dry_run_changes_nothing(self):
+        manifest = self.write('archive.csv', 'title,category,image\nBridge,Ink,bridge.jpg\n')
+        out, _ = self.run_import(manifest, '--dry-run')
+        self.assertIn('1 artwork(s) to import', out)
+        self.assertEqual(self.uploads, [])
+        self.assertFalse(Artwork.objects.exists() or GalleryCategory.objects.exists())
+
+
+class TagCountTests(TestCase):
+    def setUp(self):
+        self.ink = GalleryCategory.objects.create(name='Ink')
+        self.paint = GalleryCategory.objects.create(name='Paint')
+
+    def make_artwork(self, category, *tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            artwork = Artwork.objects.create(title='Study', category=category, primary_image='sample')
+            artwork.tags.add(*tags)
+        return artwork
+
+    def counts(self, model=Artwork, category=None):
+        return [(tag.name, count) for tag, count in facets.top_tags(model, category=category)]
+
+    def test_counts_follow_tag_changes(self):
+        first = self.make_artwork(self.ink, 'guildford', 'river')
+        self.make_artwork(self.paint, 'guildford')
+        self.assertEqual(self.counts(), [('guildford', 2), ('river', 1)])
+        self.assertEqual(self.counts(category=self.ink), [('guildford', 1), ('river', 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.tags.remove('river')
+        self.assertEqual(self.counts(), [('guildford', 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.tags.clear()
+        self.assertEqual(self.counts(), [('guildford', 1)])
+
+    def test_moving_and_deleting_artworks(self):
+        artwork = self.make_artwork(self.ink, 'guildford')
+        with self.captureOnCommitCallbacks(execute=True):
+            artwork.category = self.paint
+            artwork.save()
+        self.assertEqual(self.counts(category=self.ink), [])
+        self.assertEqual(self.counts(category=self.paint), [('guildford', 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            artwork.delete()
+        self.assertEqual(self.counts(), [])
+
+    def test_bulk_tagging_and_rebuild(self):
+        artworks = Artwork.objects.bulk_create(
+            assign_unique_slugs([Artwork(title='Study', category=self.ink, primary_image='sample') for _ in range(3)], 'title')
+        )
+        post = BlogPost.objects.create(title='Notes', content='...', author=User.objects.create_user('caroline'))
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_add_tags({artwork: ['ink'] for artwork in artworks})
+            post.tags.add('ink')
+        self.assertEqual(self.counts(), [('ink', 3)])
+        self.assertEqual(self.counts(BlogPost), [('ink', 1)])
+        facets.TagCount.objects.all().delete()
+        self.assertEqual(facets.rebuild(), 2)
+        self.assertEqual(self.counts(category=self.ink), [('ink', 3)])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        self.category = GalleryCategory.objects.create(name='Ink')
+
+    def add_rows(self, count):
+        for _ in range(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                artwork = Artwork.objects.create(title='Study', category=self.category, primary_image='sample')
+                artwork.tags.add('ink')
+            InstagramImportedItem.objects.create(
+                instagram_post_id=f'post-{artwork.pk}', image_url_from_instagram='https://example.com/a.jpg', created_artwork=artwork,
+            )
+            BlogPost.objects.create(title='Notes', content='...', author=self.user)
+
+    def query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = ['/admin/core/artwork/', '/admin/core/artwork/?q=ink', '/admin/core/instagramimporteditem/', '/admin/core/blogpost/']
+        self.add_rows(2)
+        for url in urls:
+            self.client.get(url)  # Warm the content type cache
+        before = [self.query_count(url) for url in urls]
+        self.add_rows(10)
+        self.assertEqual([self.query_count(url) for url in urls], before)
+
+    def test_large_tables_page_with_an_id_cursor(self):
+        self.add_rows(3)
+        with mock.patch('core.admin.InstagramImportedItemAdmin.list_per_page', 2):
+            first = self.client.get('/admin/core/instagramimporteditem/').context['cl']
+            second = self.client.get('/admin/core/instagramimporteditem/' + first.next_page_query).context['cl']
+        self.assertEqual(len(first.result_list) + len(second.result_list), 3)
+        self.assertLess(second.result_list[0].pk, first.result_list[1].pk)
+
+    def test_cursor_pages_skip_the_count_and_keep_filters(self):
+        for number in range(4):
+            Subscriber.objects.create(email=f'reader{number}@example.com', is_active=number != 1)
+        with mock.patch('core.admin.SubscriberAdmin.list_per_page', 2), \
+                mock.patch('core.admin.EstimatedCountPaginator.count', new_callable=mock.PropertyMock) as count:
+            count.return_value = 3
+            first = self.client.get('/admin/core/subscriber/', {'q': 'example', 'is_active__exact': '1'})
+            count.reset_mock()
+            older = self.client.get('/admin/core/subscriber/' + first.context['cl'].next_page_query)
+        count.assert_not_called()
+        self.assertEqual([s.email for s in older.context['cl'].result_list], ['reader0@example.com'])
+        newest = older.context['cl'].newest_page_query
+        self.assertContains(older, f'<a href="{newest}">Newest</a>', html=True)
+        self.assertEqual(parse_qs(newest[1:]), {'q': ['example'], 'is_active__exact': ['1']})
+
+
+class BlogListTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('caroline')
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {number}', content='<p>Body</p>' * 1000, summary=f'Summary {number}', author=author)
+            for number in range(12)
+        ]
+        # Same publish_date for all of them, so the id has to break the ties between pages.
+        BlogPost.objects.update(publish_date=self.posts[0].publish_date)
+        for post in self.posts[::3]:
+            post.tags.add('ink')
+
+    def test_pages_follow_on_without_loading_bodies(self):
+        first = self.client.get(reverse('core:blog_list'))
+        self.assertEqual([post.title for post in first.context['posts']], [f'Post {n}' for n in range(11, 1, -1)])
+        self.assertIn('content', first.context['posts'][0].get_deferred_fields())
+        self.assertNotContains(first, '<p>Body</p>')
+        second = self.client.get(reverse('core:blog_list') + '?' + first.context['next_query'])
+        self.assertEqual([post.title for post in second.context['posts']], ['Post 1', 'Post 0'])
+        self.assertIsNone(second.context['next_query'])
+        self.assertContains(second, f'<a href="{self.posts[0].get_absolute_url()}">Post 0</a>', html=True)
+        self.assertEqual(self.client.get(self.posts[0].get_absolute_url()).status_code, 200)
+
+    def test_tag_filter_and_bad_cursor(self):
+        response = self.client.get(reverse('core:blog_list'), {'tag': 'ink'})
+        self.assertEqual([post.title for post in response.context['posts']], ['Post 9', 'Post 6', 'Post 3', 'Post 0'])
+        self.assertEqual(self.client.get(reverse('core:blog_list'), {'cursor': 'nonsense'}).status_code, 404)
+
+
+class BlogRenditionTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('caroline')
+
+    def test_content_is_sanitised_and_images_prepared(self):
+        html, toc, minutes = build_rendition(
+            '<h2 onclick="x()">Inks &amp; washes</h2><p>Some <b>words</b><script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">link</a><a href="/gallery/">ok</a>'
+            '<img src="https://res.cloudinary.com/demo/image/upload/v1/media/wash.jpg" style="width:640px; height:480px">'
+            '<h2>Inks &amp; washes</h2><p>unclosed'
+        )
+        self.assertNotIn('script', html)
+        self.assertNotIn('onclick', html)
+        self.assertNotIn('javascript', html)
+        self.assertIn('<a href="/gallery/">ok</a>', html)
+        self.assertIn('src="https://res.cloudinary.com/demo/image/upload/f_auto,q_auto,c_limit,w_800/v1/media/wash.jpg"', html)
+        self.assertIn('w_1600/v1/media/wash.jpg 1600w', html)
+        self.assertIn('width="640" height="480"', html)
+        self.assertIn('loading="lazy" decoding="async"', html)
+        self.assertTrue(html.endswith('<p>unclosed</p>'))
+        self.assertEqual([entry['id'] for entry in toc], ['inks-washes', 'inks-washes-2'])
+        self.assertEqual(toc[0]['title'], 'Inks & washes')
+        self.assertEqual(minutes, 1)
+
+    def test_dropped_elements_never_swallow_the_rest_of_the_post(self):
+        for content, expected in [
+            ('<p>intro</p><embed src="x.swf"><p>rest of the post</p>', '<p>intro</p><p>rest of the post</p>'),
+            ('<form><input></form><p>after</p>', '<p>after</p>'),
+            ('<object data="x"><param name="a"><source src="b"><wbr></object><p>after</p>', '<p>after</p>'),
+            ('<svg><g><path d="M0"></svg><p>after</p>', '<p>after</p>'),
+            ('<svg><svg><circle /></svg><text>x</text></svg><p>after</p>', '<p>after</p>'),
+            ('<p>a<svg/>b</p>', '<p>ab</p>'),
+        ]:
+            with self.subTest(content=content):
+                self.assertEqual(build_rendition(content)[0], expected)
+
+    def test_saved_post_page_serves_the_stored_rendition(self):
+        post = BlogPost.objects.create(title='Washes', content='<h2>One</h2><h2>Two</h2>' + '<p>word</p>' * 500, author=self.author)
+        self.assertEqual(post.reading_time, 3)
+        response = self.client.get(post.get_absolute_url())
+        self.assertContains(response, '<h2 id="one">One</h2>')
+        self.assertContains(response, '<a href="#two">Two</a>')
+        self.assertIn('content', response.context['post'].get_deferred_fields())
+
+    def test_out_of_date_post_page_is_built_without_a_write(self):
+        BlogPost.objects.bulk_create([BlogPost(title='Bulk', slug='bulk', content='<p>Hello</p>', author=self.author)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:blog_detail', kwargs={'slug': 'bulk'}))
+        self.assertContains(response, '<p>Hello</p>')
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+        self.assertEqual(BlogPost.objects.get(slug='bulk').rendition_version, 0)
+
+    def test_saving_an_out_of_date_post_rebuilds_it(self):
+        BlogPost.objects.bulk_create([BlogPost(title='Bulk', slug='bulk', content='<p>Hello</p>', author=self.author)])
+        post = BlogPost.objects.get(slug='bulk')
+        post.title = 'Bulk, renamed'
+        post.save(update_fields=['title'])
+        post = BlogPost.objects.get(slug='bulk')
+        self.assertEqual((post.content_html, post.rendition_version), ('<p>Hello</p>', RENDITION_VERSION))
+
+    def test_rebuild_command_builds_bulk_created_posts(self):
+        BlogPost.objects.bulk_create([BlogPost(title='Bulk', slug='bulk', content='<p>Hello</p>', author=self.author)])
+        call_command('rebuild_blog_html', stdout=io.StringIO())
+        post = BlogPost.objects.get(slug='bulk')
+        self.assertEqual((post.content_html, post.rendition_version), ('<p>Hello</p>', RENDITION_VERSION))
+
+
+class RenditionTests(TestCase):
+    def test_srcset_tag(self):
+        html = Template("{% load renditions %}<img {% srcset image 'card' %}>").render(Context({'image': 'image/upload/v12/artworks/bridge.jpg'}))
+        self.assertRegex(html, r'src="https?://res\.cloudinary\.com/\w+/image/upload/c_limit,f_auto,q_auto,w_640/v12/artworks/bridge\.jpg"')
+        self.assertIn('w_320/v12/artworks/bridge.jpg 320w, ', html)
+        self.assertIn('sizes="(max-width: 600px) 100vw, 360px"', html)
+        self.assertEqual(Template("{% load renditions %}<img {% srcset image 'card' %}>").render(Context({'image': None})), '<img >')
+
+    def test_urls_are_built_once_per_image(self):
+        image = CloudinaryResource('artworks/memoised', format='jpg', version='3', type='upload', resource_type='image')
+        with mock.patch.object(CloudinaryResource, 'build_url', autospec=True, return_value='url') as build_url:
+            for _ in range(3):
+                rendition_urls(image, 'hero')
+        self.assertEqual(build_url.call_count, len(RENDITIONS['hero']['widths']))
+        with self.assertRaises(ValueError):
+            rendition_urls(image, 'poster')
+
+
+def _image_bytes(size, color, format='JPEG', orientation=None):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format, exif=exif)
+    return buffer.getvalue()
+
+
+class ImageAnalysisTests(TestCase):
+    def setUp(self):
+        self.category = GalleryCategory.objects.create(name='Ink')
+
+    def test_size_placeholder_and_colour(self):
+        result = images.analyse_image(_image_bytes((400, 300), (200, 30, 40)))
+        self.assertEqual((result['width'], result['height']), (400, 300))
+        self.assertTrue(result['placeholder'].startswith('data:image/jpeg;base64,'))
+        self.assertLess(len(result['placeholder']), 1000)
+        red, green, blue = (int(result['color'][i:i + 2], 16) for i in (1, 3, 5))
+        self.assertTrue(abs(red - 200) < 8 and abs(green - 30) < 8 and abs(blue - 40) < 8, result['color'])
+        # Rotated by EXIF: browsers show it 300 wide.
+        rotated = images.analyse_image(_image_bytes((400, 300), (0, 0, 0), orientation=6))
+        self.assertEqual((rotated['width'], rotated['height']), (300, 400))
+        with self.assertLogs('core.images', 'WARNING'):
+            self.assertIsNone(images.try_analyse_image(b'not an image'))
+
+    def test_uploads_are_analysed_in_the_background(self):
+        upload = CloudinaryResource('artworks/bridge', format='jpg', type='upload', resource_type='image')
+        with mock.patch('core.background.submit_to_pool') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                artwork = Artwork.objects.create(title='Bridge', category=self.category, primary_image=upload)
+            Artwork.objects.create(title='Stub', category=self.category, primary_image='stub-id')  # Not an upload
+        analysis = [call for call in submit.call_args_list if call.args[0] is images.analyse_rows]  # Not the related refresh
+        self.assertEqual(analysis, [mock.call(images.analyse_rows, Artwork, [artwork.pk])])
+
+        with mock.patch('core.images._fetch', return_value=_image_bytes((40, 20), (0, 0, 255))):
+            self.assertEqual(images.analyse_rows(Artwork, [artwork.pk]), 1)
+        artwork.refresh_from_db()
+        self.assertEqual((artwork.primary_image_width, artwork.primary_image_height), (40, 20))
+
+        # Replacing the image throws the old analysis away.
+        artwork.primary_image = CloudinaryResource('artworks/river', format='jpg', type='upload', resource_type='image')
+        with mock.patch('core.background.submit_to_pool'):
+            artwork.save()
+        artwork.refresh_from_db()
+        self.assertIsNone(artwork.primary_image_width)
+        self.assertEqual(artwork.primary_image_placeholder, '')
+
+    def test_a_save_reads_the_previous_row_once(self):
+        artwork = Artwork.objects.create(title='Bridge', category=self.category, primary_image='bridge', primary_image_width=40)
+        with CaptureQueriesContext(connection) as queries:
+            with mock.patch('core.background.submit_to_pool'):
+                artwork.save()
+        previous = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and query['sql'].endswith('LIMIT 1')]
+        self.assertEqual(len(previous), 1, previous)
+
+    def test_an_image_replaced_during_analysis_keeps_its_own(self):
+        artwork = Artwork.objects.create(title='Bridge', category=self.category, primary_image='bridge')
+
+        def replace_while_fetching(image):
+            Artwork.objects.filter(pk=artwork.pk).update(primary_image='river')
+            return _image_bytes((40, 20), (0, 0, 255))
+
+        with mock.patch('core.images._fetch', side_effect=replace_while_fetching):
+            self.assertEqual(images.analyse_rows(Artwork, [artwork.pk]), 0)
+        self.assertIsNone(Artwork.objects.get(pk=artwork.pk).primary_image_width)
+
+    def test_backfill_command(self):
+        Artwork.objects.create(title='Bridge', category=self.category, primary_image='bridge')
+        HeroSlide.objects.create(title='River', image='river')
+        with mock.patch('core.images._fetch', return_value=_image_bytes((30, 60), (0, 128, 0))):
+            call_command('analyse_images', workers=1, stdout=io.StringIO())
+        self.assertEqual(HeroSlide.objects.get().image_height, 60)
+        self.assertEqual(Artwork.objects.get().primary_image_width, 30)
+
+
+class LocalImageStorageTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage = override_settings(IMAGE_STORAGE='local', LOCAL_IMAGES_ROOT=root.name)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.category = GalleryCategory.objects.create(name='Ink')
+
+    def _upload(self, size=(1200, 800)):
+        upload = SimpleUploadedFile('Bridge at Dusk.png', _image_bytes(size, (200, 30, 40), 'PNG'), 'image/png')
+        with mock.patch('core.background.submit_to_pool') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                artwork = Artwork.objects.create(title='Bridge', category=self.category, primary_image=upload)
+        analysis = [call for call in submit.call_args_list if call.args[0] is images.analyse_rows]  # Not the related refresh
+        self.assertEqual(analysis, [mock.call(images.analyse_rows, Artwork, [artwork.pk])])
+        return Artwork.objects.get(pk=artwork.pk).primary_image
+
+    def _get(self, path, accept='image/avif,image/webp,*/*'):
+        return local_images.serve(RequestFactory().get('/media/images/' + path, HTTP_ACCEPT=accept), path)
+
+    def test_uploads_are_stored_and_resized_on_demand(self):
+        image = self._upload()
+        self.assertTrue(image.public_id.startswith('bridge-at-dusk_'))
+        self.assertEqual(image.format, 'png')
+        self.assertEqual(images.analyse_rows(Artwork, Artwork.objects.values_list('pk', flat=True)), 1)  # Read from disk
+        path = f'image/upload/c_limit,f_auto,q_auto,w_320/v{image.version}/{image.public_id}.png'
+
+        with mock.patch('core.local_images.render', wraps=local_images.render) as render:
+            response = self._get(path)
+            again = self._get(path)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((response['Content-Type'], response['Vary']), ('image/webp', 'Accept'))
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(again.streaming_content))) as resized:
+            self.assertEqual(resized.size, (320, 213))
+        # Browsers without WebP get the original's format; the original itself is served as is.
+        self.assertEqual(self._get(path, accept='image/*')['Content-Type'], 'image/png')
+        original = self._get(f'image/upload/v{image.version}/{image.public_id}.png')
+        self.assertEqual(b''.join(original.streaming_content)[:4], b'\x89PNG')
+        # Only the renditions' transformations are made, whatever else a URL asks for.
+        for bad in ('image/upload/w_99999/' + image.public_id, 'image/upload/e_blur/' + image.public_id,
+                    f'image/upload/c_limit,f_auto,q_auto,w_321/{image.public_id}.png',
+                    f'image/upload/c_fill,h_2400,w_2400/{image.public_id}.png',
+                    f'image/upload/c_limit,f_png,q_100,w_320/{image.public_id}.png',
+                    'image/upload/../../settings.py', 'image/upload/c_limit,f_auto,q_auto,w_320/missing.jpg'):
+            with self.assertRaises(Http404):
+                self._get(bad)
+
+    def test_concurrent_requests_make_one_copy(self):
+        image = self._upload()
+        render = local_images.render
+        barrier = threading.Barrier(6)
+
+        def slow_render(*args):
+            time.sleep(0.05)
+            return render(*args)
+
+        def request():
+            barrier.wait()
+            return local_images.derivative(image.public_id, 'png', {'w': 200, 'c': 'fill', 'h': 200})
+
+        with mock.patch('core.local_images.render', side_effect=slow_render) as mocked:
+            threads = [threading.Thread(target=request) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(mocked.call_count, 1)
+
+    def test_cache_evicts_least_recently_used_copies(self):
+        image = self._upload((400, 400))
+        paths = [local_images.derivative(image.public_id, 'png', {'w': width})[0] for width in (100, 150, 200)]
+        for age, path in zip((300, 100, 200), paths):  # The 100px copy is the least recently used
+            moment = time.time() - age
+            os.utime(path, (moment, moment))
+        total = sum(os.path.getsize(path) for path in paths)
+        local_images.evict(total - 1)
+        self.assertEqual([os.path.exists(path) for path in paths], [False, True, True])
+
+
+class RelatedArtworkTests(TestCase):
+    def setUp(self):
+        ink, paint = GalleryCategory.objects.create(name='Ink'), GalleryCategory.objects.create(name='Paint')
+        self.artworks = {}
+        for name, category, tags in [('a', ink, ['bridge', 'river']), ('b', ink, ['bridge', 'river']),
+                                     ('c', paint, ['bridge']), ('d', paint, ['portrait'])]:
+            self.artworks[name] = Artwork.objects.create(title=name, category=category, primary_image='sample')
+            self.artworks[name].tags.add(*tags)
+        related.rebuild()
+
+    def titles(self, name):
+        return [artwork.title for artwork in related.related_artworks(self.artworks[name])]
+
+    def test_shared_tags_and_category_rank_first(self):
+        self.assertEqual(self.titles('a'), ['b', 'c'])  # d shares neither a tag nor the category
+        self.assertEqual(self.titles('d'), ['c'])
+        with self.assertNumQueries(1):
+            related.related_artworks(self.artworks['a'].pk)
+
+    def test_tag_changes_refresh_the_affected_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artworks['a'].tags.add('portrait')
+        # d shares the new (rare, so heavily weighted) tag; its list is refreshed too.
+        self.assertEqual(self.titles('a'), ['b', 'd', 'c'])
+        self.assertEqual(self.titles('d')[0], 'a')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artworks['b'].delete()
+        self.assertEqual(self.titles('a'), ['d', 'c'])
+
+    def test_detail_page_shows_the_stored_list(self):
+        self.client.get(self.artworks['b'].get_absolute_url())  # Loads the cached social links
+        with self.assertNumQueries(5):  # The view's four, plus the ETag's freshness query
+            response = self.client.get(self.artworks['a'].get_absolute_url())
+        self.assertContains(response, 'You may also like')
+        self.assertContains(response, self.artworks['b'].get_absolute_url())
+        self.assertNotContains(response, self.artworks['d'].get_absolute_url())
+
+        # Revalidated like the other pages, and editing an artwork on the strip changes the page.
+        url, etag = self.artworks['a'].get_absolute_url(), response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Artwork.objects.filter(pk=self.artworks['b'].pk).update(title='b, retitled', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.category = GalleryCategory.objects.create(name='Ink')
+        self.artworks = [
+            Artwork.objects.create(title=f'Bridge {number}', category=self.category, primary_image=f'image/upload/v1/bridge-{number}.jpg')
+            for number in range(3)
+        ]
+        AdditionalArtworkImage.objects.create(artwork=self.artworks[0], image='image/upload/v1/bridge-detail.jpg')
+        author = User.objects.create_user('caroline')
+        self.post = BlogPost.objects.create(title='Sketching & bridges', content='<p>Body</p>', summary='Notes', author=author)
+        self.post.tags.add('news')
+
+    def content(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_index_and_sections(self):
+        index = self.content(reverse('core:sitemap_index'))
+        for section in ('pages', 'artworks', 'categories', 'blog'):
+            self.assertIn(f'<loc>http://testserver/sitemap-{section}.xml</loc>', index)
+
+        artworks = self.content(reverse('core:sitemap_section', kwargs={'section': 'artworks'}))
+        self.assertIn(f'<loc>http://testserver{self.artworks[0].get_absolute_url()}</loc><lastmod>', artworks)
+        self.assertEqual(artworks.count('<url>'), 3)
+        self.assertEqual(artworks.count('<image:loc>'), 4)  # Three primary images and one additional
+        self.assertIn('w_1600/v1/bridge-detail.jpg</image:loc>', artworks)
+        self.assertIn(self.category.get_absolute_url(), self.content(reverse('core:sitemap_section', kwargs={'section': 'categories'})))
+        self.assertIn(self.post.get_absolute_url(), self.content(reverse('core:sitemap_section', kwargs={'section': 'blog'})))
+        self.assertIn('Sitemap: http://testserver/sitemap.xml', self.client.get(reverse('core:robots_txt')).content.decode())
+
+    def test_listed_pages_exist(self):
+        pages = self.content(reverse('core:sitemap_section', kwargs={'section': 'pages'}))
+        self.assertEqual(pages.count('<url>'), len(STATIC_PAGES))
+        for name in STATIC_PAGES:
+            with self.subTest(name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_long_sections_are_split(self):
+        section = reverse('core:sitemap_section', kwargs={'section': 'artworks'})
+        with mock.patch('core.sitemaps.SITEMAP_MAX_URLS', 2):
+            self.assertIn(f'<loc>http://testserver{section}?p=2</loc>', self.content(reverse('core:sitemap_index')))
+            self.assertEqual(self.content(section + '?p=2').count('<url>'), 1)
+            self.assertEqual(self.client.get(section + '?p=3').status_code, 404)
+        self.assertEqual(self.client.get(reverse('core:sitemap_section', kwargs={'section': 'secret'})).status_code, 404)
+
+    def test_revalidation_is_answered_without_rendering(self):
+        response = self.client.get(reverse('core:sitemap_index'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('core:sitemap_index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feeds(self):
+        rss = self.client.get(reverse('core:blog_feed'))
+        self.assertEqual(rss['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertContains(rss, '<title>Sketching &amp; bridges</title>')
+        self.assertContains(rss, '<category>news</category>')
+        atom = self.client.get(reverse('core:artwork_atom_feed'))
+        self.assertEqual(atom['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertContains(atom, self.artworks[2].get_absolute_url())
+        self.assertContains(atom, '<category term="Ink"')
+        for response in (rss, atom):
+            self.assertIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+    def test_category_page(self):
+        response = self.client.get(self.category.get_absolute_url())
+        for artwork in self.artworks:
+            self.assertContains(response, artwork.get_absolute_url())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old_slide = HeroSlide.objects.create(title='River', image='river-image')
+        self.slide = HeroSlide.objects.create(title='Bridge', image='bridge-image')
+        self.link = SocialLink.objects.create(platform_name='instagram', url='https://instagram.com/example')
+
+    def revalidate(self, response, **headers):
+        return self.client.get(reverse('core:home'), HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+
+    def test_unchanged_page_gets_304_without_rendering(self):
+        first = self.client.get(reverse('core:home'))
+        second = self.revalidate(first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.request_metrics.queries, 0)
+        self.assertEqual(second.request_metrics.render_time, 0)
+        # No Last-Modified: deletes and deploys don't move any timestamp, so it could go stale.
+        self.assertNotIn('Last-Modified', first)
+        since = self.client.get(reverse('core:home'), HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(since.status_code, 200)
+
+    def test_edits_deletes_and_footer_changes_change_the_etag(self):
+        for change in [
+            lambda: self.old_slide.delete(),  # Doesn't move MAX(updated_at), but the count changes
+            lambda: HeroSlide.objects.get(pk=self.slide.pk).save(),
+            lambda: SocialLink.objects.get(pk=self.link.pk).save(),
+        ]:
+            with self.subTest(change=change):
+                first = self.client.get(reverse('core:home'))
+                with self.captureOnCommitCallbacks(execute=True):  # The homepage's cache goes on commit
+                    change()
+                self.assertEqual(self.revalidate(first).status_code, 200)
+
+    def test_gallery_changes_change_the_gallery_etag(self):
+        first = self.client.get(reverse('core:gallery_home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            GalleryCategory.objects.create(name='Ink')
+        second = self.client.get(reverse('core:gallery_home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+
+    def test_tag_changes_change_the_post_etag(self):
+        post = BlogPost.objects.create(title='Notes', content='<p>Body</p>', author=User.objects.create_user('caroline'))
+        url = post.get_absolute_url()
+
+        def rename_tag():
+            tag = Tag.objects.get(name='ink')
+            tag.name = 'Ink'
+            tag.save()
+
+        for change in [lambda: post.tags.add('ink'), rename_tag, lambda: post.tags.remove(*post.tags.all())]:
+            with self.subTest(change=change):
+                first = self.client.get(url)
+                change()
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_pages_with_messages_are_always_rendered(self):
+        first = self.client.get(reverse('core:home'))
+        with mock.patch('core.conditional.get_messages', return_value=['Thanks for subscribing!']):
+            response = self.revalidate(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+# Most SQL queries each page may run, measured by core.metrics.RequestMetricsMiddleware against
+# a database with several rows of everything (so a per-row query would blow the budget).
+# If a change legitimately needs more, raise the number here in the same commit.
+QUERY_BUDGETS = [
+    # (url name, URL kwargs, query string, budget)
+    ('core:home', {}, {}, 4),  # Pages with conditional GET also run the freshness query (core/conditional.py)
+    ('core:gallery_home', {}, {}, 2),
+    ('core:gallery_category_view', {'category_slug': 'ink'}, {}, 3),
+    ('core:artwork_detail', {'artwork_slug': 'bridge-0'}, {}, 5),
+    ('core:blog_list', {}, {}, 3),
+    ('core:blog_detail', {'slug': 'post-0'}, {}, 3),
+    ('core:search_artworks', {}, {'q': 'bridge'}, 2),
+    ('core:all_artworks_api', {}, {}, 3),
+    ('core:gallery_categories_api', {}, {}, 1),
+    ('core:artwork_tags_api', {}, {}, 1),
+]
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('caroline')
+        for name in ['Ink', 'Paint']:
+            category = GalleryCategory.objects.create(name=name)
+            for number in range(4):
+                artwork = Artwork.objects.create(title=f'Bridge {number}', category=category, primary_image='sample')
+                artwork.tags.add('bridge', f'study-{number}')
+                FeaturedHomepageArtwork.objects.create(artwork=artwork, order=number)
+        for number in range(3):
+            HeroSlide.objects.create(title=f'Slide {number}', image='sample', order=number)
+            SocialLink.objects.create(platform_name='instagram', url=f'https://instagram.com/{number}', order=number)
+            BlogPost.objects.create(title=f'Post {number}', content='<p>Body</p>', author=author).tags.add('news')
+        related.rebuild()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertQueryBudget(self, url_name, budget, params=None, kwargs=None):
+        response = self.client.get(reverse(url_name, kwargs=kwargs), params or {})
+        self.assertEqual(response.status_code, 200)
+        queries = response.request_metrics.queries
+        self.assertLessEqual(queries, budget, f"{url_name} ran {queries} queries (budget {budget})")
+        return response
+
+    def test_pages_stay_within_query_budget(self):
+        for url_name, kwargs, params, budget in QUERY_BUDGETS:
+            with self.subTest(url_name):
+                self.assertQueryBudget(url_name, budget, params, kwargs)
+
+    def test_cached_pages_run_no_queries(self):
+        # The page and its ETag signature (core/conditional.py) are both cached after one visit.
+        for url_name in ['core:home', 'core:gallery_home']:
+            with self.subTest(url_name):
+                self.client.get(reverse(url_name))
+                self.assertQueryBudget(url_name, 0)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('core:gallery_categories_api'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+@override_settings(DEBUG=True)
+class SampleDataTests(TestCase):
+    def generate(self):
+        call_command(
+            'generate_sample_data', '--categories', '3', '--artworks', '20', '--blog-posts', '4',
+            '--subscribers', '5', '--instagram-items', '5', stdout=io.StringIO(),
+        )
+        return (
+            list(Artwork.objects.order_by('import_key').values_list('title', 'category__name', 'date_uploaded')),
+            list(Subscriber.objects.order_by('email').values_list('email', 'is_active', 'confirmation_token', 'unsubscribe_token')),
+        )
+
+    def test_same_seed_regenerates_the_same_data(self):
+        first = self.generate()
+        self.assertEqual(self.generate(), first)
+        self.assertEqual(Artwork.objects.count(), 20)
+        self.assertEqual(Subscriber.objects.count(), 5)
+        counts = [count for tag, count in facets.top_tags(Artwork)]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Collected once for the class: Brotli at quality 11 takes a few seconds.
+        static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(static_root.cleanup)
+        settings_override = override_settings(STATIC_ROOT=static_root.name)
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_files_are_served_compressed_and_immutable(self):
+        url = staticfiles_storage.url('core/css/main.css')
+        self.assertRegex(url, r'^/static/core/css/main\.[0-9a-f]{12}\.css$')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_accept_encoding_is_parsed(self):
+        url = staticfiles_storage.url('core/css/main.css')
+        for accept, expected in [('gzip, br', 'br'), ('br;q=0, gzip', 'gzip'), ('gzip;q=0, br;q=0', None),
+                                 ('x-gzip-br', None), ('*', 'br'), ('*;q=0.5, br;q=0', 'gzip')]:
+            with self.subTest(accept):
+                self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING=accept).get('Content-Encoding'), expected)
+
+    def test_unhashed_names_revalidate(self):
+        response = self.client.get('/static/core/css/main.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/static/core/css/main.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
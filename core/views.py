@@ -1,12 +1,52 @@
 # core/views.py
-from django.shortcuts import render
-from .models import HeroSlide, FeaturedHomepageArtwork # Import your new models
+import base64
+import hashlib
+from datetime import datetime
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.http import Http404, HttpResponse, JsonResponse
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from taggit.models import Tag
+from . import background, caching, newsletter, related, richtext, search
+from .renditions import RENDITIONS, rendition_url, srcset_attributes
+from .conditional import (
+    GALLERY_INDEX_VERSION_KEYS, HOME_VERSION_KEYS, artwork_detail_sources, blog_detail_sources, blog_list_sources,
+    conditional_page, gallery_category_sources, gallery_index_sources, home_sources,
+)
+from .models import HeroSlide, FeaturedHomepageArtwork, Artwork, BlogPost, GalleryCategory, Subscriber # Import your new models
 
+ARTWORKS_API_DEFAULT_LIMIT = 24
+ARTWORKS_API_MAX_LIMIT = 100
+SEARCH_RESULTS_LIMIT = 60
+BLOG_LIST_PAGE_SIZE = 10
+GALLERY_CATEGORY_PAGE_SIZE = 24
+
+@conditional_page(home_sources, HOME_VERSION_KEYS)
 def home_view(request):
+    # The homepage only changes when the artist edits content in the admin, so the rendered
+    # page is cached and thrown away by the signal handlers in core/signals.py.
+    cache_key = caching.homepage_cache_key(request)
+    if cache_key:
+        cached_html = caching.get_cached_page(cache_key)
+        if cached_html is not None:
+            return HttpResponse(caching.insert_csrf_token(cached_html, request))
+
     active_hero_slides = HeroSlide.objects.filter(is_active=True).order_by('order')
 
     # Fetch up to 3 active featured artworks, ordered correctly
-    featured_artworks_on_homepage = FeaturedHomepageArtwork.objects.filter(is_active=True).order_by('order')[:3]
+    featured_artworks_on_homepage = (
+        FeaturedHomepageArtwork.objects.filter(is_active=True)
+        .select_related('artwork')
+        .order_by('order')[:3]
+    )
 
     # We need the actual Artwork objects to get their images
     actual_featured_artworks = [fa.artwork for fa in featured_artworks_on_homepage if fa.artwork]
@@ -16,4 +56,375 @@ def home_view(request):
         'featured_artworks': actual_featured_artworks,
         # You can also fetch latest blog post here dynamically later
     }
-    return render(request, 'core/home.html', context)
\ No newline at end of file
+    if cache_key is None:
+        return render(request, 'core/home.html', context)
+
+    context['csrf_token'] = caching.CSRF_TOKEN_PLACEHOLDER
+    html = render_to_string('core/home.html', context, request)
+    caching.set_cached_page(cache_key, html)
+    return HttpResponse(caching.insert_csrf_token(html, request))
+
+
+
+def _gallery_index_queryset():
+    # One query for every category: artwork count, newest upload, and the newest artwork's image
+    # as a cover for categories without a representative_image.
+    newest_artwork = Artwork.objects.filter(category=OuterRef('pk')).order_by('-date_uploaded', '-id')
+    return (
+        GalleryCategory.objects.annotate(
+            artwork_count=Count('artworks'),
+            latest_upload=Max('artworks__date_uploaded'),
+            latest_image=Subquery(newest_artwork.values('primary_image')[:1]),
+        )
+        .order_by('name')
+    )
+
+
+def _gallery_index_entry(category):
+    # Plain dicts (not model instances) so the cached copy stays small and picklable.
+    cover = srcset_attributes(category.representative_image or category.latest_image, 'card')
+    return {
+        'name': category.name,
+        'slug': category.slug,
+        'url': category.get_absolute_url(),
+        'cover_image': cover.get('src'),
+        'cover_srcset': cover.get('srcset'),
+        'cover_sizes': cover.get('sizes'),
+        'artwork_count': category.artwork_count,
+        'latest_upload': category.latest_upload,
+    }
+
+
+def _gallery_index():
+    return [_gallery_index_entry(category) for category in _gallery_index_queryset()]
+
+
+@conditional_page(gallery_index_sources, GALLERY_INDEX_VERSION_KEYS)
+def gallery_home_view(request):
+    # Cached until the next artwork/category/tag change bumps the gallery version (core/signals.py).
+    categories = caching.get_or_build_gallery_data('index', _gallery_index)
+    return render(request, 'core/gallery_home.html', {'categories': categories})
+
+
+def _gallery_category_queryset(request, category):
+    # Keyset-paginated on (date_uploaded, id) like the gallery API and the blog listing. Descriptions
+    # aren't shown, so not loaded. One extra row tells us whether there are older works.
+    artworks = category.artworks.defer('description').order_by('-date_uploaded', '-id')
+    if request.GET.get('cursor'):
+        position = _decode_cursor(request.GET['cursor'])
+        if position is None:
+            raise Http404("Invalid page.")
+        date_uploaded, pk = position
+        artworks = artworks.filter(Q(date_uploaded__lt=date_uploaded) | Q(date_uploaded=date_uploaded, pk__lt=pk))
+    return artworks[:GALLERY_CATEGORY_PAGE_SIZE + 1]
+
+
+def _gallery_category_context(category, artworks):
+    next_query = None
+    if len(artworks) > GALLERY_CATEGORY_PAGE_SIZE:
+        artworks = artworks[:GALLERY_CATEGORY_PAGE_SIZE]
+        next_query = urlencode({'cursor': _encode_cursor(artworks[-1].date_uploaded, artworks[-1].pk)})
+    return {
+        'category': category,
+        'artworks': artworks,
+        'next_query': next_query,
+    }
+
+
+@conditional_page(gallery_category_sources)
+def gallery_category_view(request, category_slug):
+    # Always two queries: category, artworks.
+    category = get_object_or_404(GalleryCategory, slug=category_slug)
+    artworks = list(_gallery_category_queryset(request, category))
+    return render(request, 'core/gallery_category.html', _gallery_category_context(category, artworks))
+
+
+# --- Gallery JSON API ---
+# Responses carry an ETag built from the gallery version counter (bumped by core/signals.py on any
+# artwork, category or tag change) plus the request URL. A matching If-None-Match gets a 304
+# before any query runs, which is what the infinite-scroll front end sends on revisits.
+
+def _gallery_etag(request, version=None):
+    # Async views read the version themselves (caching.aget_version) and pass it in.
+    if version is None:
+        version = caching.get_version(caching.GALLERY_VERSION_KEY)
+    digest = hashlib.md5(f'{version}:{request.get_full_path()}'.encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def _compact_json_response(data, etag, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+    if status == 200:
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _encode_cursor(moment, pk):
+    # Position in a (timestamp, id) ordering; used by the gallery API and the blog listing.
+    raw = f'{moment.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_part, pk_part = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(date_part), int(pk_part)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _serialize_artwork(artwork):
+    return {
+        'id': artwork.pk,
+        'title': artwork.title,
+        'slug': artwork.slug,
+        'url': artwork.get_absolute_url(),
+        'image': rendition_url(artwork.primary_image, 'full'),
+        'srcset': srcset_attributes(artwork.primary_image, 'card').get('srcset'),  # For grid tiles
+        'sizes': RENDITIONS['card']['sizes'],
+        # Lets the front end reserve space and show a colour until the image loads (core/images.py)
+        'width': artwork.primary_image_width,
+        'height': artwork.primary_image_height,
+        'color': artwork.primary_image_color or None,
+        'description': artwork.description,
+        'category': {'name': artwork.category.name, 'slug': artwork.category.slug},
+        'tags': [tag.name for tag in artwork.tags.all()],  # Served from the prefetch cache
+        'additional_images': [
+            {'image': rendition_url(extra.image, 'full'), 'caption': extra.caption or ''}
+            for extra in artwork.additional_images.all()
+        ],
+        'date_uploaded': artwork.date_uploaded.isoformat(),
+    }
+
+
+def _artworks_page_queryset(request):
+    # Returns (queryset fetching one page plus one extra row, limit). Bad parameters raise ValueError.
+    try:
+        limit = min(max(int(request.GET.get('limit', ARTWORKS_API_DEFAULT_LIMIT)), 1), ARTWORKS_API_MAX_LIMIT)
+    except ValueError:
+        raise ValueError('limit must be a whole number.')
+
+    artworks = (
+        Artwork.objects.select_related('category')
+        .prefetch_related('tags', 'additional_images')
+        .order_by('-date_uploaded', '-id')
+    )
+    if request.GET.get('category'):
+        artworks = artworks.filter(category__slug=request.GET['category'])
+    if request.GET.get('tag'):
+        artworks = artworks.filter(tags__slug=request.GET['tag'])
+    if request.GET.get('cursor'):
+        position = _decode_cursor(request.GET['cursor'])
+        if position is None:
+            raise ValueError('Invalid cursor.')
+        date_uploaded, pk = position
+        artworks = artworks.filter(Q(date_uploaded__lt=date_uploaded) | Q(date_uploaded=date_uploaded, pk__lt=pk))
+    return artworks[:limit + 1], limit  # One extra row tells us whether there is a next page
+
+
+def _artworks_page_data(page, limit):
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'results': [_serialize_artwork(artwork) for artwork in page],
+        'next_cursor': _encode_cursor(page[-1].date_uploaded, page[-1].pk) if has_more else None,
+    }
+
+
+@require_GET
+def all_artworks_view(request):
+    # Keyset pagination on (date_uploaded, id): each page is an index range scan that starts where
+    # the previous one stopped, so page 200 costs the same as page 1 (unlike OFFSET).
+    # Always three queries: artworks + category (join), tags, additional images.
+    etag = _gallery_etag(request)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        artworks, limit = _artworks_page_queryset(request)
+    except ValueError as exc:
+        return _compact_json_response({'error': str(exc)}, etag, status=400)
+    return _compact_json_response(_artworks_page_data(list(artworks), limit), etag)
+
+
+@require_GET
+def gallery_categories_api(request):
+    etag = _gallery_etag(request)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    categories = GalleryCategory.objects.annotate(artwork_count=Count('artworks')).order_by('name')
+    return _compact_json_response({
+        'results': [
+            {
+                'name': category.name,
+                'slug': category.slug,
+                'image': category.representative_image.url if category.representative_image else None,
+                'artwork_count': category.artwork_count,
+            }
+            for category in categories
+        ],
+    }, etag)
+
+
+@require_GET
+def artwork_tags_api(request):
+    etag = _gallery_etag(request)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    # Only tags that are actually on artworks (TaggedItem is shared with BlogPost).
+    tags = (
+        Tag.objects.filter(artworks_tagged_directly__isnull=False)
+        .annotate(artwork_count=Count('artworks_tagged_directly'))
+        .order_by('-artwork_count', 'name')
+    )
+    return _compact_json_response({
+        'results': [{'name': tag.name, 'slug': tag.slug, 'artwork_count': tag.artwork_count} for tag in tags],
+    }, etag)
+
+
+
+def _blog_list_queryset(request):
+    # Post bodies can be hundreds of KB of HTML, so the listing never loads them: only what the
+    # cards show, with the author joined in and the tags fetched in one go. Keyset pagination on
+    # (publish_date, id), like the gallery API, so old pages cost the same as the first one.
+    posts = (
+        BlogPost.objects.select_related('author')
+        .defer('content', 'content_html', 'table_of_contents')
+        .prefetch_related('tags')
+        .order_by('-publish_date', '-id')
+    )
+    tag = request.GET.get('tag', '')
+    if tag:
+        posts = posts.filter(tags__slug=tag)
+    if request.GET.get('cursor'):
+        position = _decode_cursor(request.GET['cursor'])
+        if position is None:
+            raise Http404("Invalid page.")
+        publish_date, pk = position
+        posts = posts.filter(Q(publish_date__lt=publish_date) | Q(publish_date=publish_date, pk__lt=pk))
+    return posts[:BLOG_LIST_PAGE_SIZE + 1]  # One extra row tells us whether there are older posts
+
+
+def _blog_list_context(request, posts):
+    tag = request.GET.get('tag', '')
+    next_query = None
+    if len(posts) > BLOG_LIST_PAGE_SIZE:
+        posts = posts[:BLOG_LIST_PAGE_SIZE]
+        params = {'tag': tag} if tag else {}
+        next_query = urlencode({**params, 'cursor': _encode_cursor(posts[-1].publish_date, posts[-1].pk)})
+    return {
+        'posts': posts,
+        'tag': tag,
+        'next_query': next_query,
+    }
+
+
+@conditional_page(blog_list_sources)
+def blog_list_view(request):
+    # Always two queries: posts + author (join), tags.
+    posts = list(_blog_list_queryset(request))
+    return render(request, 'core/blog_list.html', _blog_list_context(request, posts))
+
+
+def _blog_detail_queryset():
+    # Serves the HTML precompiled at save time (core/richtext.py); the raw content isn't loaded.
+    return BlogPost.objects.select_related('author').defer('content').prefetch_related('tags')
+
+
+@conditional_page(blog_detail_sources)
+def blog_detail_view(request, slug):
+    # Always two queries: post + author (join), tags.
+    post = get_object_or_404(_blog_detail_queryset(), slug=slug)
+    if post.rendition_version < richtext.RENDITION_VERSION:
+        # Bulk-created, or built by an older version: build it for this response only. Saving the
+        # post or `manage.py rebuild_blog_html` stores it; a GET doesn't write.
+        post.refresh_from_db(fields=['content'])
+        richtext.apply_rendition(post)
+    return render(request, 'core/blog_detail.html', {'post': post})
+
+
+@conditional_page(artwork_detail_sources)
+def artwork_detail_view(request, artwork_slug):
+    # Four queries: artwork + category (join), additional images, tags, and the related strip,
+    # which is precomputed (core/related.py) and read with one lookup on its unique index.
+    artwork = get_object_or_404(
+        Artwork.objects.select_related('category').prefetch_related('additional_images', 'tags'), slug=artwork_slug,
+    )
+    context = {
+        'artwork': artwork,
+        'related_artworks': related.related_artworks(artwork),
+    }
+    return render(request, 'core/artwork_detail.html', context)
+
+
+def about_view(request):
+    return render(request, 'core/about.html')
+
+
+def contact_view(request):
+    # The address is a setting so it isn't baked into the templates; social links come from the footer's context.
+    return render(request, 'core/contact.html', {'contact_email': settings.CONTACT_EMAIL})
+
+
+def search_artworks_view(request):
+    query = request.GET.get('q', '').strip()
+    results = search.search_artworks(query, limit=SEARCH_RESULTS_LIMIT) if query else []
+    context = {
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'core/search_results.html', context)
+
+
+
+@require_POST
+def subscribe_view(request):
+    # The footer's mailing list form. Double opt-in: the subscriber stays inactive until they
+    # confirm from the email, which goes out on the background pool. Everyone gets the same
+    # message, so the form can't be used to find out who is subscribed.
+    email = request.POST.get('email', '').strip().lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        messages.error(request, "Please enter a valid email address.")
+        return redirect('core:home')
+    subscriber, _ = Subscriber.objects.get_or_create(email=email)
+    if not subscriber.is_active:
+        background.submit_to_pool(newsletter.send_confirmation, subscriber.pk)
+    messages.success(request, "Thanks! Check your inbox for an email to confirm your subscription.")
+    return redirect('core:home')
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def confirm_subscription_view(request, token):
+    # Linked from the confirmation email. Like unsubscribing, a GET only shows a button, since
+    # mail scanners open links on their own.
+    subscriber = get_object_or_404(Subscriber, confirmation_token=token)
+    if request.method != 'POST':
+        return render(request, 'core/confirm_subscription.html')
+    if not subscriber.is_active:
+        subscriber.is_active = True
+        subscriber.save(update_fields=['is_active'])
+    messages.success(request, "You're subscribed. New blog posts will arrive by email.")
+    return redirect('core:home')
+
+
+@csrf_exempt  # Mail clients' one-click POSTs carry no CSRF token; the token in the URL is the secret
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def unsubscribe_view(request, token):
+    # Linked from every newsletter email (and its List-Unsubscribe header). A GET only shows a
+    # confirmation button, because link scanners and mail prefetchers open links on their own; the
+    # unsubscribe is the POST from that button or the mail client's one-click unsubscribe (RFC 8058).
+    # Unknown or already used tokens get the same message so the link can't be used to probe for addresses.
+    if request.method != 'POST':
+        return render(request, 'core/unsubscribe.html')
+    Subscriber.objects.filter(unsubscribe_token=token, is_active=True).update(is_active=False)
+    messages.success(request, "You've been unsubscribed from the mailing list.")
+    return redirect('core:home')